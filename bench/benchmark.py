@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+#####################################################################
+##
+## benchmark.py
+##
+## Version 1.00 -- 19 October 2026
+##
+## This Python (v3) script times every conversion script and mode on
+## an out file (by default a synthetic one written with makeout.py)
+## and reports wall time, clusters per second and peak memory (RSS)
+## of each run as JSON, so performance can be tracked between
+## versions. Each run is a separate process; runs can optionally be
+## profiled with cProfile.
+##
+## This script is free and distributed WITHOUT warranty; without
+## even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+## PARTICULAR PURPOSE.
+##
+######################################################################
+
+import os, sys, json, time, shutil, platform, subprocess, tempfile, argparse
+from argparse import RawTextHelpFormatter
+
+import makeout
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#name, script and arguments of each benchmarked mode; {i}, {si}, {ns} and {list}
+#are replaced by the input files, number of samples and a list of clusters
+MODES = [
+    ['fasta_na1', 'out2fastaA.py', '-i {i} -si {si} -base b -na 1 -hemi 1'],
+    ['fasta_na2', 'out2fastaA.py', '-i {i} -si {si} -base b -na 2 -hemi 1'],
+    ['fasta_cat', 'out2fastaA.py', '-i {i} -si {si} -cat all.fasta -na 2 -hemi 1'],
+    ['fasta_arch', 'out2fastaA.py', '-i {i} -si {si} -base b -arch b.zip -na 2 -hemi 1'],
+    ['nexus_na1', 'out2nexusA.py', '-i {i} -si {si} -base b -cat all.nex -na 1 -hemi 1'],
+    ['nexus_na2', 'out2nexusA.py', '-i {i} -si {si} -base b -cat all.nex -na 2 -hemi 1'],
+    ['phylip_na1', 'out2phylipA.py', '-i {i} -si {si} -base b -cat all.phy -na 1 -hemi 1'],
+    ['phylip_na2', 'out2phylipA.py', '-i {i} -si {si} -base b -cat all.phy -na 2 -hemi 1'],
+    ['phylip_icat_part', 'out2phylipA.py', '-i {i} -si {si} -base b -cat all.phy -icat alli.phy -part part.txt -na 2 -hemi 1'],
+    ['structureA_HAP', 'out2structureA.py', '-i {i} -si {si} -o s.str -ct HAP'],
+    ['structureA_ALLSNP', 'out2structureA.py', '-i {i} -si {si} -o s.str -ct ALLSNP'],
+    ['structureA_ALLBISNP', 'out2structureA.py', '-i {i} -si {si} -o s.str -ct ALLBISNP'],
+    ['structureA_1BISNP', 'out2structureA.py', '-i {i} -si {si} -o s.str -ct 1BISNP'],
+    ['structureZ_HAP', 'out2structureZ.py', '-i {i} -si {si} -o s.str -ct HAP'],
+    ['structureZ_ALLSNP', 'out2structureZ.py', '-i {i} -si {si} -o s.str -ct ALLSNP'],
+    ['structureZ_ALLBISNP', 'out2structureZ.py', '-i {i} -si {si} -o s.str -ct ALLBISNP'],
+    ['structureZ_1BISNP', 'out2structureZ.py', '-i {i} -si {si} -o s.str -ct 1BISNP'],
+    ['fineRADstructure', 'out2fineRADstructureA.py', '-i {i} -si {si} -o fine.txt'],
+    ['fineRADstructure_proc4', 'out2fineRADstructureA.py', '-i {i} -si {si} -o fine.txt -processes 4'],
+    ['phistA', 'out2phistA.py', '-i {i} -si {si} -o phist.txt'],
+    ['phistZ', 'out2phistZ.py', '-i {i} -si {si} -o phist.txt'],
+    ['parseclusters', 'out2parseclusters.py', '-i {i} -o parsed.out -ns {ns} -l {list}'],
+    ['qc', 'out2qc.py', '-i {i} -si {si} -base qc'],
+    ['qc_z', 'out2qc.py', '-i {i} -si {si} -base qc -z {list}'],
+    ['outconvert_all', 'outconvert.py', '-i {i} -si {si} -fasta f -nexus n -nexuscat all.nex -phylip p -phylipcat all.phy '+
+                                        '-structure s.str -ct ALLBISNP -fineRAD fine.txt -na 2'],
+]
+
+def count_clusters(infile):
+    num_clusters = 0
+    inf = open(infile,'r')
+    for line in inf:
+        if line.startswith('Clstr'):
+            num_clusters += 1
+    inf.close()
+    return num_clusters
+
+def count_samples(infofile):
+    infof = open(infofile,'r')
+    header = infof.readline()
+    num_samples = sum(1 for line in infof if line.strip() != '')
+    infof.close()
+    return num_samples
+
+def run_mode(command, workdir, profile=None):
+    """Run a command in workdir and return its wall time, exit status and peak RSS (kB)."""
+    if profile:
+        command = command[:1]+['-m','cProfile','-o',profile]+command[1:]
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    pid, status, usage = os.wait4(process.pid, 0)
+    seconds = time.perf_counter()-start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    #ru_maxrss is in kB on Linux and in bytes on macOS
+    peak_rss = usage.ru_maxrss
+    if sys.platform == 'darwin':
+        peak_rss = peak_rss//1024
+    return seconds, process.returncode, peak_rss
+
+def benchmark(infile, infofile, modes=None, repeat=1, profile_dir=None, verbose=True):
+    """Run each mode repeat times on infile and return a list of results (best run of each)."""
+    num_clusters = count_clusters(infile)
+    num_samples = count_samples(infofile)
+    workdir = tempfile.mkdtemp(prefix='outbench_')
+    listfile = os.path.join(workdir, 'clusters.txt')
+    inf = open(infile,'r')
+    listf = open(listfile,'w')
+    for line in inf:
+        if line.startswith('Clstr') and int(line.split()[1])%10 == 0:
+            listf.write(line.split()[1]+'\n')
+    inf.close()
+    listf.close()
+
+    results = []
+    for name, script, template in MODES:
+        if modes and name not in modes:
+            continue
+        arguments = template.format(i=os.path.abspath(infile), si=os.path.abspath(infofile), ns=num_samples, list=listfile)
+        command = [sys.executable, os.path.join(REPO, script)]+arguments.split()
+        best = None
+        for r in range(repeat):
+            rundir = os.path.join(workdir, name)
+            os.mkdir(rundir)
+            profile = None
+            if profile_dir:
+                profile = os.path.abspath(os.path.join(profile_dir, name+'.prof'))
+            seconds, returncode, peak_rss = run_mode(command, rundir, profile)
+            shutil.rmtree(rundir)
+            if best == None or seconds < best['seconds']:
+                best = {'name': name,
+                        'command': script+' '+template,
+                        'seconds': round(seconds, 4),
+                        'clusters_per_sec': round(num_clusters/seconds, 1) if seconds > 0 else None,
+                        'peak_rss_kb': peak_rss,
+                        'returncode': returncode}
+        if verbose:
+            print(name+': '+str(best['seconds'])+' s, '+str(best['clusters_per_sec'])+' clusters/s, '+
+                  str(best['peak_rss_kb'])+' kB'+('' if best['returncode'] == 0 else ' (FAILED)'), file=sys.stderr)
+        results.append(best)
+    shutil.rmtree(workdir)
+    return results
+
+def main():
+    print(file=sys.stderr)
+
+    #create variables that can be entered as arguments in command line
+    parser = argparse.ArgumentParser(description=
+                                     'This Python (v3) script times every conversion script and mode on\n'+
+                                     'an out file (by default a synthetic one written with makeout.py)\n'+
+                                     'and reports wall time, clusters per second and peak memory (RSS)\n'+
+                                     'of each run as JSON.\n\n'+
+                                     'This script is free and distributed WITHOUT warranty; without\n'+
+                                     'even the implied warranty of MERCHANTABILITY or FITNESS FOR A\n'+
+                                     'PARTICULAR PURPOSE.', formatter_class=RawTextHelpFormatter)
+
+    parser.add_argument('-i', type=str, metavar='infile', default=None, help='Name of input .out file; if not given a synthetic file is\n'+
+                        'written with makeout.py')
+    parser.add_argument('-si', type=str, metavar='infofile', default=None, help='Name of sample info file (required with -i)')
+    parser.add_argument('-ns', type=int, metavar='num_samples', default=96, help='Number of samples of synthetic file [96]')
+    parser.add_argument('-nc', type=int, metavar='num_clusters', default=2000, help='Number of clusters of synthetic file [2000]')
+    parser.add_argument('-seed', type=int, metavar='seed', default=1, help='Seed of synthetic file [1]')
+    parser.add_argument('-modes', type=str, metavar='mode', nargs='+', default=None, help='Names of modes to run [all]:\n'+
+                        '\n'.join(mode[0] for mode in MODES))
+    parser.add_argument('-repeat', type=int, metavar='repeat', default=1, help='Number of runs of each mode, the fastest is reported [1]')
+    parser.add_argument('-profile', type=str, metavar='profile_dir', default=None, help='Directory to write cProfile stats of each mode to\n'+
+                        '(mode.prof) [none]')
+    parser.add_argument('-o', type=str, metavar='outfile', default=None, help='Name of JSON output file [standard output]')
+    args = parser.parse_args()
+
+    if args.modes:
+        for mode in args.modes:
+            if mode not in [m[0] for m in MODES]:
+                print('ERROR: unknown mode '+mode+'!\n\n', file=sys.stderr)
+                quit()
+    if (args.i == None) != (args.si == None):
+        print('ERROR: -i and -si must be given together!\n\n', file=sys.stderr)
+        quit()
+    if args.profile:
+        os.makedirs(args.profile, exist_ok=True)
+
+    tempdir = None
+    infile = args.i
+    infofile = args.si
+    if infile == None:
+        tempdir = tempfile.mkdtemp(prefix='outbench_input_')
+        infile = os.path.join(tempdir, 'bench.out')
+        infofile = os.path.join(tempdir, 'bench_info.txt')
+        print('Writing synthetic out file with '+str(args.nc)+' clusters and '+str(args.ns)+' samples', file=sys.stderr)
+        makeout.make_out(infile, infofile, args.ns, args.nc, args.seed)
+
+    print('Running modes\n', file=sys.stderr)
+    results = benchmark(infile, infofile, args.modes, args.repeat, args.profile)
+    report = {'input': {'file': args.i if args.i else 'synthetic',
+                        'seed': None if args.i else args.seed,
+                        'clusters': count_clusters(infile),
+                        'samples': count_samples(infofile),
+                        'bytes': os.path.getsize(infile)},
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'repeat': args.repeat,
+              'results': results}
+    if tempdir:
+        shutil.rmtree(tempdir)
+
+    if args.o:
+        outfile = open(args.o,'w')
+        json.dump(report, outfile, indent=1)
+        outfile.write('\n')
+        outfile.close()
+    else:
+        print(json.dumps(report, indent=1))
+
+    print('\nFinished!!\n', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+
+#####################################################################
+##
+## golden.py
+##
+## Version 1.00 -- 19 October 2026
+##
+## This Python (v3) script checks that the conversion scripts give the
+## same output as the original scripts. The original scripts are taken
+## from a git revision (by default the first commit of the repository)
+## and both versions are run on synthetic out files written with
+## makeout.py, with the same seed for the random number generator.
+## Per-cluster files, concatenated files and STRUCTURE and
+## fineRADstructure files must be identical; phi-st tables must agree
+## within a tolerance. The vectorized kernels (pairwise differences,
+## SNP/indel codes, biallelic tests, 2-bit packing and fineRADstructure
+## gap filling) are also checked against the reference loops on random
+## clusters, and two jobs adding the same file to a cache of parsed
+## clusters at the same time are checked.
+##
+## This script is free and distributed WITHOUT warranty; without
+## even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+## PARTICULAR PURPOSE.
+##
+######################################################################
+
+import os, sys, random, shutil, sqlite3, filecmp, subprocess, tempfile, argparse
+from argparse import RawTextHelpFormatter
+
+import makeout
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from outconversions import phist, structure, packed, fineradstructure
+
+#run a script with a seeded random number generator; numpy can be hidden to run
+#the pure Python code
+RUNNER = ('import os, sys, random, runpy\n'+
+          'seed, nonumpy, script = int(sys.argv[1]), sys.argv[2] == "1", sys.argv[3]\n'+
+          'if nonumpy:\n'+
+          '    sys.modules["numpy"] = None\n'+
+          'sys.argv = sys.argv[3:]\n'+
+          'sys.path.insert(0, os.path.dirname(script))\n'+
+          'random.seed(seed)\n'+
+          'runpy.run_path(script, run_name="__main__")\n')
+
+#synthetic inputs: name and arguments of makeout.make_out
+INPUTS = [
+    ['default', dict(num_samples=24, num_clusters=120, seed=1)],
+    ['edge', dict(num_samples=20, num_clusters=120, seed=2, excl=0.25, unk=0.2, snp=0.05, indel=0.3,
+                  haps=6, miss=0.25, flag=0.25, hemi=0.8, codes=0.5)],
+    ['small', dict(num_samples=6, num_clusters=80, seed=3, pops=2, length=40, snp=0.08)],
+]
+
+def cases():
+    """Return name, original script, new script and arguments of each comparison."""
+    cases = []
+    for na in (1,2):
+        for hemi in (0,1):
+            opts = ' -na '+str(na)+' -hemi '+str(hemi)
+            cases.append(['fasta'+opts, 'out2fastaA.py', 'out2fastaA.py', '-i {i} -si {si} -base b'+opts])
+            cases.append(['nexus'+opts, 'out2nexusA.py', 'out2nexusA.py', '-i {i} -si {si} -base b -cat c.nex'+opts])
+            for miss in (0,1):
+                cases.append(['phylip'+opts+' -miss '+str(miss), 'out2phylipA.py', 'out2phylipA.py',
+                              '-i {i} -si {si} -base b -cat c.phy -miss '+str(miss)+opts])
+            cases.append(['outconvert -fasta'+opts, 'out2fastaA.py -i {i} -si {si} -base b'+opts, 'outconvert.py',
+                          '-i {i} -si {si} -fasta b'+opts])
+    for z in ('A','Z'):
+        for ct in ('HAP','ALLSNP','ALLBISNP','1BISNP'):
+            for hemi in (0,1):
+                opts = ' -ct '+ct+' -hemi '+str(hemi)+' -min 2'
+                cases.append(['structure'+z+opts, 'out2structure'+z+'.py', 'out2structure'+z+'.py', '-i {i} -si {si} -o s.str'+opts])
+    cases.append(['outconvert -structure', 'out2structureA.py -i {i} -si {si} -o s.str -ct 1BISNP', 'outconvert.py',
+                  '-i {i} -si {si} -structure s.str -ct 1BISNP'])
+    cases.append(['fineRADstructure', 'out2fineRADstructureA.py', 'out2fineRADstructureA.py', '-i {i} -si {si} -o fine.txt'])
+    cases.append(['outconvert -fineRAD', 'out2fineRADstructureA.py -i {i} -si {si} -o fine.txt', 'outconvert.py',
+                  '-i {i} -si {si} -fineRAD fine.txt'])
+    cases.append(['phistA', 'out2phistA.py', 'out2phistA.py', '-i {i} -si {si} -o phist.txt'])
+    cases.append(['phistZ', 'out2phistZ.py', 'out2phistZ.py', '-i {i} -si {si} -o phist.txt'])
+    #the first run with a cache of parsed clusters stores them, the later runs read them
+    for z in ('A','Z'):
+        cases.append(['phist'+z+' -cache', 'out2phist'+z+'.py -i {i} -si {si} -o phist.txt', 'out2phist'+z+'.py',
+                      '-i {i} -si {si} -o phist.txt -cache {cache}'])
+        for ct in ('HAP','ALLSNP','1BISNP'):
+            cases.append(['structure'+z+' -cache -ct '+ct, 'out2structure'+z+'.py -i {i} -si {si} -o s.str -ct '+ct,
+                          'out2structure'+z+'.py', '-i {i} -si {si} -o s.str -ct '+ct+' -cache {cache}'])
+    for inv in ('False','True'):
+        cases.append(['parseclusters -inv '+inv, 'out2parseclusters.py', 'out2parseclusters.py',
+                      '-i {i} -o p.out -ns {ns} -l {list} -inv '+inv])
+    return cases
+
+def run(script, arguments, workdir, seed, nonumpy=False):
+    """Run a script in workdir and return its exit status."""
+    os.makedirs(workdir)
+    command = [sys.executable, '-c', RUNNER, str(seed), '1' if nonumpy else '0', script]+arguments
+    return subprocess.call(command, cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def same_table(file1, file2, tolerance):
+    #tab delimited tables with numbers that agree within a relative tolerance
+    lines1 = open(file1).read().split('\n')
+    lines2 = open(file2).read().split('\n')
+    if len(lines1) != len(lines2):
+        return False
+    for line1, line2 in zip(lines1, lines2):
+        fields1 = line1.split('\t')
+        fields2 = line2.split('\t')
+        if len(fields1) != len(fields2):
+            return False
+        for x, y in zip(fields1, fields2):
+            if x == y:
+                continue
+            try:
+                x = float(x)
+                y = float(y)
+            except ValueError:
+                return False
+            if abs(x-y) > tolerance*max(abs(x), abs(y), 1e-300):
+                return False
+    return True
+
+def compare_dirs(dir1, dir2, tolerance):
+    """Return a list of differences between the files of two directories."""
+    names1 = sorted(os.listdir(dir1))
+    names2 = sorted(os.listdir(dir2))
+    if names1 != names2:
+        return ['files differ: '+' '.join(sorted(set(names1) ^ set(names2))[:5])]
+    differences = []
+    for name in names1:
+        path1 = os.path.join(dir1, name)
+        path2 = os.path.join(dir2, name)
+        if name.startswith('phist'):
+            if not same_table(path1, path2, tolerance):
+                differences.append(name)
+        elif not filecmp.cmp(path1, path2, shallow=False):
+            differences.append(name)
+    return differences
+
+def golden(revision, tolerance=1e-9, seed=5, nonumpy=False, verbose=True):
+    """Compare the scripts of revision with the current scripts, return the number of failures."""
+    workdir = tempfile.mkdtemp(prefix='outgolden_')
+    refdir = os.path.join(workdir, 'ref')
+    os.mkdir(refdir)
+    archive = subprocess.run(['git', '-C', REPO, 'archive', revision], stdout=subprocess.PIPE, check=True).stdout
+    subprocess.run(['tar', '-x', '-C', refdir], input=archive, check=True)
+
+    failures = 0
+    for input_name, options in INPUTS:
+        infile = os.path.join(workdir, input_name+'.out')
+        infofile = os.path.join(workdir, input_name+'_info.txt')
+        makeout.make_out(infile, infofile, **options)
+        listfile = os.path.join(workdir, input_name+'_list.txt')
+        listf = open(listfile,'w')
+        for line in open(infile):
+            if line.startswith('Clstr') and int(line.split()[1])%3 == 0:
+                listf.write(line.split()[1]+'\n')
+        listf.close()
+        fill = dict(i=infile, si=infofile, ns=options['num_samples'], list=listfile,
+                    cache=os.path.join(workdir, input_name+'_cache.db'))
+
+        for n, (name, ref, new, arguments) in enumerate(cases()):
+            #reference is either a script given the same arguments or a full command
+            ref = ref.split()
+            ref_arguments = [a.format(**fill) for a in ref[1:]] or [a.format(**fill) for a in arguments.split()]
+            new_arguments = [a.format(**fill) for a in arguments.split()]
+            dir1 = os.path.join(workdir, input_name, str(n), 'ref')
+            dir2 = os.path.join(workdir, input_name, str(n), 'new')
+            status1 = run(os.path.join(refdir, ref[0]), ref_arguments, dir1, seed)
+            status2 = run(os.path.join(REPO, new), new_arguments, dir2, seed, nonumpy)
+            if status1 != 0 and status2 != 0:
+                #empty output directories would compare equal, so this is never a pass
+                result = 'SKIP (both failed, exit status '+str(status1)+' and '+str(status2)+')'
+            elif status1 != 0 and status2 == 0:
+                result = 'SKIP (original failed)'
+            elif status2 != 0 and status1 == 0:
+                result = 'FAIL (exit status '+str(status2)+')'
+            else:
+                differences = compare_dirs(dir1, dir2, tolerance)
+                if differences:
+                    result = 'FAIL ('+', '.join(differences[:3])+')'
+                else:
+                    result = 'PASS'
+            if result.startswith('FAIL'):
+                failures += 1
+            if verbose or result.startswith('FAIL') or result.startswith('SKIP (both'):
+                print(result+'\t'+input_name+'\t'+name)
+    shutil.rmtree(workdir)
+    return failures
+
+def concurrent_cache(seed=5, nonumpy=False, verbose=True):
+    """Run two jobs that add the same file to a new cache at the same time, return the number of failures.
+
+    Both jobs and a later job reading the cache must write the same output as
+    runs without the cache, and the cache must hold the file once, complete.
+    """
+    workdir = tempfile.mkdtemp(prefix='outcache_')
+    infile = os.path.join(workdir, 'cache.out')
+    infofile = os.path.join(workdir, 'cache_info.txt')
+    #more clusters than are stored per commit, so the jobs take turns writing
+    makeout.make_out(infile, infofile, num_samples=24, num_clusters=2500, seed=4)
+    cache = os.path.join(workdir, 'cache.db')
+    jobs = [['out2phistA.py', '-i', infile, '-si', infofile, '-o', 'out.txt'],
+            ['out2structureA.py', '-i', infile, '-si', infofile, '-o', 'out.txt', '-ct', 'HAP']]
+    for n in range(len(jobs)):
+        run(os.path.join(REPO, jobs[n][0]), jobs[n][1:], os.path.join(workdir, 'plain'+str(n)), seed, nonumpy)
+    processes = []
+    for n in range(len(jobs)):
+        os.makedirs(os.path.join(workdir, 'concurrent'+str(n)))
+        command = [sys.executable, '-c', RUNNER, str(seed), '1' if nonumpy else '0', os.path.join(REPO, jobs[n][0])]+jobs[n][1:]
+        processes.append(subprocess.Popen(command+['-cache', cache], cwd=os.path.join(workdir, 'concurrent'+str(n)),
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    statuses = [process.wait() for process in processes]
+    statuses.append(run(os.path.join(REPO, jobs[0][0]), jobs[0][1:]+['-cache', cache], os.path.join(workdir, 'cached'), seed, nonumpy))
+
+    results = []
+    for n in range(len(jobs)):
+        if statuses[n] != 0:
+            results.append('FAIL (exit status '+str(statuses[n])+')\tconcurrent cache\t'+jobs[n][0])
+        elif compare_dirs(os.path.join(workdir, 'plain'+str(n)), os.path.join(workdir, 'concurrent'+str(n)), 1e-9):
+            results.append('FAIL (output differs)\tconcurrent cache\t'+jobs[n][0])
+        else:
+            results.append('PASS\tconcurrent cache\t'+jobs[n][0])
+    if statuses[-1] != 0 or compare_dirs(os.path.join(workdir, 'plain0'), os.path.join(workdir, 'cached'), 1e-9):
+        results.append('FAIL\tconcurrent cache\tread from cache')
+    else:
+        results.append('PASS\tconcurrent cache\tread from cache')
+    db = sqlite3.connect(cache)
+    files = db.execute('select clusters from files').fetchall()
+    pending = db.execute('select count(*) from pending').fetchone()[0]
+    rows = db.execute('select count(*) from clusters').fetchone()[0]
+    db.close()
+    if files == [(2500,)] and pending == 0 and rows == 2500:
+        results.append('PASS\tconcurrent cache\tcache contents')
+    else:
+        results.append('FAIL (files '+str(files)+', pending '+str(pending)+', clusters '+str(rows)+')\tconcurrent cache\tcache contents')
+    shutil.rmtree(workdir)
+
+    for result in results:
+        if verbose or result.startswith('FAIL'):
+            print(result)
+    return sum(1 for result in results if result.startswith('FAIL'))
+
+def reference_column(varsites, scored, s):
+    #STRUCTURE codes of one site, as written by the original scripts
+    codes = {'A':'1', 'C':'2', 'G':'3', 'T':'4', '0':'5', '1':'6'}
+    return [codes.get(v[s],'-9') if ok else '-9' for v, ok in zip(varsites, scored)]
+
+def reference_biallelic(column, min_freq):
+    alleles = list(set(column))
+    if '-9' in alleles:
+        alleles.remove('-9')
+    return len(alleles) == 2 and min(column.count(alleles[0]), column.count(alleles[1])) >= min_freq
+
+def random_seqs(rng, n, length, missing, ragged):
+    seqs = []
+    base = [rng.choice('ACGT') for x in range(length)]
+    for r in range(n):
+        if rng.random() < missing:
+            seqs.append('.')
+            continue
+        seq = [rng.choice('ACGT-N') if rng.random() < 0.1 else b for b in base]
+        if rng.random() < ragged:
+            seq = seq[:rng.randint(1, length)]
+        seqs.append(''.join(seq))
+    return seqs
+
+def with_numpy(modules, enabled, function, *args):
+    #run function with numpy hidden from modules when enabled is False
+    saved = [module.numpy for module in modules]
+    if not enabled:
+        for module in modules:
+            module.numpy = None
+    try:
+        return function(*args)
+    finally:
+        for module, value in zip(modules, saved):
+            module.numpy = value
+
+def properties(iterations=200, seed=1, verbose=True):
+    """Check the vectorized kernels against the reference loops, return the number of failures."""
+    rng = random.Random(seed)
+    failures = {'pairwise differences': 0, 'SNP/indel codes': 0, 'biallelic tests': 0, '2-bit packing': 0,
+                'fineRADstructure gaps': 0}
+    have_numpy = packed.numpy is not None
+
+    for x in range(iterations):
+        #pairwise differences: sums of squared differences from allele counts
+        if have_numpy:
+            npops = rng.randint(1, 4)
+            n = rng.randint(1, 30)
+            seqs = random_seqs(rng, n, rng.randint(1, 40), 0.2, 0.2)
+            groups = [rng.choice(list(range(npops))+[-9]) for r in range(n)]
+            seq_array = [['s', groups[r], seqs[r]] for r in range(n)]
+            try:
+                expected = phist.calculate_phist(seq_array, npops)[3:6]
+            except ZeroDivisionError:
+                expected = None
+            counts = phist.allele_counts(seqs, groups, npops)
+            found = (phist.differences(counts.sum(0)), [phist.differences(counts[g]) for g in range(npops)],
+                     [sum(1 for r in range(n) if seqs[r] != '.' and groups[r] == g) for g in range(npops)])
+            if expected != None and tuple(expected) != found:
+                failures['pairwise differences'] += 1
+
+        #SNP/indel codes, with missing ('.') and short varsites for unscored alleles
+        n = rng.randint(1, 30)
+        num_snp = rng.randint(1, 8)
+        scored = [rng.random() < 0.7 for r in range(n)]
+        varsites = [''.join(rng.choice('ACGT01-N') for s in range(num_snp)) if ok or rng.random() < 0.5 else '.' for ok in scored]
+        for enabled in ([True, False] if have_numpy else [False]):
+            codes = with_numpy([structure], enabled, structure.site_codes, varsites, scored, num_snp)
+            for s in range(num_snp):
+                column = [structure.CODE_STRINGS[code] for code in list(codes[s])]
+                if column != reference_column(varsites, scored, s):
+                    failures['SNP/indel codes'] += 1
+
+            #biallelic tests and packed columns
+            masks = with_numpy([structure], enabled, structure.allele_masks, codes)
+            min_freq = rng.randint(1, 3)
+            for s in range(num_snp):
+                reference = reference_column(varsites, scored, s)
+                is_biallelic = bin(masks[s]).count('1') == 2
+                if is_biallelic:
+                    column = with_numpy([structure, packed], enabled, structure.biallelic_column, 'x', codes[s], masks[s])
+                    is_biallelic = with_numpy([packed], enabled, lambda: min(column.counts()) >= min_freq)
+                    if with_numpy([packed], enabled, column.values, 0, n) != reference:
+                        failures['biallelic tests'] += 1
+                if is_biallelic != reference_biallelic(reference, min_freq):
+                    failures['biallelic tests'] += 1
+
+        #gap filling of fineRADstructure genotypes, with missing genotypes and ties
+        if have_numpy:
+            length = rng.randint(1, 8)
+            genotypes = []
+            for r in range(rng.randint(1, 20)):
+                if rng.random() < 0.2:
+                    genotypes.append(['',''])
+                else:
+                    genotypes.append([''.join(rng.choice('ACGT01--') for s in range(length)) for a in (0,1)])
+            all_genos = [item for sublist in genotypes for item in sublist]
+            uni_genos = [g for g in set(all_genos) if g != '']
+            expected = [list(pair) for pair in genotypes]
+            fineradstructure.fill_gaps(expected, all_genos, uni_genos)
+            found = [list(pair) for pair in genotypes]
+            alleles = [g for pair in found if pair[0] != '' for g in pair]
+            if alleles and any('-' in g for g in alleles):
+                fineradstructure.fill_gaps_matrix(found, alleles)
+                if found != expected:
+                    failures['fineRADstructure gaps'] += 1
+
+        #2-bit packing and popcount counting
+        codes = [rng.randint(0, 3) for r in range(rng.randint(0, 50))]
+        for enabled in ([True, False] if have_numpy else [False]):
+            data = with_numpy([packed], enabled, packed.pack2, codes)
+            start = rng.randint(0, len(codes))
+            stop = rng.randint(start, len(codes))
+            if with_numpy([packed], enabled, packed.unpack2, data, start, stop) != codes[start:stop]:
+                failures['2-bit packing'] += 1
+            if with_numpy([packed], enabled, packed.count2, data) != (codes.count(1), codes.count(2)):
+                failures['2-bit packing'] += 1
+            if data != packed.pack2(codes):
+                failures['2-bit packing'] += 1
+
+    for name in failures:
+        if verbose or failures[name]:
+            print(('PASS' if failures[name] == 0 else 'FAIL ('+str(failures[name])+' cases)')+'\tproperties\t'+name)
+    return sum(1 for name in failures if failures[name])
+
+def main():
+    print(file=sys.stderr)
+
+    #create variables that can be entered as arguments in command line
+    parser = argparse.ArgumentParser(description=
+                                     'This Python (v3) script checks that the conversion scripts give the\n'+
+                                     'same output as the original scripts of a git revision, on synthetic\n'+
+                                     'out files with a fixed seed, and checks the vectorized kernels against\n'+
+                                     'the reference loops on random clusters, and checks two jobs adding\n'+
+                                     'the same file to a cache of parsed clusters at the same time.\n\n'+
+                                     'This script is free and distributed WITHOUT warranty; without\n'+
+                                     'even the implied warranty of MERCHANTABILITY or FITNESS FOR A\n'+
+                                     'PARTICULAR PURPOSE.', formatter_class=RawTextHelpFormatter)
+
+    parser.add_argument('-rev', type=str, metavar='revision', default=None, help='Git revision with the original scripts [first commit]')
+    parser.add_argument('-tol', type=float, metavar='tolerance', default=1e-9, help='Relative tolerance for phi-st values [1e-9]')
+    parser.add_argument('-seed', type=int, metavar='seed', default=5, help='Seed of random number generator of the scripts [5]')
+    parser.add_argument('-nonumpy', action='store_true', help='Run the current scripts without numpy (pure Python code)')
+    parser.add_argument('-iter', type=int, metavar='iterations', default=200, help='Number of random clusters for property checks [200]')
+    parser.add_argument('-q', action='store_true', help='Only print failures and cases where both scripts failed')
+    args = parser.parse_args()
+
+    revision = args.rev
+    if revision == None:
+        revision = subprocess.run(['git', '-C', REPO, 'rev-list', '--max-parents=0', 'HEAD'],
+                                  stdout=subprocess.PIPE, check=True).stdout.decode().split()[0]
+    print('Comparing with scripts of revision '+revision, file=sys.stderr)
+
+    failures = golden(revision, args.tol, args.seed, args.nonumpy, not args.q)
+    failures += concurrent_cache(args.seed, args.nonumpy, not args.q)
+    failures += properties(args.iter, args.seed, not args.q)
+
+    if failures:
+        print('\n'+str(failures)+' checks failed\n', file=sys.stderr)
+        sys.exit(1)
+    print('\nAll checks passed\n', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
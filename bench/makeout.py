@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+#####################################################################
+##
+## makeout.py
+##
+## Version 1.00 -- 19 October 2026
+##
+## This Python (v3) script writes a synthetic out file and a matching
+## sample info file for testing and benchmarking the conversion
+## scripts. Each cluster has a reference sequence and a few
+## haplotypes that differ at SNPs and indels (gaps), with one
+## haplotype number per distinct sequence. Indels are written as gaps
+## in the variable sites, or as 0 (no gap) and 1 (gap) in a proportion
+## of clusters. Samples draw two haplotypes per cluster; genotypes can
+## be missing, or flagged (low depth), in which case the second allele
+## may be missing (hemizygous). The same seed always gives the same
+## files.
+##
+## This script is free and distributed WITHOUT warranty; without
+## even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+## PARTICULAR PURPOSE.
+##
+######################################################################
+
+import random, argparse
+from argparse import RawTextHelpFormatter
+
+def make_sample_info(infofile, num_samples, pops=4, excl=0.05, fem=0.5, unk=0.0, rng=random):
+    """Write a sample info file and return the sample names."""
+    names = []
+    outfile = open(infofile,'w')
+    outfile.write('order\tsample\tgenus\tspecies\tpopulation\tsex\tcolor\tshape\n')
+    for i in range(num_samples):
+        name = 'S'+str(i+1)
+        names.append(name)
+        if rng.random() < excl:
+            pop = '-9'
+        else:
+            pop = 'pop'+str(i%pops+1)
+        x = rng.random()
+        if x < unk:
+            sex = 'U'
+        elif x < unk+fem*(1-unk):
+            sex = 'F'
+        else:
+            sex = 'M'
+        outfile.write(str(i+1)+'\t'+name+'\tGenus\tspecies\t'+pop+'\t'+sex+'\t'+str(i%pops+1)+'\t16\n')
+    outfile.close()
+    return names
+
+def make_cluster(cluster, names, length=90, snp=0.01, indel=0.05, haps=4, miss=0.1, flag=0.05, hemi=0.5, codes=0.0, rng=random):
+    """Return the lines of one cluster of an out file."""
+    length = rng.randint(int(length*0.8), int(length*1.2))
+    ref = [rng.choice('ACGT') for x in range(length)]
+    positions = [x for x in range(length) if rng.random() < snp]
+    indels = set(x for x in positions if rng.random() < indel)
+    coded = bool(indels) and rng.random() < codes
+
+    #first haplotype is the reference, others differ at each variable site with p=0.5;
+    #haplotypes with the same sequence are merged, so each sequence has one number
+    haplotypes = [ref]
+    for h in range(1, rng.randint(1, haps)):
+        seq = list(ref)
+        for x in positions:
+            if rng.random() < 0.5:
+                if x in indels:
+                    seq[x] = '-'
+                else:
+                    seq[x] = rng.choice([base for base in 'ACGT' if base != ref[x]])
+        if seq not in haplotypes:
+            haplotypes.append(seq)
+    weights = [1.0/(h+1) for h in range(len(haplotypes))]
+
+    lines = ['Clstr\t'+str(cluster)+'\t'+str(len(names))+'\n', 'Ref\t'+''.join(ref)+'\n']
+    for name in names:
+        x = rng.random()
+        if x < miss:
+            genotype_flag = 0
+        elif x < miss+flag:
+            genotype_flag = rng.choice([2,3])
+        else:
+            genotype_flag = 1
+        alleles = sorted(rng.choices(range(len(haplotypes)), weights, k=2))
+        for a in range(2):
+            if genotype_flag == 0 or (genotype_flag > 1 and a == 1 and rng.random() < hemi):
+                lines.append(name+'\t.\t.\t.\t0\t0\t0\t'+str(genotype_flag)+'\n')
+                continue
+            seq = haplotypes[alleles[a]]
+            if coded:
+                varsites = ''.join(('1' if seq[x] == '-' else '0') if x in indels else seq[x] for x in positions)
+            else:
+                varsites = ''.join(seq[x] for x in positions) or '.'
+            depth = rng.randint(3, 60)
+            lines.append(name+'\t'+''.join(seq)+'\t'+varsites+'\t'+str(alleles[a])+'\t'+str(depth)+'\t'+
+                         str(depth*2)+'\t0.5\t'+str(genotype_flag)+'\n')
+    return lines
+
+def make_out(outfile, infofile, num_samples, num_clusters, seed=1, pops=4, excl=0.05, fem=0.5, unk=0.0,
+             length=90, snp=0.01, indel=0.05, haps=4, miss=0.1, flag=0.05, hemi=0.5, codes=0.0):
+    """Write a synthetic out file and sample info file."""
+    rng = random.Random(seed)
+    names = make_sample_info(infofile, num_samples, pops, excl, fem, unk, rng)
+    out = open(outfile,'w')
+    cluster = 0
+    for c in range(num_clusters):
+        #cluster numbers are increasing, with gaps as in filtered out files
+        cluster += rng.randint(1, 3)
+        out.writelines(make_cluster(cluster, names, length, snp, indel, haps, miss, flag, hemi, codes, rng))
+    out.close()
+
+def main():
+    print()
+
+    #create variables that can be entered as arguments in command line
+    parser = argparse.ArgumentParser(description=
+                                     'This Python (v3) script writes a synthetic out file and a matching\n'+
+                                     'sample info file for testing and benchmarking the conversion\n'+
+                                     'scripts. The same seed always gives the same files.\n\n'+
+                                     'This script is free and distributed WITHOUT warranty; without\n'+
+                                     'even the implied warranty of MERCHANTABILITY or FITNESS FOR A\n'+
+                                     'PARTICULAR PURPOSE.', formatter_class=RawTextHelpFormatter)
+
+    parser.add_argument('-o', type=str, metavar='outfile', required=True, help='Name of output .out file')
+    parser.add_argument('-si', type=str, metavar='infofile', required=True, help='Name of output sample info file')
+    parser.add_argument('-ns', type=int, metavar='num_samples', default=96, help='Number of samples [96]')
+    parser.add_argument('-nc', type=int, metavar='num_clusters', default=10000, help='Number of clusters [10000]')
+    parser.add_argument('-seed', type=int, metavar='seed', default=1, help='Seed of random number generator [1]')
+    parser.add_argument('-pops', type=int, metavar='populations', default=4, help='Number of populations [4]')
+    parser.add_argument('-excl', type=float, metavar='excluded', default=0.05, help='Proportion of samples with population -9 [0.05]')
+    parser.add_argument('-fem', type=float, metavar='females', default=0.5, help='Proportion of females among samples of known sex [0.5]')
+    parser.add_argument('-unk', type=float, metavar='unknown', default=0.0, help='Proportion of samples of unknown sex (U) [0.0]')
+    parser.add_argument('-len', type=int, metavar='length', default=90, help='Mean sequence length, lengths vary by +-20%% [90]')
+    parser.add_argument('-snp', type=float, metavar='snp_density', default=0.01, help='Proportion of variable sites [0.01]')
+    parser.add_argument('-indel', type=float, metavar='indels', default=0.05, help='Proportion of variable sites that are indels (gaps) [0.05]')
+    parser.add_argument('-codes', type=float, metavar='indel_codes', default=0.0, help='Proportion of clusters with indels where they are\n'+
+                        'written as 0 (no gap) and 1 (gap) in the variable\n'+
+                        'sites instead of as gaps [0.0]')
+    parser.add_argument('-haps', type=int, metavar='haplotypes', default=4, help='Maximum number of haplotypes per cluster [4]')
+    parser.add_argument('-miss', type=float, metavar='missing', default=0.1, help='Proportion of missing genotypes [0.1]')
+    parser.add_argument('-flag', type=float, metavar='flagged', default=0.05, help='Proportion of flagged (low depth) genotypes [0.05]')
+    parser.add_argument('-hemi', type=float, metavar='hemizygous', default=0.5, help='Proportion of flagged genotypes with a missing\n'+
+                        'second allele [0.5]')
+    args = parser.parse_args()
+
+    print('Writing '+str(args.nc)+' clusters for '+str(args.ns)+' samples to '+args.o)
+    make_out(args.o, args.si, args.ns, args.nc, args.seed, args.pops, args.excl, args.fem, args.unk,
+             args.len, args.snp, args.indel, args.haps, args.miss, args.flag, args.hemi, args.codes)
+
+    print('\nFinished!!\n')
+
+if __name__ == '__main__':
+    main()
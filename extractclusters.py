@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+#####################################################################
+##
+## extractclusters.py
+##
+## Version 1.00 -- 19 October 2026
+##
+## This Python (v3) script extracts the files of selected clusters
+## from a zip archive written with the -arch parameter of
+## out2fastaA.py, out2nexusA.py, out2phylipA.py or outconvert.py.
+##
+## This script is free and distributed WITHOUT warranty; without
+## even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+## PARTICULAR PURPOSE.
+##
+######################################################################
+
+import sys, os, zipfile, argparse
+from argparse import RawTextHelpFormatter
+
+def main():
+    print(file=sys.stderr)
+
+    #create variables that can be entered as arguments in command line
+    parser = argparse.ArgumentParser(description=
+                                     'This Python (v3) script extracts the files of selected clusters\n'+
+                                     'from a zip archive written with the -arch parameter of\n'+
+                                     'out2fastaA.py, out2nexusA.py, out2phylipA.py or outconvert.py.\n\n'+
+                                     'This script is free and distributed WITHOUT warranty; without\n'+
+                                     'even the implied warranty of MERCHANTABILITY or FITNESS FOR A\n'+
+                                     'PARTICULAR PURPOSE.', formatter_class=RawTextHelpFormatter)
+
+    parser.add_argument('-a', type=str, metavar='archive', required=True, help='Name of zip archive with cluster files')
+    parser.add_argument('-c', type=str, metavar='cluster', nargs='+', default=[], help='Cluster number(s) to extract')
+    parser.add_argument('-l', type=str, metavar='cluster_list', default=None, help='Name of text file containing list of clusters to extract')
+    parser.add_argument('-ext', type=str, metavar='extension', default=None, help='Only extract the files with this extension (fasta, nex or\n'+
+                        'phy), for archives with several formats [all]')
+    parser.add_argument('-o', type=str, metavar='outdir', default='.', help='Directory to write cluster files to, or - to write them\n'+
+                        'to standard output (needs -ext when the archive has\n'+
+                        'several files for a cluster) [.]')
+    args = parser.parse_args()
+
+    #gather clusters to extract
+    clusters = list(args.c)
+    if args.l:
+        listfile = open(args.l,'r')
+        for line in listfile:
+            if line.strip() != '':
+                clusters.append(line.strip())
+        listfile.close()
+    print('Extracting '+str(len(clusters))+' clusters from '+args.a, file=sys.stderr)
+
+    #index archive members by cluster number, members are named basename_clstr_#.ext and
+    #an archive of outconvert.py has a file of each format for every cluster
+    archive = zipfile.ZipFile(args.a,'r')
+    members = {}
+    for name in archive.namelist():
+        base, ext = os.path.splitext(name)
+        if args.ext and ext[1:] != args.ext.lstrip('.'):
+            continue
+        members.setdefault(base.rsplit('_clstr_',1)[-1], []).append(name)
+
+    if args.o == '-':
+        for cluster in clusters:
+            if len(members.get(cluster, [])) > 1:
+                print('ERROR: archive has '+str(len(members[cluster]))+' files for cluster '+cluster+' ('+', '.join(members[cluster])+
+                      '), choose one with -ext to write to standard output!\n\n', file=sys.stderr)
+                archive.close()
+                sys.exit(1)
+
+    missing = 0
+    for cluster in clusters:
+        if cluster not in members:
+            print('Cluster '+cluster+' not found in archive', file=sys.stderr)
+            missing += 1
+            continue
+        for name in members[cluster]:
+            data = archive.read(name)
+            if args.o == '-':
+                sys.stdout.buffer.write(data)
+            else:
+                outfile = open(os.path.join(args.o,name),'wb')
+                outfile.write(data)
+                outfile.close()
+    archive.close()
+
+    print('\n'+str(len(clusters)-missing)+' clusters extracted', file=sys.stderr)
+    print('\nFinished!!\n', file=sys.stderr)
+    if missing > 0:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -24,128 +24,95 @@ class FlexiFormatter(argparse.RawTextHelpFormatter):
             lines.extend(new_lines or [' '])
         return lines
 
-import os, sys, random, argparse
 from argparse import RawTextHelpFormatter
 
-print()
-#create variables that can be entered as arguments in command line
-parser = argparse.ArgumentParser(description=
-                                 'This Python (v3) script converts sequences in an out file (with select\n'+
-                                 'clusters) to the fasta format. It assumes that all clusters are\n'+
-                                 'located on autosomes (hence "A" in script name). A separate fasta\n'+
-                                 'file is created for each cluster. Samples with a "-9" in the population\n'+
-                                 'column of the sample info file are skipped. Missing data are written as\n'+
-                                 'a single N.\n\n'+
-                                 'This script is free and distributed WITHOUT warranty; without\n'+
-                                 'even the implied warranty of MERCHANTABILITY or FITNESS FOR A\n'+
-                                 'PARTICULAR PURPOSE.', formatter_class=FlexiFormatter)
+from outconversions import out2fasta, Timings, Progress, RunSummary, Follow, run_profiled
 
-parser.add_argument('-i', type=str, metavar='infile', required=True, help='Name of input .out file with selected clusters.')
-parser.add_argument('-base', type=str, metavar='basename', required=True, help='Base name of fasdta files for individual clusters. '+
-                    'Names of these files will have the format basename_clstr_#.fasta')
-parser.add_argument('-si', type=str, metavar='infofile', required=True, help='Name of sample info file.')
-parser.add_argument('-na', type=int, metavar='num_alleles', required=True, help='Number of alleles per sample to write to fasta file. '+
-                    '1=major allele for low depth or flagged genotypes, random draw of first or second allele for good genotypes; '+
-                    '2=alleles assigned to "a" or "b".')
-parser.add_argument('-hemi', type=int, metavar='hemizygous_genotypes', required=True, help='Allow (1) or do not allow (0) hemizygous '+
-                    'genotypes in fasta files. Applies only when na=2. If 1 then major allele will be written for low depth and '+
-                    'flagged genotypes and second allele will contain a single N characters. If 0 then both alleles will contain a '+
-                    'single N character')
-args = parser.parse_args()
+def main():
+    print()
+    #create variables that can be entered as arguments in command line
+    parser = argparse.ArgumentParser(description=
+                                     'This Python (v3) script converts sequences in an out file (with select\n'+
+                                     'clusters) to the fasta format. It assumes that all clusters are\n'+
+                                     'located on autosomes (hence "A" in script name). A separate fasta\n'+
+                                     'file is created for each cluster and/or a single indexed multi-locus\n'+
+                                     'fasta file is created. Samples with a "-9" in the population\n'+
+                                     'column of the sample info file are skipped. Missing data are written as\n'+
+                                     'a single N.\n\n'+
+                                     'This script is free and distributed WITHOUT warranty; without\n'+
+                                     'even the implied warranty of MERCHANTABILITY or FITNESS FOR A\n'+
+                                     'PARTICULAR PURPOSE.', formatter_class=FlexiFormatter)
 
-#count number of clusters
-print('\nCounting number of clusters')
-infile = open(args.i,'r')
-file = infile.read()
-num_clusters = file.count('Clstr')
-print('Found '+str(num_clusters)+' clusters\n')
-infile.close()
+    parser.add_argument('-i', type=str, metavar='infile', required=True, help='Name of input .out file with selected clusters, or - to read from standard input (e.g. piped from '+
+                        'out2parseclusters.py -o -).')
+    parser.add_argument('-base', type=str, metavar='basename', default=None, help='Base name of fasta files for individual clusters. '+
+                        'Names of these files will have the format basename_clstr_#.fasta. Required unless -cat is used')
+    parser.add_argument('-si', type=str, metavar='infofile', required=True, help='Name of sample info file.')
+    parser.add_argument('-na', type=int, metavar='num_alleles', required=True, help='Number of alleles per sample to write to fasta file. '+
+                        '1=major allele for low depth or flagged genotypes, random draw of first or second allele for good genotypes; '+
+                        '2=alleles assigned to "a" or "b".')
+    parser.add_argument('-hemi', type=int, metavar='hemizygous_genotypes', required=True, help='Allow (1) or do not allow (0) hemizygous '+
+                        'genotypes in fasta files. Applies only when na=2. If 1 then major allele will be written for low depth and '+
+                        'flagged genotypes and second allele will contain a single N characters. If 0 then both alleles will contain a '+
+                        'single N character')
+    parser.add_argument('-arch', type=str, metavar='archive', default=None, help='Name of zip archive to write the fasta file of each cluster to, instead of writing a separate file '+
+                        'per cluster. Single clusters can be extracted with extractclusters.py [none]')
+    parser.add_argument('-threads', type=int, metavar='threads', default=0, help='Number of threads writing the files of individual clusters, so parsing '+
+                        'and file creation overlap. 0=write on the main thread [0]')
+    parser.add_argument('-cat', type=str, metavar='catfile', default=None, help='Name of a single multi-locus fasta file with the records of all '+
+                        'clusters, named Clstr#|sample. A samtools compatible index is written to catfile.fai [none]')
+    parser.add_argument('-variable_only', action='store_true', help='Only write clusters where the included samples have more than one '+
+                        'sequence (besides missing data)')
+    parser.add_argument('-incremental', action='store_true', help='Only write the files of clusters that changed since the previous run '+
+                        'with the same -base, and delete files of clusters that are gone. Hashes of the clusters are kept in '+
+                        'basename_manifest.json, with their part of the concatenated output in basename_manifest.json.segments')
+    parser.add_argument('-follow', action='store_true', help='Convert infile while the pipeline is still writing it: each cluster is '+
+                        'converted as soon as it is complete, and the run ends when infile.done is written (one left by a previous run is ignored), the -follow_pid process '+
+                        'exits or infile did not grow for -follow_timeout seconds')
+    parser.add_argument('-follow_pid', type=int, metavar='pid', default=None, help='Process ID of the program writing infile, for -follow [none]')
+    parser.add_argument('-follow_timeout', type=float, metavar='seconds', default=0, help='End -follow when infile did not grow for this many '+
+                        'seconds, 0=never [0]')
+    parser.add_argument('-progress', type=float, metavar='seconds', default=10, help='Interval between progress reports, with clusters and '+
+                        'bytes read per second, estimated time left and memory use [10]')
+    parser.add_argument('-progress_kv', action='store_true', help='Write progress reports as key=value pairs after the word PROGRESS, '+
+                        'for scheduler logs')
+    parser.add_argument('-summary', type=str, metavar='json_file', default=None, help='Name of JSON file with a summary of the run: clusters read, '+
+                        'samples included and excluded, values of each output (e.g. characters written), wall time per stage, throughput '+
+                        'and peak memory [none]')
+    parser.add_argument('-prom', type=str, metavar='prom_file', default=None, help='Name of Prometheus textfile with the same summary, '+
+                        'for the node_exporter textfile collector [none]')
+    parser.add_argument('-timings', action='store_true', help='Print the wall time and number of calls of each stage (reading, parsing, '+
+                        'computing and writing) at the end of the run')
+    parser.add_argument('-profile', type=str, metavar='profile_file', default=None, help='Run under cProfile and write the statistics to '+
+                        'profile_file, for viewing with pstats [none]')
+    args = parser.parse_args()
 
-#gather sample info from popfile, skip pop=-9
-print('\nGathering info from sample info file, skipping samples where population is -9:')
-infofile = open(args.si,'r')
-header = infofile.readline()
-num_samples = 0
-incl_samples = 0
-samplearray = []
-for line in infofile:
-    pop = line.split() [4]
-    samplearray.append(pop)
-    if pop != '-9':
-        num_samples += 1
-        incl_samples += 1
-    else:
-        num_samples += 1
-infofile.close()
-print('Found '+str(num_samples)+' samples, of which '+str(incl_samples)+' will be included in output file')
+    #check that at least one output was requested
+    if args.base == None and args.cat == None:
+        print('ERROR: at least one of -base or -cat must be given!\n\n')
+        quit()
+    if args.arch and args.base == None:
+        print('ERROR: -base is required to name cluster files in the -arch archive!\n\n')
+        quit()
 
-percent10 = round(num_clusters*0.1,0)
-cluster_count = 0
-target = percent10
-percent = 10
+    print('Gathering info from sample info file, skipping samples where population is -9:')
+    timings = Timings() if args.timings or args.summary or args.prom else None
+    summary = RunSummary(__file__, timings) if args.summary or args.prom else None
+    follow = Follow(args.i, pid=args.follow_pid, timeout=args.follow_timeout) if args.follow else None
+    try:
+        run_profiled(args.profile, out2fasta, args.i, args.si, args.na, args.hemi, args.base, args.arch, args.cat, args.threads,
+                     args.variable_only, timings=timings,
+                     progress=Progress(args.progress, args.progress_kv), summary=summary, incremental=args.incremental,
+                     follow=follow)
+    except ValueError as e:
+        print('ERROR: '+str(e)+'!\n\n')
+        quit()
+    if args.timings:
+        print('\nTimings:\n'+timings.report())
+    if summary:
+        summary.write(args.summary, args.prom)
 
-print('\nGathering cluster data, writing fasta file for each cluster\n\nAnalyzed:\n')
-infile = open(args.i,'r')
-for z in range(num_clusters):
-    #define cluster number, skip line 2
-    cluster = infile.readline().split() [1]
-    header2 = infile.readline()
+    print('\nFinished!!\n')
 
-    locus_array = []
-    for k in range(num_samples):
-        if samplearray[k] != '-9':
-            data = infile.readline().split()
-            locus_array.append(data)
-            data = infile.readline().split()
-            locus_array.append(data)
-        else:
-            infile.readline()
-            infile.readline()
-
-    fasta_file = open(args.base+'_clstr_'+cluster+'.fasta','w')
-    
-    #randomly define allele 1 and 2, write to individual nexus file or interleave file
-    for i in range(incl_samples):
-        x = random.randint(1,2)
-
-        if int(locus_array[i*2][7][0]) == 0:
-            if args.na == 1:
-                fasta_file.write('>'+locus_array[i*2][0]+'\nN\n')
-            else: #args.na == 2
-                fasta_file.write('>'+locus_array[i*2][0]+'a\nN\n')
-                fasta_file.write('>'+locus_array[i*2+1][0]+'b\nN\n')
-
-        elif int(locus_array[i*2][7][0]) == 1:
-            if args.na == 1:
-                if x ==1:
-                    fasta_file.write('>'+locus_array[i*2][0]+'\n'+locus_array[i*2][1]+'\n')
-                else:
-                    fasta_file.write('>'+locus_array[i*2+1][0]+'\n'+locus_array[i*2+1][1]+'\n')
-            else: #args.na == 2
-                fasta_file.write('>'+locus_array[i*2][0]+'a\n'+locus_array[i*2][1]+'\n')
-                fasta_file.write('>'+locus_array[i*2+1][0]+'b\n'+locus_array[i*2+1][1]+'\n')
-
-        elif int(locus_array[i*2][7][0]) > 1:
-            if args.hemi == 1:
-                if args.na == 1:
-                    fasta_file.write('>'+locus_array[i*2][0]+'\n'+locus_array[i*2][1]+'\n')
-                else: #args.na == 2
-                    fasta_file.write('>'+locus_array[i*2][0]+'a\n'+locus_array[i*2][1]+'\n')
-                    fasta_file.write('>'+locus_array[i*2+1][0]+'b\nN\n')
-            else:
-                if args.na == 1:
-                    fasta_file.write('>'+locus_array[i*2][0]+'\nN\n')
-                else: #args.na == 2
-                    fasta_file.write('>'+locus_array[i*2][0]+'a\nN\n')
-                    fasta_file.write('>'+locus_array[i*2+1][0]+'b\nN\n')
-                   
-    fasta_file.close()
-
-    cluster_count += 1
-    if cluster_count == target:
-        print(str(cluster_count)+' clusters ~ '+str(percent)+'%')
-        target = target + percent10
-        percent = percent + 10
-
-infile.close()
-print('\nFinished!!\n')
+if __name__ == '__main__':
+    main()
@@ -25,125 +25,62 @@
 #assume gap chars and indels are not OK
 	#recode as pseudo-SNPs
 
-import os, sys, argparse
+import argparse
 from argparse import RawTextHelpFormatter
 
-print()
+from outconversions import out2fineRADstructure, Timings, Progress, RunSummary, run_profiled
 
-#create variables that can be entered as arguments in command line
-parser = argparse.ArgumentParser(description=
-                                 'This Python (v3) converts an out (with select clusters) \n'+
-                                 'to an input file for fineRADstructure. It assumes that all \n'+
-                                 'clusters are located on autosomes.\n\n'+
-                                 'This script is free and distributed WITHOUT warranty; without\n'+
-                                 'even the implied warranty of MERCHANTABILITY or FITNESS FOR A\n'+
-                                 'PARTICULAR PURPOSE.', formatter_class=RawTextHelpFormatter)
+def main():
+    print()
 
-parser.add_argument('-i', type=str, metavar='infile', required=True, help='Name of input .out file with selected clusters')
-parser.add_argument('-o', type=str, metavar='outfile', required=True, help='Name of output fineRADstructure file')
-parser.add_argument('-si', type=str, metavar='infofile', required=True, help='Name of sample info file')
-args = parser.parse_args()
+    #create variables that can be entered as arguments in command line
+    parser = argparse.ArgumentParser(description=
+                                     'This Python (v3) converts an out (with select clusters) \n'+
+                                     'to an input file for fineRADstructure. It assumes that all \n'+
+                                     'clusters are located on autosomes.\n\n'+
+                                     'This script is free and distributed WITHOUT warranty; without\n'+
+                                     'even the implied warranty of MERCHANTABILITY or FITNESS FOR A\n'+
+                                     'PARTICULAR PURPOSE.', formatter_class=RawTextHelpFormatter)
 
-def transform(genotypes):
-    all_genos = [item for sublist in genotypes for item in sublist]
-    uni_genos = list(set(all_genos))
-    if '' in uni_genos:
-        uni_genos.pop(uni_genos.index(''))
-    if uni_genos == ['.']:
-        genotypes=[]
-    else:
-        gaps = False
-        indels = False
-        for i in uni_genos:
-            if '-' in i:
-                gaps = True
-            elif '0' in i:
-                indels = True
-        if gaps == True:
-            #find columns with gaps
-            gap_pos = []
-            for i in uni_genos:
-                temp = list(i)
-                if '-' in temp:
-                    gap_pos.append([j for j in range(len(temp)) if temp[j] == '-' ])
-            gap_pos = [item for sublist in gap_pos for item in sublist]
-            gap_pos = list(set(gap_pos))
-            gap_pos.sort()
-                       
-            #find common base in those columns
-            acgt = ['A','C','G','T']
-            common = []
-            for i in gap_pos:
-                states = [all_genos[j][i] for j in range(len(all_genos)) if all_genos[j] != '']
-                counts = [states.count(j) for j in acgt]
-                common.append(acgt[counts.index(max(counts))])
-            
-            #change gaps in those columns to common base
-            for i,j in zip(gap_pos,common):
-                for x in range(len(genotypes)):
-                    if genotypes[x][0] != '':
-                        if genotypes[x][0][i] == '-':
-                            genotypes[x][0] = genotypes[x][0][:i] + j + genotypes[x][0][i+1:]
-                        if genotypes[x][1][i] == '-':
-                            genotypes[x][1] = genotypes[x][1][:i] + j + genotypes[x][1][i+1:]
+    parser.add_argument('-i', type=str, metavar='infile', required=True, help='Name of input .out file with selected clusters,\n'+
+                        'or - to read from standard input')
+    parser.add_argument('-o', type=str, metavar='outfile', required=True, help='Name of output fineRADstructure file')
+    parser.add_argument('-si', type=str, metavar='infofile', required=True, help='Name of sample info file')
+    parser.add_argument('-processes', type=int, metavar='processes', default=0, help='Number of worker processes converting clusters,\n'+
+                        'output keeps the order of the clusters. 0=convert in the\n'+
+                        'main process [0]')
+    parser.add_argument('-progress', type=float, metavar='seconds', default=10, help='Interval between progress reports, with clusters\n'+
+                        'and bytes read per second, estimated time left and memory\n'+
+                        'use [10]')
+    parser.add_argument('-progress_kv', action='store_true', help='Write progress reports as key=value pairs after the\n'+
+                        'word PROGRESS, for scheduler logs')
+    parser.add_argument('-summary', type=str, metavar='json_file', default=None, help='Name of JSON file with a summary of the run:\n'+
+                        'clusters read, samples included and excluded, values of\n'+
+                        'each output (e.g. characters written), wall time per\n'+
+                        'stage, throughput and peak memory [none]')
+    parser.add_argument('-prom', type=str, metavar='prom_file', default=None, help='Name of Prometheus textfile with the same summary,\n'+
+                        'for the node_exporter textfile collector [none]')
+    parser.add_argument('-timings', action='store_true', help='Print the wall time and number of calls of each stage\n'+
+                        '(reading, parsing, computing and writing) at the end of the run')
+    parser.add_argument('-profile', type=str, metavar='profile_file', default=None, help='Run under cProfile and write the statistics to\n'+
+                        'profile_file [none]')
+    args = parser.parse_args()
 
-            
-        genotypes = [i[0]+'/'+i[1] if i[0] != i[1] else i[0] for i in genotypes]
-        if indels == True:
-            genotypes = [i.replace('0','A') for i in genotypes]
-            genotypes = [i.replace('1','T') for i in genotypes]
-       
-    return(genotypes)
+    print('Gathering info from sample info file, skipping samples where population is -9:')
+    timings = Timings() if args.timings or args.summary or args.prom else None
+    summary = RunSummary(__file__, timings) if args.summary or args.prom else None
+    try:
+        run_profiled(args.profile, out2fineRADstructure, args.i, args.si, args.o, args.processes, timings=timings,
+                     progress=Progress(args.progress, args.progress_kv), summary=summary)
+    except ValueError as e:
+        print('ERROR: '+str(e)+'!\n\n')
+        quit()
+    if args.timings:
+        print('\nTimings:\n'+timings.report())
+    if summary:
+        summary.write(args.summary, args.prom)
 
-outfile = open(args.o,'w')
+    print('\nFinished!!\n\n')
 
-#count number of clusters in input file
-print('Counting number of clusters in input file:')
-infile = open(args.i,'r')
-file = infile.read()
-num_clusters = file.count('Clstr')
-print('Found '+str(num_clusters)+' clusters in input .out file')
-infile.close()
-
-#gather sample info from popfile, skip pop=-9
-print('\nGathering info from sample info file, skipping samples where population is -9:')
-pops = []
-incl_samples = []
-infofile = open(args.si,'r')
-header = infofile.readline()
-sample_count = 0
-for line in infofile:
-    pop = line.split() [4]
-    pops.append(pop)
-    sample_count += 1
-    if pop != '-9':
-        incl_samples.append(line.split()[1])
-infofile.close()
-outfile.write('\t'.join(incl_samples)+'\n')
-print('Found '+str(sample_count)+', of which '+str(len(incl_samples))+' will be included in output file')
-
-#convert genotypes for fineRADstructure
-print('\nConverting genotypes for use in fineRADstructure')
-infile = open(args.i,'r')
-for line in infile:
-    if 'Clstr' in line:
-        infile.readline()
-        genos = []
-        for i in range(sample_count):
-            if pops[i] != '-9':
-                data1 = infile.readline().split()
-                data2 = infile.readline().split()
-                genos.append([data1[2],data2[2],data1[7]])
-            else:
-                infile.readline()
-                infile.readline()
-        genos = [['',''] if i[2] != '1' else [i[0],i[1]] for i in genos]                
-        genos = transform(genos)
-        
-        if genos != []:
-            outfile.write('\t'.join(genos)+'\n')
-
-outfile.close()
-
-print('\nFinished!!\n\n')
-            
+if __name__ == '__main__':
+    main()
@@ -10,7 +10,11 @@
 ## Copyright (c) 2011-2017 Boston University. All rights reserved.
 ##
 ## This Python (v3) script parses a defined list (or inverse of list)
-## of clusters to a separate .out file
+## of clusters to a separate .out file, or draws random samples of
+## clusters (-sample) to separate .out files in one pass. Clusters
+## can also be filtered by the genotypes of the included samples
+## (-min_good, -min_pop_cov, -min_sites, -max_sites, -min_haps,
+## -max_haps, -max_len and -max_het)
 ##
 ## This script is free and distributed WITHOUT warranty; without
 ## even the implied warranty of MERCHANTABILITY or FITNESS FOR A
@@ -18,87 +22,174 @@
 ##
 ######################################################################
 
-import sys, os, argparse
+import sys, argparse
 from argparse import RawTextHelpFormatter
 
-print()
+from outconversions import read_sample_info, read_cluster_list, read_cluster_strata, parse_clusters, sample_clusters, ClusterFilter, Timings, Progress, RunSummary, run_profiled
 
-#create variables that can be entered as arguments in command line
-parser = argparse.ArgumentParser(description=
-                                 'This Python (v3) script parses a defined list (or inverse of list)\n'+
-                                 'of clusters to a separate .out file\n\n'+
-                                 'This script is free and distributed WITHOUT warranty; without\n'+
-                                 'even the implied warranty of MERCHANTABILITY or FITNESS FOR A\n'+
-                                 'PARTICULAR PURPOSE.', formatter_class=RawTextHelpFormatter)
+def main():
+    #create variables that can be entered as arguments in command line
+    parser = argparse.ArgumentParser(description=
+                                     'This Python (v3) script parses a defined list (or inverse of list)\n'+
+                                     'of clusters to a separate .out file, or draws random samples of\n'+
+                                     'clusters (-sample) to separate .out files in one pass. Clusters\n'+
+                                     'can also be filtered by the genotypes of the included samples\n'+
+                                     '(-min_good, -min_pop_cov, -min_sites, -max_sites, -min_haps,\n'+
+                                     '-max_haps, -max_len and -max_het)\n\n'+
+                                     'This script is free and distributed WITHOUT warranty; without\n'+
+                                     'even the implied warranty of MERCHANTABILITY or FITNESS FOR A\n'+
+                                     'PARTICULAR PURPOSE.', formatter_class=RawTextHelpFormatter)
 
-parser.add_argument('-i', type=str, metavar='infile', required=True, help='Name of input .out file for cluster parsing')
-parser.add_argument('-o', type=str, metavar='outfile', required=True, help='Name of output .out file for parsed clusters')
-parser.add_argument('-ns', type=int, metavar='num_samples', required=True, help='Number of samples in input outfile')
-parser.add_argument('-l', type=str, metavar='cluster_list', required=True, help='Name of text file containing list of target clusters')
-parser.add_argument('-inv',type=str, metavar='inverse_list', default='False', help='True or False: Parse inverse of list [False]')
-args = parser.parse_args()
+    parser.add_argument('-i', type=str, metavar='infile', required=True, help='Name of input .out file for cluster parsing,\n'+
+                        '- to read from standard input')
+    parser.add_argument('-o', type=str, metavar='outfile', required=True, help='Name of output .out file for parsed clusters,\n'+
+                        '- to write to standard output (e.g. to pipe the clusters\n'+
+                        'into a conversion script with -i -). With -sample, base\n'+
+                        'name of the files of the samples: outfile_#.out')
+    parser.add_argument('-ns', type=int, metavar='num_samples', required=True, help='Number of samples in input outfile')
+    parser.add_argument('-l', type=str, metavar='cluster_list', default=None, help='Name of text file containing list of target clusters\n'+
+                        '(required without -sample or a filter)')
+    parser.add_argument('-inv',type=str, metavar='inverse_list', default='False', help='True or False: Parse inverse of list [False]')
+    parser.add_argument('-sample', type=int, metavar='sample_size', default=None, help='Instead of parsing a list, write random samples of\n'+
+                        'sample_size clusters, drawn in one pass over infile [none]')
+    parser.add_argument('-reps', type=int, metavar='replicates', default=1, help='Number of independent random samples, for -sample [1]')
+    parser.add_argument('-strata', type=str, metavar='strata_file', default=None, help='Name of text file with a cluster number and a stratum\n'+
+                        '(e.g. chromosome) per line; sample_size clusters are\n'+
+                        'drawn from each stratum and clusters that are not listed\n'+
+                        'are skipped, for -sample [none]')
+    parser.add_argument('-index', action='store_true', help='Write only the cluster numbers of each sample to\n'+
+                        'outfile_#.txt (a cluster list for -l), for -sample')
+    parser.add_argument('-seed', type=int, metavar='seed', default=None, help='Seed of the random samples, for repeatable samples [none]')
+    parser.add_argument('-si', type=str, metavar='infofile', default=None, help='Name of sample info file: filters only look at samples\n'+
+                        'whose population is not -9, and -min_pop_cov uses the\n'+
+                        'populations [none: all samples, for filters]')
+    parser.add_argument('-min_good', type=int, metavar='samples', default=None, help='Keep clusters with at least this many samples with a\n'+
+                        'good genotype (flag 1) [none]')
+    parser.add_argument('-min_pop_cov', type=float, metavar='proportion', default=None, help='Keep clusters where at least this proportion of the\n'+
+                        'samples of every population have a genotype (flag\n'+
+                        'other than 0), needs -si [none]')
+    parser.add_argument('-min_sites', type=int, metavar='sites', default=None, help='Keep clusters with at least this many variable sites [none]')
+    parser.add_argument('-max_sites', type=int, metavar='sites', default=None, help='Keep clusters with at most this many variable sites [none]')
+    parser.add_argument('-min_haps', type=int, metavar='haplotypes', default=None, help='Keep clusters with at least this many haplotypes [none]')
+    parser.add_argument('-max_haps', type=int, metavar='haplotypes', default=None, help='Keep clusters with at most this many haplotypes [none]')
+    parser.add_argument('-max_len', type=int, metavar='length', default=None, help='Keep clusters whose longest sequence is at most this\n'+
+                        'long [none]')
+    parser.add_argument('-max_het', type=float, metavar='proportion', default=None, help='Keep clusters where at most this proportion of the\n'+
+                        'samples with a good genotype are heterozygous (a screen\n'+
+                        'for paralogs) [none]')
+    parser.add_argument('-progress', type=float, metavar='seconds', default=10, help='Interval between progress reports, with clusters\n'+
+                        'and bytes read per second, estimated time left and memory\n'+
+                        'use [10]')
+    parser.add_argument('-progress_kv', action='store_true', help='Write progress reports as key=value pairs after the\n'+
+                        'word PROGRESS, for scheduler logs')
+    parser.add_argument('-summary', type=str, metavar='json_file', default=None, help='Name of JSON file with a summary of the run:\n'+
+                        'clusters read, samples included and excluded, values of\n'+
+                        'each output (e.g. characters written), wall time per\n'+
+                        'stage, throughput and peak memory [none]')
+    parser.add_argument('-prom', type=str, metavar='prom_file', default=None, help='Name of Prometheus textfile with the same summary,\n'+
+                        'for the node_exporter textfile collector [none]')
+    parser.add_argument('-timings', action='store_true', help='Print the wall time and number of calls of each stage\n'+
+                        '(reading, parsing, computing and writing) at the end of the run')
+    parser.add_argument('-profile', type=str, metavar='profile_file', default=None, help='Run under cProfile and write the statistics to\n'+
+                        'profile_file [none]')
+    args = parser.parse_args()
 
-outfile = open(args.o,'w')
+    #with clusters written to standard output, messages go to standard error
+    if args.o == '-':
+        sys.stdout = sys.stderr
+    print()
 
-#count number of clusters in input file
-print('Counting number of clusters in input file')
-infile = open(args.i,'r')
-file = infile.read()
-num_clusters = file.count('Clstr')
-print('Found '+str(num_clusters)+' clusters in input .out file')
-infile.close()
+    cluster_filter = build_filter(args)
+    if args.l == None and args.sample == None and cluster_filter == None:
+        print('ERROR: a list of clusters (-l), a sample size (-sample) or a filter is required!\n\n')
+        quit()
+    if args.l == None and args.inv == 'True':
+        print('ERROR: -inv needs a list of clusters (-l)!\n\n')
+        quit()
+    if args.l != None and args.sample != None:
+        print('ERROR: -l and -sample cannot be used together!\n\n')
+        quit()
+    if args.sample != None and args.o == '-':
+        print('ERROR: samples are written to separate files and cannot be written to standard output!\n\n')
+        quit()
+    if args.sample != None:
+        sample(args, cluster_filter)
+        return
 
-parse_list = []
-#count number of clusters to parse
-#add clusters to parse to list
-print('\nGathering information on clusters to parse')
-line_count = 0
-parsefile = open(args.l,'r')
-for line in parsefile:
-    parse_list.append(str(line.strip('\n')))
-    line_count += 1
-print('Found '+str(line_count)+' clusters in list')
-parsefile.close()
+    #add clusters to parse to list
+    parse_list = None
+    if args.l != None:
+        print('Gathering information on clusters to parse')
+        parse_list = read_cluster_list(args.l)
+        print('Found '+str(len(parse_list))+' clusters in list')
 
-parse_count = 0
-inverse_count = 0
-print('\nParsing clusters')
-#loop for the range of the number of clusters
-infile = open(args.i,'r')
-for i in range(int(num_clusters)):
-    #define cluster number, skip line 2
-    header1 = infile.readline()
-    header1s = header1.split()
-    cluster = header1s[1]
+    print('\nParsing clusters')
+    timings = Timings() if args.timings or args.summary or args.prom else None
+    summary = RunSummary(__file__, timings) if args.summary or args.prom else None
+    try:
+        parse_count = run_profiled(args.profile, parse_clusters, args.i, args.o, args.ns, parse_list, args.inv == 'True', timings=timings,
+                                   progress=Progress(args.progress, args.progress_kv), summary=summary, cluster_filter=cluster_filter)
+    except ValueError as e:
+        print('ERROR: '+str(e)+'!\n\n')
+        quit()
+    if args.timings:
+        print('\nTimings:\n'+timings.report())
+    if summary:
+        summary.write(args.summary, args.prom)
+    if cluster_filter:
+        print('\nFiltered clusters:\n'+cluster_filter.report().rstrip('\n'))
+    print('\n'+str(parse_count)+' clusters written to '+args.o)
 
-    if str(cluster) in parse_list:
-        if args.inv == 'False':
-            parse_count += 1
-            outfile.write(header1)
-            for i in range((args.ns*2)+1):
-                data = infile.readline()
-                outfile.write(data)
-        else:
-            for i in range((args.ns*2)+1):
-                data = infile.readline()
+    print('\nFinished!!\n')
 
-    else:
-        if args.inv == 'True':
-            inverse_count += 1
-            outfile.write(header1)
-            for i in range((args.ns*2)+1):
-                data = infile.readline()
-                outfile.write(data)
-        else:
-            for i in range((args.ns*2)+1):
-                data = infile.readline()
+def build_filter(args):
+    #ClusterFilter with the predicates given as arguments, None without any
+    include = None
+    pops = None
+    if args.si:
+        samples = read_sample_info(args.si)
+        if samples.num_samples != args.ns:
+            print('ERROR: sample info file has '+str(samples.num_samples)+' samples, not '+str(args.ns)+'!\n\n')
+            quit()
+        include = samples.include
+        pops = samples.pops
+    elif args.min_pop_cov != None:
+        print('ERROR: -min_pop_cov needs a sample info file (-si)!\n\n')
+        quit()
+    cluster_filter = ClusterFilter(include, pops, min_good=args.min_good, min_pop_coverage=args.min_pop_cov,
+                                   min_sites=args.min_sites, max_sites=args.max_sites, min_haps=args.min_haps,
+                                   max_haps=args.max_haps, max_length=args.max_len, max_het=args.max_het)
+    if not cluster_filter.active():
+        return None
+    return cluster_filter
 
-infile.close()
-outfile.close()
+def sample(args, cluster_filter=None):
+    strata = None
+    if args.strata:
+        print('Gathering strata of clusters')
+        strata = read_cluster_strata(args.strata)
+        print('Found '+str(len(strata))+' clusters in '+str(len(set(strata.values())))+' strata')
 
-if args.inv == 'False':
-    print('\n'+str(parse_count)+' clusters written to '+args.o)
-else:
-    print('\n'+str(inverse_count)+' clusters written to '+args.o)
+    print('\nSampling '+str(args.reps)+' x '+str(args.sample)+' clusters'+(' per stratum' if strata != None else ''))
+    timings = Timings() if args.timings or args.summary or args.prom else None
+    summary = RunSummary(__file__, timings) if args.summary or args.prom else None
+    try:
+        sizes = run_profiled(args.profile, sample_clusters, args.i, args.o, args.ns, args.sample, args.reps, strata, args.index, args.seed,
+                             timings=timings, progress=Progress(args.progress, args.progress_kv), summary=summary,
+                             cluster_filter=cluster_filter)
+    except ValueError as e:
+        print('ERROR: '+str(e)+'!\n\n')
+        quit()
+    if args.timings:
+        print('\nTimings:\n'+timings.report())
+    if summary:
+        summary.write(args.summary, args.prom)
+    if cluster_filter:
+        print('\nFiltered clusters:\n'+cluster_filter.report().rstrip('\n'))
+    extension = '.txt' if args.index else '.out'
+    print('\n'+str(sum(sizes))+' clusters written to '+args.o+'_1'+extension+' to '+args.o+'_'+str(args.reps)+extension)
+
+    print('\nFinished!!\n')
 
-print('\nFinished!!\n')
+if __name__ == '__main__':
+    main()
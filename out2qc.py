@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+##################################
+##
+## out2qc.py
+##
+## Version 1.00 -- 19 October 2026
+##
+## This Python (v3) script writes quality control tables of an out
+## file in a single pass: for each sample, its missing (flag 0) and
+## low depth or flagged (flag >1) genotypes and its heterozygosity,
+## and for each cluster, its coverage, number of SNPs/indels and
+## haplotypes, and heterozygosity. With a list of Z-linked clusters,
+## heterozygosity on the Z chromosome is compared with that of the
+## other clusters to flag samples whose sex in the sample info file
+## is contradicted (females are haploid on Z). Samples with a "-9" in
+## the population column of the sample info file are skipped.
+##
+## This script is free and distributed WITHOUT warranty; without
+## even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+## PARTICULAR PURPOSE.
+##
+##################################
+
+import argparse
+from argparse import RawTextHelpFormatter
+
+from outconversions import out2qc, read_cluster_list, Timings, Progress, RunSummary, ClusterCache, Follow, run_profiled
+
+def main():
+    print()
+
+    #create variables that can be entered as arguments in command line
+    parser = argparse.ArgumentParser(description=
+                                     'This Python (v3) script writes quality control tables of an out\n'+
+                                     'file in a single pass: for each sample, its missing (flag 0) and\n'+
+                                     'low depth or flagged (flag >1) genotypes and its heterozygosity,\n'+
+                                     'and for each cluster, its coverage, number of SNPs/indels and\n'+
+                                     'haplotypes, and heterozygosity. With a list of Z-linked clusters,\n'+
+                                     'heterozygosity on the Z chromosome is compared with that of the\n'+
+                                     'other clusters to flag samples whose sex in the sample info file\n'+
+                                     'is contradicted (females are haploid on Z). Samples with a "-9" in\n'+
+                                     'the population column of the sample info file are skipped.\n\n'+
+                                     'This script is free and distributed WITHOUT warranty; without\n'+
+                                     'even the implied warranty of MERCHANTABILITY or FITNESS FOR A\n'+
+                                     'PARTICULAR PURPOSE.', formatter_class=RawTextHelpFormatter)
+
+    parser.add_argument('-i', type=str, metavar='infile', required=True, help='Name of input .out file,\n'+
+                        'or - to read from standard input')
+    parser.add_argument('-base', type=str, metavar='basename', required=True, help='Base name of output files: basename_samples.tsv\n'+
+                        'and basename_loci.tsv')
+    parser.add_argument('-si', type=str, metavar='infofile', required=True, help='Name of sample info file')
+    parser.add_argument('-z', type=str, metavar='zlinked_list', default=None, help='Name of text file containing list of Z-linked\n'+
+                        'clusters, to check the sex of each sample [none]')
+    parser.add_argument('-zratio', type=float, metavar='ratio', default=0.2, help='Samples are inferred to be female when their Z\n'+
+                        'heterozygosity is at most this ratio of that of the\n'+
+                        'other clusters [0.2]')
+    parser.add_argument('-zmin', type=int, metavar='genotypes', default=10, help='Minimum number of good Z-linked genotypes of a\n'+
+                        'sample to infer its sex [10]')
+    parser.add_argument('-cache', type=str, metavar='cache_file', default=None, help='Name of SQLite file with parsed clusters of .out files.\n'+
+                        'Reruns on the same .out file (e.g. with another sample info\n'+
+                        'file) read the clusters from it instead of parsing the file\n'+
+                        'again [none]')
+    parser.add_argument('-cache_size', type=int, metavar='megabytes', default=2048, help='Size of the cache; clusters of the least recently\n'+
+                        'used .out files are removed when it is larger [2048]')
+    parser.add_argument('-follow', action='store_true', help='Read infile while the pipeline is still writing it:\n'+
+                        'each cluster is counted as soon as it is complete, and the\n'+
+                        'run ends when infile.done is written (one left by a previous\n'+
+                        'run is ignored), the -follow_pid process exits or infile did\n'+
+                        'not grow for -follow_timeout seconds')
+    parser.add_argument('-follow_pid', type=int, metavar='pid', default=None, help='Process ID of the program writing infile, for\n'+
+                        '-follow [none]')
+    parser.add_argument('-follow_timeout', type=float, metavar='seconds', default=0, help='End -follow when infile did not grow for this\n'+
+                        'many seconds, 0=never [0]')
+    parser.add_argument('-progress', type=float, metavar='seconds', default=10, help='Interval between progress reports, with clusters\n'+
+                        'and bytes read per second, estimated time left and memory\n'+
+                        'use [10]')
+    parser.add_argument('-progress_kv', action='store_true', help='Write progress reports as key=value pairs after the\n'+
+                        'word PROGRESS, for scheduler logs')
+    parser.add_argument('-summary', type=str, metavar='json_file', default=None, help='Name of JSON file with a summary of the run:\n'+
+                        'clusters read, samples included and excluded, values of\n'+
+                        'each output (e.g. characters written), wall time per\n'+
+                        'stage, throughput and peak memory [none]')
+    parser.add_argument('-prom', type=str, metavar='prom_file', default=None, help='Name of Prometheus textfile with the same summary,\n'+
+                        'for the node_exporter textfile collector [none]')
+    parser.add_argument('-timings', action='store_true', help='Print the wall time and number of calls of each stage\n'+
+                        '(reading, parsing, computing and writing) at the end of the run')
+    parser.add_argument('-profile', type=str, metavar='profile_file', default=None, help='Run under cProfile and write the statistics to\n'+
+                        'profile_file [none]')
+    args = parser.parse_args()
+
+    zlinked = None
+    if args.z:
+        zlinked = read_cluster_list(args.z)
+
+    print('Gathering info from sample info file, skipping samples where population is -9:')
+    timings = Timings() if args.timings or args.summary or args.prom else None
+    summary = RunSummary(__file__, timings) if args.summary or args.prom else None
+    follow = Follow(args.i, pid=args.follow_pid, timeout=args.follow_timeout) if args.follow else None
+    cache = ClusterCache(args.cache, args.cache_size*1024*1024) if args.cache else None
+    try:
+        run_profiled(args.profile, out2qc, args.i, args.si, args.base+'_samples.tsv', args.base+'_loci.tsv', zlinked,
+                     args.zratio, args.zmin, timings=timings, progress=Progress(args.progress, args.progress_kv),
+                     summary=summary, cache=cache, follow=follow)
+    except ValueError as e:
+        print('ERROR: '+str(e)+'!\n\n')
+        quit()
+    if cache:
+        cache.close()
+    if args.timings:
+        print('\nTimings:\n'+timings.report())
+    if summary:
+        summary.write(args.summary, args.prom)
+
+    print('\n\nFinished!!\n\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""Conversion of .out files from the ddRAD-seq-Pipeline.
+
+The out2*.py scripts are thin command line wrappers around this package, so
+conversions can also be run from Python without starting a new interpreter:
+
+    from outconversions import read_sample_info, convert, FastaWriter, StructureWriter
+    samples = read_sample_info('samples.txt')
+    convert('clusters.out', samples, [FastaWriter(samples, 1, 1, base='run1'),
+                                      StructureWriter(samples, 'run1.str', 'HAP')])
+
+Nothing is read or written when the package is imported.
+"""
+
+from .samples import SampleInfo, read_sample_info
+from .cluster import Cluster
+from .reader import read_blocks, follow_blocks, parse_block, read_clusters
+from .output import ClusterFiles
+from .convert import convert
+from .cache import ClusterCache
+from .follow import Follow
+from .timing import Timings, run_profiled
+from .progress import Progress
+from .summary import RunSummary
+from .alleles import draw_alleles
+from .packed import PackedColumn, pack2, unpack2, count2
+from .fasta import FastaWriter, out2fasta
+from .nexus import NexusWriter, out2nexus
+from .phylip import PhylipWriter, cluster_lengths, out2phylip
+from .structure import StructureWriter, out2structure
+from .fineradstructure import FineRADstructureWriter, transform, out2fineRADstructure
+from .phist import PhistWriter, calculate_phist, allele_counts, differences, out2phist
+from .qc import QCWriter, out2qc
+from .filters import ClusterFilter
+from .parseclusters import read_cluster_list, read_cluster_strata, parse_clusters, Reservoirs, sample_clusters
@@ -0,0 +1,27 @@
+def draw_alleles(cluster, i, x, na, hemi):
+    """Return [name, sequence] of the alleles written for sample i in nexus and phylip files.
+
+    x is the random draw (1 or 2) of the first or second allele. sequence is
+    None where missing data are written.
+    """
+    flag = cluster.flag(i)
+    a = cluster.sample(i*2)
+    b = cluster.sample(i*2+1)
+    if flag == 0 or (flag > 1 and hemi == 0):
+        if na == 1:
+            return [[a, None]]
+        return [[a+'a', None], [b+'b', None]]
+    elif flag == 1:
+        if x == 1:
+            if na == 1:
+                return [[a, cluster.seq(i*2)]]
+            return [[a+'a', cluster.seq(i*2)], [b+'b', cluster.seq(i*2+1)]]
+        if na == 1:
+            return [[b, cluster.seq(i*2+1)]]
+        return [[b+'a', cluster.seq(i*2+1)], [a+'b', cluster.seq(i*2)]]
+    else: #flag > 1 and hemi == 1
+        if na == 1:
+            return [[a, cluster.seq(i*2)]]
+        if x == 1:
+            return [[a+'a', cluster.seq(i*2)], [b+'b', None]]
+        return [[b+'a', None], [a+'b', cluster.seq(i*2)]]
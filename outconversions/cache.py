@@ -0,0 +1,204 @@
+import os, time, uuid, sqlite3, hashlib
+from array import array
+
+from .cluster import Cluster
+from .reader import read_blocks, parse_block
+from .timing import stage
+
+#parsed clusters of .out files, kept in an SQLite database so that reruns with
+#another sample info file (dropping samples, regrouping populations) do not parse
+#the text again. Clusters are stored with all samples, keyed by a hash of the
+#contents of the .out file and the position of the cluster in it (cluster numbers
+#do not have to be unique); the included samples are taken from them when they
+#are read. When the stored clusters take more than max_bytes, the clusters of the
+#least recently used .out files are removed.
+#Clusters being parsed are stored under a pending key of their own, COMMIT_CLUSTERS
+#clusters per transaction; no transaction is open between batches, so other jobs
+#sharing the cache are not locked out during a long parse; once the whole file is stored, its clusters are moved to the
+#hash of the file and the files row (which marks a file as cached) is written last
+
+COMMIT_CLUSTERS = 1000
+#pending clusters of jobs that did not finish (e.g. were killed) are removed after a day
+STALE_SECONDS = 24*3600
+
+SCHEMA = '''
+create table if not exists files (fingerprint text primary key, clusters integer, bytes integer, last_used real);
+create table if not exists pending (key text primary key, started real);
+create table if not exists paths (path text primary key, size integer, mtime_ns integer, fingerprint text);
+create table if not exists clusters (fingerprint text, position integer, name text, names text, text_size integer,
+                                     flags blob, haps blob, seqs blob, seq_offsets blob, sites blob, site_offsets blob,
+                                     primary key (fingerprint, position));
+'''
+
+def fingerprint(path):
+    """Return a hash of the contents of a file."""
+    digest = hashlib.blake2b(digest_size=16)
+    inf = open(path,'rb')
+    for chunk in iter(lambda: inf.read(1024*1024), b''):
+        digest.update(chunk)
+    inf.close()
+    return digest.hexdigest()
+
+def from_bytes(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    return values
+
+class ClusterCache:
+    """Parsed clusters of .out files in an SQLite database, limited to max_bytes.
+
+    The hash of a file is kept with its path, size and modification time,
+    so a file is only hashed again when it has changed.
+    """
+    def __init__(self, path, max_bytes=2*1024**3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.db = sqlite3.connect(path, timeout=60)
+        #readers do not block the writer and the writer does not block readers
+        self.db.execute('pragma journal_mode=wal')
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    def fingerprint(self, infile):
+        status = os.stat(infile)
+        path = os.path.abspath(infile)
+        row = self.db.execute('select size, mtime_ns, fingerprint from paths where path = ?', (path,)).fetchone()
+        if row and row[0] == status.st_size and row[1] == status.st_mtime_ns:
+            return row[2]
+        hashed = fingerprint(infile)
+        self.db.execute('insert or replace into paths values (?,?,?,?)', (path, status.st_size, status.st_mtime_ns, hashed))
+        self.db.commit()
+        return hashed
+
+    def cached(self, infile):
+        """Return True when all clusters of infile are in the cache."""
+        key = self.fingerprint(infile)
+        return self.db.execute('select 1 from files where fingerprint = ?', (key,)).fetchone() != None
+
+    def clusters(self, infile, include, timings=None):
+        """Yield a Cluster with the included samples and the size of its text for each cluster of infile.
+
+        Clusters are read from the cache, or parsed from infile and added to
+        the cache when it does not have them.
+        """
+        key = self.fingerprint(infile)
+        if self.db.execute('select 1 from files where fingerprint = ?', (key,)).fetchone():
+            self.db.execute('update files set last_used = ? where fingerprint = ?', (time.time(), key))
+            self.db.commit()
+            yield from self.read(key, include)
+        else:
+            yield from self.parse(infile, key, include, timings)
+
+    def read(self, key, include):
+        names = None
+        subset_names = None
+        everyone = all(include)
+        rows = self.db.execute('select name, names, text_size, flags, haps, seqs, seq_offsets, sites, site_offsets '+
+                               'from clusters where fingerprint = ? order by position', (key,))
+        for row in rows:
+            if row[1] != None:
+                names = tuple(row[1].split('\t'))
+            cluster = Cluster(row[0], names, from_bytes('b', row[3]), from_bytes('h', row[4]), row[5],
+                              from_bytes('l', row[6]), row[7], from_bytes('l', row[8]))
+            if not everyone:
+                cluster = cluster.subset(include, subset_names)
+                subset_names = cluster.names
+            yield cluster, row[2]
+
+    def parse(self, infile, key, include, timings=None):
+        #parse every cluster with all samples, store it and yield the included samples;
+        #stop storing when the clusters of the file alone take more than max_bytes
+        all_samples = [True]*len(include)
+        everyone = all(include)
+        names = None
+        subset_names = None
+        position = 0
+        stored = 0
+        storing = True
+        complete = False
+        rows = []
+        pending = 'pending:'+uuid.uuid4().hex
+        self.db.execute('insert into pending values (?,?)', (pending, time.time()))
+        self.db.commit()
+        inf = open(infile,'r')
+        try:
+            for block in read_blocks(inf, len(include)):
+                with stage(timings, 'parse'):
+                    cluster = parse_block(block, all_samples, names)
+                text_size = sum(len(line) for line in block)
+                if storing:
+                    with stage(timings, 'write (cache)'):
+                        data = (cluster.flags.tobytes(), cluster.haps.tobytes(), cluster.seqs, cluster.seq_offsets.tobytes(),
+                                cluster.sites, cluster.site_offsets.tobytes())
+                        rows.append((pending, position, cluster.name, None if cluster.names is names else '\t'.join(cluster.names),
+                                     text_size)+data)
+                        stored += sum(len(value) for value in data)
+                        if stored > self.max_bytes:
+                            rows = []
+                            self.remove_pending(pending)
+                            storing = False
+                        elif len(rows) == COMMIT_CLUSTERS:
+                            self.insert(rows)
+                            rows = []
+                names = cluster.names
+                position += 1
+                if not everyone:
+                    cluster = cluster.subset(include, subset_names)
+                    subset_names = cluster.names
+                yield cluster, text_size
+            if storing:
+                with stage(timings, 'write (cache)'):
+                    self.insert(rows)
+                    self.store(pending, key, position, stored)
+                    self.evict(key)
+            complete = True
+        finally:
+            inf.close()
+            if storing and not complete:
+                #the generator was closed or failed before the end of the file
+                self.db.rollback()
+                self.remove_pending(pending)
+
+    def insert(self, rows):
+        self.db.executemany('insert into clusters values (?,?,?,?,?,?,?,?,?,?,?)', rows)
+        self.db.commit()
+
+    def store(self, pending, key, clusters, stored):
+        #move the pending clusters to the hash of the file and mark the file as cached, in one
+        #transaction; when another job stored the same file first, its clusters are kept
+        self.db.execute('begin immediate')
+        if self.db.execute('select 1 from files where fingerprint = ?', (key,)).fetchone():
+            self.db.execute('delete from clusters where fingerprint = ?', (pending,))
+        else:
+            self.db.execute('delete from clusters where fingerprint = ?', (key,))
+            self.db.execute('update clusters set fingerprint = ? where fingerprint = ?', (key, pending))
+            self.db.execute('insert into files values (?,?,?,?)', (key, clusters, stored, time.time()))
+        self.db.execute('delete from pending where key = ?', (pending,))
+        self.db.commit()
+
+    def remove_pending(self, pending):
+        self.db.execute('delete from clusters where fingerprint = ?', (pending,))
+        self.db.execute('delete from pending where key = ?', (pending,))
+        self.db.commit()
+
+    def evict(self, keep=None):
+        """Remove the clusters of the least recently used files until the cache is no larger than max_bytes.
+
+        Pending clusters of parses that started more than a day ago are removed as well.
+        """
+        for (pending,) in self.db.execute('select key from pending where started < ?', (time.time()-STALE_SECONDS,)).fetchall():
+            self.remove_pending(pending)
+        files = self.db.execute('select fingerprint, bytes from files order by last_used').fetchall()
+        total = sum(size for key, size in files)
+        for key, size in files:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self.db.execute('delete from clusters where fingerprint = ?', (key,))
+            self.db.execute('delete from files where fingerprint = ?', (key,))
+            total -= size
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,117 @@
+from array import array
+from itertools import accumulate, compress
+
+from .packed import numpy
+
+#columns of the two lines written for each sample in a cluster of an .out file
+SAMPLE = 0
+SEQ = 1
+VARSITES = 2
+HAP = 3
+FLAG = 7
+
+class Cluster:
+    """One cluster of an .out file.
+
+    Holds two rows (one per allele) for each sample in the cluster, so sample k
+    has rows k*2 and k*2+1. Columns are stored compactly: sample names as one
+    tuple (shared between clusters with the same names), genotype flags as
+    int8 (one per sample), haplotype numbers as int16 (-1 where missing), and
+    sequences and varsites each as one bytes buffer with row offsets. Missing
+    sequences and varsites are '.'. The genotype flag of a sample is 0 for
+    missing data, 1 for a good genotype and >1 for low depth or flagged
+    genotypes.
+    """
+    __slots__ = ('name', 'names', 'flags', 'haps', 'seqs', 'seq_offsets', 'sites', 'site_offsets')
+
+    def __init__(self, name, names, flags, haps, seqs, seq_offsets, sites, site_offsets):
+        self.name = name
+        self.names = names
+        self.flags = flags
+        self.haps = haps
+        self.seqs = seqs
+        self.seq_offsets = seq_offsets
+        self.sites = sites
+        self.site_offsets = site_offsets
+
+    @classmethod
+    def from_rows(cls, name, rows, names=None):
+        """Return a Cluster from the split lines of its samples.
+
+        names is the tuple of sample names of a previous cluster, which is
+        reused when the names are the same.
+        """
+        row_names = tuple(data[SAMPLE] for data in rows)
+        if row_names != names:
+            names = row_names
+        flags = array('b', [int(rows[r][FLAG]) for r in range(0, len(rows), 2)])
+        haps = array('h', [-1 if data[HAP] == '.' else int(data[HAP]) for data in rows])
+        seqs = [data[SEQ] for data in rows]
+        sites = [data[VARSITES] for data in rows]
+        return cls(name, names, flags, haps,
+                   ''.join(seqs).encode(), offsets(seqs),
+                   ''.join(sites).encode(), offsets(sites))
+
+    @property
+    def num_samples(self):
+        return len(self.flags)
+
+    def sample(self, r):
+        return self.names[r]
+
+    def seq(self, r):
+        return self.seqs[self.seq_offsets[r]:self.seq_offsets[r+1]].decode()
+
+    def varsites(self, r):
+        return self.sites[self.site_offsets[r]:self.site_offsets[r+1]].decode()
+
+    def hap(self, r):
+        #haplotype number of row r, -1 where missing
+        return self.haps[r]
+
+    def flag(self, k):
+        #genotype flag of sample k
+        return self.flags[k]
+
+    def seq_length(self, r):
+        return self.seq_offsets[r+1]-self.seq_offsets[r]
+
+    def max_length(self):
+        return max(self.seq_length(r) for r in range(len(self.names)))
+
+    def same_sequences(self):
+        #True when there is at most one sequence other than missing ('.')
+        seqs = set(self.seqs[self.seq_offsets[r]:self.seq_offsets[r+1]] for r in range(len(self.names)))
+        seqs.discard(b'.')
+        return len(seqs) < 2
+
+    def subset(self, include, names=None):
+        """Return a Cluster with the samples where include is True.
+
+        names is the tuple of sample names of a previous subset, which is
+        reused when the names are the same.
+        """
+        rows = [x for x in include for allele in (0, 1)]
+        row_names = tuple(compress(self.names, rows))
+        if row_names != names:
+            names = row_names
+        seqs, seq_offsets = take_rows(self.seqs, self.seq_offsets, rows)
+        sites, site_offsets = take_rows(self.sites, self.site_offsets, rows)
+        return Cluster(self.name, names, array('b', compress(self.flags, include)), array('h', compress(self.haps, rows)),
+                       seqs, seq_offsets, sites, site_offsets)
+
+def take_rows(data, row_offsets, rows):
+    #joined strings of the rows where rows is True and their offsets
+    if numpy is not None:
+        lengths = numpy.diff(numpy.frombuffer(row_offsets, numpy.dtype('l')))
+        mask = numpy.array(rows, bool)
+        data = numpy.frombuffer(data, numpy.uint8)[numpy.repeat(mask, lengths)].tobytes()
+        new_offsets = numpy.zeros(int(mask.sum())+1, numpy.dtype('l'))
+        numpy.cumsum(lengths[mask], out=new_offsets[1:])
+        return data, array('l', new_offsets.tobytes())
+    strings = [data[row_offsets[r]:row_offsets[r+1]] for r in compress(range(len(rows)), rows)]
+    return b''.join(strings), offsets(strings)
+
+def offsets(strings):
+    #start of each string in the joined strings, followed by the total length
+    return array('l', accumulate(map(len, strings), initial=0))
@@ -0,0 +1,100 @@
+from .reader import STDIN, open_input, input_size, read_blocks, follow_blocks, parse_block
+from .timing import stage
+from .progress import Progress
+
+def convert(infile, samples, writers, verbose=True, timings=None, progress=None, summary=None, cache=None, follow=None):
+    """Read each cluster of an .out file once and hand it to every writer.
+
+    Writers have a cluster(cluster) method called with a Cluster of the
+    included samples and a finish() method called after the last cluster.
+    Writers may also have an invariant_block(block, include) method, called
+    with the lines of each cluster before it is parsed, that returns True
+    when the writer has nothing more to do for the cluster (e.g. it is
+    invariant); clusters are only parsed for writers that return False.
+    cluster() must give the same result for such clusters, as it is called
+    for every cluster when they are read from cache (a ClusterCache).
+    With timings, the time spent reading, parsing, in each writer's cluster()
+    (compute) and in its finish() (write) is added to timings. Progress is
+    reported with progress, or every 10 seconds when verbose. With summary,
+    the input, samples, clusters read and stats() of each writer are added
+    to summary. With follow (a Follow), infile is still being written: each
+    cluster is converted as soon as it is complete, and the writers are
+    finished once follow tells that the file is complete. infile - is read
+    from standard input.
+    Returns the number of clusters read.
+    """
+    if cache and (follow or infile == STDIN):
+        raise ValueError('the cache can only be used with complete files, not with -follow or standard input')
+    if follow and infile == STDIN:
+        raise ValueError('standard input cannot be followed, it is read until it ends')
+    #progress is based on the amount of the file read
+    if progress == None and verbose:
+        progress = Progress()
+    if progress:
+        progress.start(0 if follow else input_size(infile))
+    read_size = 0
+
+    inf = None
+    if cache:
+        if verbose:
+            if cache.cached(infile):
+                print('\nReading parsed clusters from cache '+cache.path)
+            else:
+                print('\nParsing clusters and adding them to cache '+cache.path)
+        items = cache.clusters(infile, samples.include, timings)
+        read_stage = 'read (cache)'
+    elif follow:
+        if verbose and follow.stale != None:
+            print('\nIgnoring '+follow.marker+', which was written before this run')
+        items = follow_blocks(infile, samples.num_samples, follow)
+        read_stage = 'read (follow)'
+    else:
+        inf = open_input(infile)
+        items = read_blocks(inf, samples.num_samples)
+        read_stage = 'read'
+    if verbose:
+        print('\nAnalyzed:\n')
+    cluster_count = 0
+    names = None
+    writer_names = [type(writer).__name__ for writer in writers]
+    prechecks = [getattr(writer, 'invariant_block', None) for writer in writers]
+    while True:
+        with stage(timings, read_stage):
+            item = next(items, None)
+        if item == None:
+            break
+        if cache:
+            cluster, size = item
+            handled = [False]*len(writers)
+        else:
+            block = item
+            size = sum(len(line) for line in block) if progress else 0
+            with stage(timings, 'precheck'):
+                handled = [check != None and check(block, samples.include) for check in prechecks]
+            if not all(handled):
+                with stage(timings, 'parse'):
+                    cluster = parse_block(block, samples.include, names)
+                names = cluster.names
+        for writer, name, done in zip(writers, writer_names, handled):
+            if not done:
+                with stage(timings, 'compute ('+name+')'):
+                    writer.cluster(cluster)
+
+        cluster_count += 1
+        if progress:
+            read_size += size
+            progress.update(cluster_count, read_size)
+    if inf:
+        inf.close()
+    if progress:
+        progress.finish()
+
+    for writer, name in zip(writers, writer_names):
+        with stage(timings, 'write ('+name+')'):
+            writer.finish()
+    if summary:
+        summary.add_input(infile, samples, cluster_count)
+        for writer, name in zip(writers, writer_names):
+            if hasattr(writer, 'stats'):
+                summary.add_writer(name, writer.stats())
+    return cluster_count
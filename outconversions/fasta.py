@@ -0,0 +1,153 @@
+import random
+
+from .samples import read_sample_info
+from .reader import same_sequences
+from .manifest import Manifest, block_digest
+from .output import ClusterFiles
+from .convert import convert
+
+class FastaWriter:
+    """Fasta file for each cluster and/or one indexed multi-locus fasta file.
+
+    na=1 writes the major allele for low depth or flagged genotypes and a random
+    draw of the first or second allele for good genotypes; na=2 writes both
+    alleles as sample+a and sample+b. hemi=1 writes the major allele of low
+    depth and flagged genotypes (with N for the second allele when na=2),
+    hemi=0 writes them as missing. Missing data are written as a single N.
+    With variable_only, clusters where all included samples have the same
+    sequence are not written. With a manifest, clusters that did not change
+    since the previous run are not parsed and their files are not written
+    again; their records are added to cat from the manifest, which is
+    finished by the caller once the cluster files are closed.
+    """
+    def __init__(self, samples, na, hemi, base=None, cluster_files=None, cat=None, variable_only=False, manifest=None):
+        self.incl_samples = samples.incl_samples
+        self.na = na
+        self.hemi = hemi
+        self.base = base
+        self.cluster_files = cluster_files or ClusterFiles()
+        self.cat = cat
+        self.variable_only = variable_only
+        self.manifest = manifest
+        self.record_count = 0
+        if cat:
+            #multi-locus file with records named Clstr#|sample, indexed with name,
+            #length, offset, bases per line and bytes per line (samtools .fai)
+            self.catfile = open(cat,'w',newline='\n')
+            self.faifile = open(cat+'.fai','w')
+            self.cat_offset = 0
+
+    def records(self, cluster):
+        #randomly define allele 1 and 2, gather fasta records for cluster
+        records = []
+        for i in range(self.incl_samples):
+            x = random.randint(1,2)
+            flag = cluster.flag(i)
+            a = cluster.sample(i*2)
+            b = cluster.sample(i*2+1)
+            if flag == 0 or (flag > 1 and self.hemi == 0):
+                if self.na == 1:
+                    records.append((a,'N'))
+                else: #self.na == 2
+                    records.append((a+'a','N'))
+                    records.append((b+'b','N'))
+            elif flag == 1:
+                if self.na == 1:
+                    if x == 1:
+                        records.append((a,cluster.seq(i*2)))
+                    else:
+                        records.append((b,cluster.seq(i*2+1)))
+                else: #self.na == 2
+                    records.append((a+'a',cluster.seq(i*2)))
+                    records.append((b+'b',cluster.seq(i*2+1)))
+            else: #flag > 1 and self.hemi == 1
+                if self.na == 1:
+                    records.append((a,cluster.seq(i*2)))
+                else: #self.na == 2
+                    records.append((a+'a',cluster.seq(i*2)))
+                    records.append((b+'b','N'))
+        return records
+
+    def invariant_block(self, block, include):
+        if self.variable_only and same_sequences(block, include):
+            return True
+        if self.manifest:
+            name = block[0].split()[1]
+            self.digest = block_digest(block, include)
+            if self.manifest.unchanged(name, self.digest):
+                #the segment has the records only with cat, their number is kept with it
+                segment, count = self.manifest.reuse(name)
+                lines = segment.split('\n')
+                records = [(lines[x][1:], lines[x+1]) for x in range(0, len(lines)-1, 2)]
+                self.record_count += count
+                self.write_cat(name, records)
+                return True
+        return False
+
+    def cluster(self, cluster):
+        if self.variable_only and cluster.same_sequences():
+            return
+        records = self.records(cluster)
+        self.record_count += len(records)
+        text = ''.join('>'+name+'\n'+seq+'\n' for name, seq in records)
+        if self.base:
+            self.cluster_files.write(self.base+'_clstr_'+cluster.name+'.fasta', text)
+        self.write_cat(cluster.name, records)
+        if self.manifest:
+            self.manifest.add(cluster.name, self.digest, [self.base+'_clstr_'+cluster.name+'.fasta'], text if self.cat else '',
+                              len(records))
+
+    def write_cat(self, cluster_name, records):
+        if self.cat:
+            for name, seq in records:
+                name = 'Clstr'+cluster_name+'|'+name
+                header = '>'+name+'\n'
+                self.cat_offset += len(header.encode())
+                self.catfile.write(header+seq+'\n')
+                self.faifile.write(name+'\t'+str(len(seq))+'\t'+str(self.cat_offset)+'\t'+str(len(seq))+'\t'+str(len(seq)+1)+'\n')
+                self.cat_offset += len(seq)+1
+
+    def stats(self):
+        stats = {'records': self.record_count}
+        if self.manifest:
+            stats.update(self.manifest.stats())
+        return stats
+
+    def finish(self):
+        if self.cat:
+            self.catfile.close()
+            self.faifile.close()
+
+def out2fasta(infile, infofile, na, hemi, base=None, arch=None, cat=None, threads=0, variable_only=False, verbose=True,
+              timings=None, progress=None, summary=None, incremental=False, follow=None):
+    """Convert an .out file to a fasta file per cluster and/or a multi-locus fasta file.
+
+    With incremental, a manifest is kept in base_manifest.json and only the
+    files of clusters that changed since the previous run are written. With
+    follow (a Follow), infile is converted while it is being written.
+    """
+    samples = read_sample_info(infofile)
+    manifest = None
+    if incremental:
+        if not base or arch:
+            raise ValueError('incremental runs need -base and cannot write to an -arch archive')
+        manifest = Manifest(base+'_manifest.json', 'fasta na='+str(na)+' hemi='+str(hemi)+' cat='+str(bool(cat))+
+                            ' variable_only='+str(variable_only)+' samples='+','.join(samples.incl_names))
+    if verbose:
+        print('Found '+str(samples.num_samples)+' samples, of which '+str(samples.incl_samples)+' will be included in output file')
+        print('\nGathering cluster data, writing fasta file for each cluster')
+    try:
+        cluster_files = ClusterFiles(arch, threads, timings=timings)
+        writer = FastaWriter(samples, na, hemi, base, cluster_files, cat, variable_only, manifest)
+        num_clusters = convert(infile, samples, [writer], verbose, timings, progress, summary, follow=follow)
+        cluster_files.close()
+        if manifest:
+            manifest.finish()
+    finally:
+        if manifest:
+            manifest.close()
+    if verbose:
+        print('\nConverted '+str(num_clusters)+' clusters')
+        if manifest:
+            print('Wrote files of '+str(manifest.written)+' clusters, '+str(manifest.reused)+' clusters did not change')
+    return num_clusters
@@ -0,0 +1,123 @@
+from .cluster import SEQ, VARSITES, HAP, FLAG
+
+#predicates on the included samples of a cluster of an .out file, evaluated on the
+#lines of the cluster while it is streamed, so clusters are filtered without being
+#parsed: genotype flags are split off the first line of each sample, and the
+#sequence columns only when a predicate needs them
+
+PREDICATES = ['min_good', 'min_pop_coverage', 'min_sites', 'max_sites', 'min_haps', 'max_haps', 'max_length', 'max_het']
+
+class ClusterFilter:
+    """Passes clusters where the included samples meet every predicate that is set (not None).
+
+    min_good - minimum number of samples with a good genotype (flag 1)
+    min_pop_coverage - minimum proportion of the samples of every population
+                       with a genotype (flag other than 0); needs pops
+    min_sites, max_sites - number of variable sites among the alleles
+    min_haps, max_haps - number of haplotypes among the alleles
+    max_length - maximum length of the longest sequence
+    max_het - maximum proportion of the samples with a good genotype that are
+              heterozygous (a screen for paralogs)
+
+    include marks the samples the predicates are evaluated on (all samples
+    when it is None) and pops is the population of each sample. Predicates
+    are checked in the order above and each cluster that fails is counted
+    under the first predicate it fails.
+    """
+    def __init__(self, include=None, pops=None, min_good=None, min_pop_coverage=None, min_sites=None, max_sites=None,
+                 min_haps=None, max_haps=None, max_length=None, max_het=None):
+        self.include = include
+        self.min_good = min_good
+        self.min_pop_coverage = min_pop_coverage
+        self.min_sites = min_sites
+        self.max_sites = max_sites
+        self.min_haps = min_haps
+        self.max_haps = max_haps
+        self.max_length = max_length
+        self.max_het = max_het
+        if min_pop_coverage != None and pops == None:
+            raise ValueError('population coverage needs the population of each sample')
+        #positions of the samples of each population among the included samples
+        self.populations = {}
+        if pops != None:
+            included = [pops[k] for k in range(len(pops)) if include == None or include[k]]
+            for i in range(len(included)):
+                self.populations.setdefault(included[i], []).append(i)
+        self.sequence_predicates = any(getattr(self, name) != None for name in PREDICATES[2:])
+        self.passed = 0
+        self.failed = dict((name, 0) for name in PREDICATES)
+
+    def active(self):
+        """Return True when at least one predicate is set."""
+        return any(getattr(self, name) != None for name in PREDICATES)
+
+    def fail(self, name):
+        self.failed[name] += 1
+        return False
+
+    def passes(self, block):
+        """Return True when the cluster with the lines in block passes every predicate."""
+        samples = [k for k in range((len(block)-2)//2) if self.include == None or self.include[k]]
+        #the genotype flag is the same on both lines of a sample
+        flags = [block[k*2+2].split()[FLAG] for k in samples]
+
+        if self.min_good != None and flags.count('1') < self.min_good:
+            return self.fail('min_good')
+        if self.min_pop_coverage != None:
+            for positions in self.populations.values():
+                genotyped = sum(1 for i in positions if flags[i] != '0')
+                if genotyped/len(positions) < self.min_pop_coverage:
+                    return self.fail('min_pop_coverage')
+        if not self.sequence_predicates:
+            self.passed += 1
+            return True
+
+        #both lines of each sample, split up to the haplotype number
+        rows = []
+        for k in samples:
+            rows.append(block[k*2+2].split(None, HAP+1))
+            rows.append(block[k*2+3].split(None, HAP+1))
+
+        if self.min_sites != None or self.max_sites != None:
+            sites = set(row[VARSITES] for row in rows)
+            sites.discard('.')
+            num_sites = 0
+            if len(sites) > 1:
+                num_sites = sum(1 for alleles in zip(*sites) if len(set(alleles)) > 1)
+            if self.min_sites != None and num_sites < self.min_sites:
+                return self.fail('min_sites')
+            if self.max_sites != None and num_sites > self.max_sites:
+                return self.fail('max_sites')
+
+        if self.min_haps != None or self.max_haps != None:
+            haps = set(row[HAP] for row in rows)
+            haps.discard('.')
+            if self.min_haps != None and len(haps) < self.min_haps:
+                return self.fail('min_haps')
+            if self.max_haps != None and len(haps) > self.max_haps:
+                return self.fail('max_haps')
+
+        if self.max_length != None:
+            if max([len(row[SEQ]) for row in rows if row[SEQ] != '.'] or [0]) > self.max_length:
+                return self.fail('max_length')
+
+        if self.max_het != None:
+            good = [i for i in range(len(flags)) if flags[i] == '1']
+            het = sum(1 for i in good if rows[i*2][HAP] != rows[i*2+1][HAP])
+            if good and het/len(good) > self.max_het:
+                return self.fail('max_het')
+
+        self.passed += 1
+        return True
+
+    def stats(self):
+        stats = {'clusters_passed': self.passed}
+        for name in PREDICATES:
+            if getattr(self, name) != None:
+                stats['failed_'+name] = self.failed[name]
+        return stats
+
+    def report(self):
+        """Return a line per predicate that is set with the number of clusters that failed it."""
+        return ''.join('  '+name+' '+str(getattr(self, name))+': '+str(self.failed[name])+' clusters failed\n'
+                       for name in PREDICATES if getattr(self, name) != None)
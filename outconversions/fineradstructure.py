@@ -0,0 +1,232 @@
+#format RAD-seq data for fineRADstructure
+#assume hemizygous data are not OK
+	#thus, use only genotypes == 1
+#assume gap chars and indels are not OK
+	#recode as pseudo-SNPs
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .samples import read_sample_info
+from .reader import STDIN, read_range, parse_block, block_column
+from .cluster import VARSITES, FLAG
+from .convert import convert
+from .packed import numpy
+from .timing import stage
+from .progress import Progress
+
+ACGT = ['A','C','G','T']
+if numpy is not None:
+    ACGT_BYTES = numpy.frombuffer(b'ACGT', numpy.uint8)
+
+def fill_gaps(genotypes, all_genos, uni_genos):
+    #replace gaps by the most common base (first of A, C, G, T on ties) of their
+    #column among all alleles
+    gap_pos = []
+    for i in uni_genos:
+        temp = list(i)
+        if '-' in temp:
+            gap_pos.append([j for j in range(len(temp)) if temp[j] == '-' ])
+    gap_pos = [item for sublist in gap_pos for item in sublist]
+    gap_pos = list(set(gap_pos))
+    gap_pos.sort()
+
+    #find common base in those columns
+    common = []
+    for i in gap_pos:
+        states = [all_genos[j][i] for j in range(len(all_genos)) if all_genos[j] != '']
+        counts = [states.count(j) for j in ACGT]
+        common.append(ACGT[counts.index(max(counts))])
+
+    #change gaps in those columns to common base
+    for i,j in zip(gap_pos,common):
+        for x in range(len(genotypes)):
+            if genotypes[x][0] != '':
+                if genotypes[x][0][i] == '-':
+                    genotypes[x][0] = genotypes[x][0][:i] + j + genotypes[x][0][i+1:]
+                if genotypes[x][1][i] == '-':
+                    genotypes[x][1] = genotypes[x][1][:i] + j + genotypes[x][1][i+1:]
+
+def fill_gaps_matrix(genotypes, alleles):
+    #same as fill_gaps with the alleles of non-missing genotypes as rows of a
+    #character matrix; alleles must all have the same length
+    length = len(alleles[0])
+    matrix = numpy.frombuffer(''.join(alleles).encode(), numpy.uint8).reshape(len(alleles), length)
+    gaps = matrix == ord('-')
+    gap_cols = numpy.flatnonzero(gaps.any(0))
+    counts = (matrix[:, gap_cols, None] == ACGT_BYTES).sum(0)
+    fill = numpy.zeros(length, numpy.uint8)
+    fill[gap_cols] = ACGT_BYTES[counts.argmax(1)]
+    matrix = numpy.where(gaps, fill, matrix)
+    text = matrix.tobytes().decode()
+    r = 0
+    for x in range(len(genotypes)):
+        if genotypes[x][0] != '':
+            genotypes[x] = [text[r*length:(r+1)*length], text[(r+1)*length:(r+2)*length]]
+            r += 2
+
+def transform(genotypes):
+    """Return the fineRADstructure genotypes of a cluster from [allele1, allele2] varsites.
+
+    Missing genotypes are ['','']. Gaps are replaced by the most common base
+    in their column and indels (0/1) are recoded as A/T. Returns [] when the
+    cluster is invariant.
+    """
+    all_genos = [item for sublist in genotypes for item in sublist]
+    uni_genos = list(set(all_genos))
+    if '' in uni_genos:
+        uni_genos.pop(uni_genos.index(''))
+    if uni_genos == ['.']:
+        genotypes=[]
+    else:
+        gaps = False
+        indels = False
+        for i in uni_genos:
+            if '-' in i:
+                gaps = True
+            elif '0' in i:
+                indels = True
+        if gaps == True:
+            alleles = [g for pair in genotypes if pair[0] != '' for g in pair]
+            if numpy is not None and len(set(len(g) for g in alleles)) == 1:
+                fill_gaps_matrix(genotypes, alleles)
+            else:
+                fill_gaps(genotypes, all_genos, uni_genos)
+
+        genotypes = [i[0]+'/'+i[1] if i[0] != i[1] else i[0] for i in genotypes]
+        if indels == True:
+            genotypes = [i.replace('0','A') for i in genotypes]
+            genotypes = [i.replace('1','T') for i in genotypes]
+
+    return(genotypes)
+
+def invariant_genotypes(block, include):
+    #True when transform() would return [] for the cluster: no included sample has
+    #variable sites and at least one has a good genotype
+    for sites in block_column(block, include, VARSITES):
+        if sites != '.':
+            return False
+    return '1' in block_column(block, include, FLAG)
+
+def cluster_genotypes(cluster, incl_samples):
+    #varsites of both alleles for good genotypes, ['',''] for all others
+    genos = []
+    for i in range(incl_samples):
+        if cluster.flag(i) != 1:
+            genos.append(['',''])
+        else:
+            genos.append([cluster.varsites(i*2),cluster.varsites(i*2+1)])
+    return genos
+
+def transform_range(infile, start, stop, num_samples, include):
+    #rows of the clusters starting in a byte range of infile, run in a worker process
+    incl_samples = sum(include)
+    rows = []
+    cluster_count = 0
+    names = None
+    for block in read_range(infile, start, stop, num_samples):
+        cluster_count += 1
+        if invariant_genotypes(block, include):
+            continue
+        cluster = parse_block(block, include, names)
+        names = cluster.names
+        genos = transform(cluster_genotypes(cluster, incl_samples))
+        if genos != []:
+            rows.append('\t'.join(genos)+'\n')
+    return ''.join(rows), len(rows), cluster_count
+
+class FineRADstructureWriter:
+    """fineRADstructure input file, one row per variable cluster."""
+    def __init__(self, samples, outfile):
+        self.incl_samples = samples.incl_samples
+        self.outfile = open(outfile,'w')
+        self.outfile.write('\t'.join(samples.incl_names)+'\n')
+        self.rows = 0
+
+    def invariant_block(self, block, include):
+        return invariant_genotypes(block, include)
+
+    def cluster(self, cluster):
+        genos = transform(cluster_genotypes(cluster, self.incl_samples))
+        if genos != []:
+            self.outfile.write('\t'.join(genos)+'\n')
+            self.rows += 1
+
+    def write_rows(self, text, rows):
+        #rows made by transform_range
+        self.outfile.write(text)
+        self.rows += rows
+
+    def stats(self):
+        return {'variable_clusters': self.rows}
+
+    def finish(self):
+        self.outfile.close()
+
+def convert_parallel(infile, samples, writer, processes, chunk_size=4*1024*1024, verbose=True, timings=None, progress=None,
+                     summary=None):
+    """Write the rows of each cluster with worker processes, in the order of the clusters.
+
+    The file is split into byte ranges of at most chunk_size (smaller for
+    small files, so every process gets several), each converted by a worker
+    process. At most 4 ranges per process are pending at a time, so memory
+    does not grow with the size of the file. Returns the number of clusters read.
+    """
+    size = os.path.getsize(infile)
+    chunk_size = max(65536, min(chunk_size, size//(processes*4)+1))
+    if progress == None and verbose:
+        progress = Progress()
+    if progress:
+        progress.start(size)
+    if verbose:
+        print('\nAnalyzed:\n')
+
+    cluster_count = 0
+    pending = deque()
+
+    def write_result():
+        nonlocal cluster_count
+        future, stop = pending.popleft()
+        with stage(timings, 'wait (worker processes)'):
+            text, rows, clusters = future.result()
+        with stage(timings, 'write (FineRADstructureWriter)'):
+            writer.write_rows(text, rows)
+        cluster_count += clusters
+        if progress:
+            progress.update(cluster_count, stop)
+
+    with ProcessPoolExecutor(processes) as pool:
+        for start in range(0, size, chunk_size):
+            stop = min(start+chunk_size, size)
+            pending.append((pool.submit(transform_range, infile, start, stop, samples.num_samples, samples.include), stop))
+            if len(pending) >= processes*4:
+                write_result()
+        while pending:
+            write_result()
+    if progress:
+        progress.finish()
+
+    with stage(timings, 'write (FineRADstructureWriter)'):
+        writer.finish()
+    if summary:
+        summary.add_input(infile, samples, cluster_count)
+        summary.add_writer('FineRADstructureWriter', writer.stats())
+    return cluster_count
+
+def out2fineRADstructure(infile, infofile, outfile, processes=0, verbose=True, timings=None, progress=None, summary=None):
+    """Convert an .out file to an input file for fineRADstructure.
+
+    With processes > 0, clusters are converted by that many worker processes,
+    except when infile is - (standard input), which is read in one process.
+    """
+    samples = read_sample_info(infofile)
+    if verbose:
+        print('Found '+str(samples.num_samples)+', of which '+str(samples.incl_samples)+' will be included in output file')
+        print('\nConverting genotypes for use in fineRADstructure')
+    writer = FineRADstructureWriter(samples, outfile)
+    if processes > 0 and infile != STDIN:
+        convert_parallel(infile, samples, writer, processes, verbose=verbose, timings=timings, progress=progress, summary=summary)
+    else:
+        convert(infile, samples, [writer], verbose, timings, progress, summary)
+    return writer
@@ -0,0 +1,57 @@
+import os, time
+
+#end of an .out file that is still being written by the pipeline: a marker file
+#(by default the name of the .out file followed by .done) is written, the process
+#writing the file exits, or the file does not grow for timeout seconds. A marker
+#that already exists when the run starts was left by a previous run: it is ignored
+#until it is written again, and the run otherwise ends by process or timeout
+
+def process_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class Follow:
+    """Tells when an .out file that is being written is complete.
+
+    finished() is called whenever no complete cluster is available; poll is
+    the number of seconds to wait before the file is read again.
+    """
+    def __init__(self, infile, marker=None, pid=None, timeout=0, poll=1.0):
+        self.infile = infile
+        self.marker = marker or infile+'.done'
+        self.pid = pid
+        self.timeout = timeout
+        self.poll = poll
+        self.size = -1
+        self.changed = time.monotonic()
+        self.stale = self.marker_mtime()
+
+    def marker_mtime(self):
+        try:
+            return os.stat(self.marker).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def marker_written(self):
+        #the marker appeared or was written again during the run
+        mtime = self.marker_mtime()
+        return mtime != None and mtime != self.stale
+
+    def finished(self):
+        if self.marker_written():
+            return True
+        if self.pid and not process_running(self.pid):
+            return True
+        if self.timeout > 0:
+            size = os.path.getsize(self.infile) if os.path.exists(self.infile) else -1
+            if size != self.size:
+                self.size = size
+                self.changed = time.monotonic()
+            elif time.monotonic()-self.changed >= self.timeout:
+                return True
+        return False
@@ -0,0 +1,108 @@
+import os, json, hashlib
+
+#manifest of the cluster files of a run, for incremental runs: a hash of the lines
+#of the included samples of each cluster, the files written for it and the segment
+#it added to the concatenated output. Segments are kept in a second file next to
+#the manifest, so the concatenated output can be rebuilt without parsing clusters
+#that did not change. Clusters are looked up by name, so their names must be unique
+#(they also name the files of the clusters)
+
+#version of the manifest, part of the options so manifests of older versions are not reused
+VERSION = 2
+
+def block_digest(block, include):
+    """Return a hash of the first line and the lines of the included samples of a cluster."""
+    digest = hashlib.blake2b(block[0].encode(), digest_size=16)
+    for k in range(len(include)):
+        if include[k]:
+            digest.update(block[k*2+2].encode())
+            digest.update(block[k*2+3].encode())
+    return digest.hexdigest()
+
+class Manifest:
+    """Hash, files and concatenated segment of each cluster of the previous and the current run.
+
+    options is a string with everything besides the clusters that changes the
+    output (included samples, number of alleles, ...); when it differs from
+    that of the previous run, no cluster is reused. finish() deletes the files
+    of clusters that are no longer written and replaces the manifest; close()
+    (called by finish()) closes the segment files and removes the temporary
+    one, so a run that fails keeps the previous manifest and segments.
+    """
+    def __init__(self, path, options):
+        self.path = path
+        self.options = hashlib.blake2b(('version='+str(VERSION)+' '+options).encode(), digest_size=16).hexdigest()
+        self.old = {}
+        self.reusable = False
+        if os.path.exists(path):
+            with open(path,'r') as f:
+                manifest = json.load(f)
+            self.old = manifest['clusters']
+            self.reusable = manifest['options'] == self.options and os.path.exists(path+'.segments')
+        self.old_segments = open(path+'.segments','rb') if self.reusable else None
+        self.clusters = {}
+        self.segments = open(path+'.segments.tmp','wb')
+        self.reused = 0
+        self.written = 0
+
+    def unchanged(self, name, digest):
+        """Return True when a cluster can be reused: same hash as in the previous run and its files exist."""
+        if not self.reusable or name not in self.old:
+            return False
+        entry = self.old[name]
+        return entry['hash'] == digest and all(os.path.exists(path) for path in entry['files'])
+
+    def check_name(self, name):
+        if name in self.clusters:
+            raise ValueError('cluster '+name+' appears more than once, incremental runs need unique cluster names')
+
+    def reuse(self, name):
+        """Keep a cluster of the previous run, return its segment and length."""
+        self.check_name(name)
+        entry = dict(self.old[name])
+        self.old_segments.seek(entry['offset'])
+        segment = self.old_segments.read(entry['size'])
+        entry['offset'] = self.segments.tell()
+        self.segments.write(segment)
+        self.clusters[name] = entry
+        self.reused += 1
+        return segment.decode(), entry['length']
+
+    def add(self, name, digest, files, segment='', length=0):
+        """Keep a cluster that was written, with the length (or for fasta, number of records) reuse() returns."""
+        self.check_name(name)
+        segment = segment.encode()
+        self.clusters[name] = {'hash': digest, 'files': files, 'offset': self.segments.tell(), 'size': len(segment),
+                               'length': length}
+        self.segments.write(segment)
+        self.written += 1
+
+    def finish(self):
+        """Delete the files of clusters that were not written again and replace the manifest."""
+        try:
+            kept = set(path for entry in self.clusters.values() for path in entry['files'])
+            for name in self.old:
+                for path in self.old[name]['files']:
+                    if path not in kept and os.path.exists(path):
+                        os.remove(path)
+            if self.old_segments:
+                self.old_segments.close()
+            self.segments.close()
+            os.replace(self.path+'.segments.tmp', self.path+'.segments')
+            with open(self.path+'.tmp','w') as outfile:
+                json.dump({'options': self.options, 'clusters': self.clusters}, outfile)
+            os.replace(self.path+'.tmp', self.path)
+        finally:
+            self.close()
+
+    def close(self):
+        """Close the segment files and remove the temporary ones of a run that did not finish."""
+        if self.old_segments:
+            self.old_segments.close()
+        self.segments.close()
+        for path in (self.path+'.segments.tmp', self.path+'.tmp'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def stats(self):
+        return {'clusters_reused': self.reused, 'clusters_written': self.written}
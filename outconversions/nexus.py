@@ -0,0 +1,133 @@
+import os, random, shutil, tempfile
+
+from .samples import read_sample_info
+from .reader import same_sequences
+from .manifest import Manifest, block_digest
+from .output import ClusterFiles
+from .alleles import draw_alleles
+from .convert import convert
+
+class NexusWriter:
+    """Nexus file for each cluster and an interleaved nexus file with all clusters.
+
+    The body and charset block of the concatenated file are written to private
+    temporary files next to it and copied after the header once the total
+    length is known. With variable_only, clusters where all included samples
+    have the same sequence are not written. With a manifest, clusters that did
+    not change since the previous run are not parsed and their files are not
+    written again; their rows are added to the concatenated file from the
+    manifest, which is finished by the caller once the cluster files are closed.
+    """
+    def __init__(self, samples, na, hemi, base, catfile, cluster_files=None, variable_only=False, manifest=None):
+        self.incl_samples = samples.incl_samples
+        self.na = na
+        self.hemi = hemi
+        self.base = base
+        self.catfile = catfile
+        self.ntax = samples.incl_samples*na
+        self.cluster_files = cluster_files or ClusterFiles()
+        self.variable_only = variable_only
+        self.manifest = manifest
+        self.total_length = 0
+        catdir = os.path.dirname(os.path.abspath(catfile))
+        self.body = tempfile.TemporaryFile(mode='w+', dir=catdir)
+        self.footer = tempfile.TemporaryFile(mode='w+', dir=catdir)
+        self.footer.write(';\n'+
+                          'End;\n\n'+
+                          'begin assumptions;\n')
+
+    def invariant_block(self, block, include):
+        if self.variable_only and same_sequences(block, include):
+            return True
+        if self.manifest:
+            name = block[0].split()[1]
+            self.digest = block_digest(block, include)
+            if self.manifest.unchanged(name, self.digest):
+                self.add_rows(name, *self.manifest.reuse(name))
+                return True
+        return False
+
+    def cluster(self, cluster):
+        if self.variable_only and cluster.same_sequences():
+            return
+        length = cluster.max_length()
+        missing = length*'?'
+        output = []
+        #randomly define allele 1 and 2
+        for i in range(self.incl_samples):
+            x = random.randint(1,2)
+            for name, seq in draw_alleles(cluster, i, x, self.na, self.hemi):
+                output.append(name+'\t'+(seq if seq != None else missing)+'\n')
+        self.cluster_files.write(self.base+'_clstr_'+cluster.name+'.nex',
+                                 '#NEXUS\n'+
+                                 'Begin DATA;\n'+
+                                 '\tDimensions ntax='+str(self.ntax)+' nchar='+str(length)+';\n'+
+                                 '\tFormat datatype=dna gap=- missing=?;\n'
+                                 '\tMatrix\n'+
+                                 '[cluster '+cluster.name+']\n'+
+                                 ''.join(output)+
+                                 ';\n'+
+                                 'End;\n')
+        self.add_rows(cluster.name, ''.join(output), length)
+        if self.manifest:
+            self.manifest.add(cluster.name, self.digest, [self.base+'_clstr_'+cluster.name+'.nex'], ''.join(output), length)
+
+    def add_rows(self, name, rows, length):
+        self.body.write('[cluster '+name+']\n'+rows)
+        #get range of locus, write charset info to footer
+        self.footer.write('charset Clstr'+name+' = '+str(self.total_length+1)+'-'+str(self.total_length+length)+';\n')
+        self.total_length += length
+
+    def stats(self):
+        stats = {'taxa': self.ntax, 'characters': self.total_length}
+        if self.manifest:
+            stats.update(self.manifest.stats())
+        return stats
+
+    def finish(self):
+        self.footer.write('End;\n')
+        catfile = open(self.catfile,'w')
+        catfile.write('#NEXUS\n'+
+                      'Begin DATA;\n'+
+                      '\tDimensions ntax='+str(self.ntax)+' nchar='+str(self.total_length)+';\n'+
+                      '\tFormat datatype=dna gap=- missing=? interleave=yes;\n'
+                      '\tMatrix\n')
+        for part in (self.body, self.footer):
+            part.seek(0)
+            shutil.copyfileobj(part, catfile, 1024*1024)
+            part.close()
+        catfile.close()
+
+def out2nexus(infile, infofile, base, catfile, na, hemi, arch=None, threads=0, variable_only=False, verbose=True,
+              timings=None, progress=None, summary=None, incremental=False, follow=None):
+    """Convert an .out file to a nexus file per cluster and a concatenated nexus file.
+
+    With incremental, a manifest is kept in base_manifest.json and only the
+    files of clusters that changed since the previous run are written. With
+    follow (a Follow), infile is converted while it is being written.
+    """
+    samples = read_sample_info(infofile)
+    manifest = None
+    if incremental:
+        if arch:
+            raise ValueError('incremental runs cannot write to an -arch archive')
+        manifest = Manifest(base+'_manifest.json', 'nexus na='+str(na)+' hemi='+str(hemi)+' variable_only='+str(variable_only)+
+                            ' samples='+','.join(samples.incl_names))
+    if verbose:
+        print('Found '+str(samples.num_samples)+' samples, of which '+str(samples.incl_samples)+' will be included in output file')
+        print('\nGathering cluster data, writing nexus file for each cluster')
+    try:
+        cluster_files = ClusterFiles(arch, threads, timings=timings)
+        writer = NexusWriter(samples, na, hemi, base, catfile, cluster_files, variable_only, manifest)
+        num_clusters = convert(infile, samples, [writer], verbose, timings, progress, summary, follow=follow)
+        cluster_files.close()
+        if manifest:
+            manifest.finish()
+    finally:
+        if manifest:
+            manifest.close()
+    if verbose:
+        print('\nWrote interleaved nexus file with '+str(writer.total_length)+' characters from '+str(num_clusters)+' clusters')
+        if manifest:
+            print('Wrote files of '+str(manifest.written)+' clusters, '+str(manifest.reused)+' clusters did not change')
+    return num_clusters
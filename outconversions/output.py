@@ -0,0 +1,79 @@
+import os, time, queue, threading, zipfile
+
+from .timing import stage
+
+class ClusterFiles:
+    """Writes the file of each cluster, either separately or to one zip archive.
+
+    In an archive, each file is stored under the name it would have had on
+    disk (without directories), so single clusters can be extracted on demand
+    with extractclusters.py.
+
+    With threads > 0, files are handed to a pool of writer threads through a
+    queue holding at most queue_size files, so parsing is not held up by
+    file creation (e.g. on network filesystems). The contents of each file
+    are fixed before it is queued, so output does not depend on the number
+    of threads; an archive is always written by a single thread, in cluster
+    order. Errors of the writer threads are raised by write() or close().
+
+    With timings, the time spent writing files is added to timings (summed
+    over the writer threads, which run alongside the main thread).
+    """
+    def __init__(self, archive=None, threads=0, queue_size=None, timings=None):
+        self.timings = timings
+        self.archive = None
+        if archive:
+            self.archive = zipfile.ZipFile(archive,'w',zipfile.ZIP_STORED)
+        self.threads = []
+        self.error = None
+        if threads > 0:
+            if self.archive:
+                threads = 1
+            self.queue = queue.Queue(queue_size or threads*64)
+            for i in range(threads):
+                thread = threading.Thread(target=self.work, daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def write(self, name, text):
+        if self.threads:
+            if self.error:
+                raise self.error
+            self.queue.put((name, text))
+        else:
+            with stage(self.timings, 'write (cluster files)'):
+                self.write_file(name, text)
+
+    def write_file(self, name, text):
+        if self.archive:
+            self.archive.writestr(os.path.basename(name), text)
+        else:
+            cluster_file = open(name,'w')
+            cluster_file.write(text)
+            cluster_file.close()
+
+    def work(self):
+        #keep taking files after an error, so write() never blocks on a full queue
+        while True:
+            item = self.queue.get()
+            if item == None:
+                break
+            if self.error == None:
+                try:
+                    start = time.perf_counter()
+                    self.write_file(*item)
+                    if self.timings:
+                        self.timings.add('write (cluster files, threads)', time.perf_counter()-start)
+                except Exception as e:
+                    self.error = e
+
+    def close(self):
+        for thread in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        if self.archive:
+            self.archive.close()
+        if self.error:
+            raise self.error
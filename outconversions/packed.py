@@ -0,0 +1,84 @@
+#2-bit packed allele codes for biallelic characters: four alleles per byte, the
+#first allele in the lowest bits. Code 0 is missing data, codes 1 and 2 are the
+#two alleles of the character (3 is unused). NumPy is used where it is
+#installed; otherwise packing and counting fall back to Python big integers.
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+LOW_BITS = 0x55
+
+def bit_counts(array):
+    #number of set bits of each byte of a NumPy array
+    if hasattr(numpy, 'bitwise_count'):
+        return numpy.bitwise_count(array)
+    return BYTE_BITS[array]
+
+if numpy is not None:
+    BYTE_BITS = numpy.array([bin(i).count('1') for i in range(256)], numpy.uint8)
+
+def pack2(codes):
+    """Return codes 0-3 packed into bytes, four per byte."""
+    if numpy is not None:
+        codes = numpy.asarray(codes, dtype=numpy.uint8)
+        pad = -len(codes) % 4
+        if pad:
+            codes = numpy.concatenate([codes, numpy.zeros(pad, numpy.uint8)])
+        codes = codes.reshape(-1, 4)
+        return (codes[:,0] | (codes[:,1] << 2) | (codes[:,2] << 4) | (codes[:,3] << 6)).tobytes()
+    packed = bytearray((len(codes)+3)//4)
+    for i in range(len(codes)):
+        packed[i >> 2] |= codes[i] << ((i & 3)*2)
+    return bytes(packed)
+
+def unpack2(packed, start, stop):
+    """Return the codes from start up to stop of packed bytes, as a list."""
+    if numpy is not None:
+        block = numpy.frombuffer(packed, numpy.uint8)[start >> 2:(stop+3) >> 2]
+        codes = numpy.stack([(block >> shift) & 3 for shift in (0,2,4,6)], 1).ravel()
+        first = start & 3
+        return codes[first:first+stop-start].tolist()
+    return [(packed[i >> 2] >> ((i & 3)*2)) & 3 for i in range(start, stop)]
+
+def popcount(packed):
+    """Return the number of set bits in bytes."""
+    if numpy is not None:
+        return int(bit_counts(numpy.frombuffer(packed, numpy.uint8)).sum())
+    return bin(int.from_bytes(packed, 'little')).count('1')
+
+def count2(packed):
+    """Return the number of alleles with code 1 and with code 2 in packed bytes."""
+    if numpy is not None:
+        block = numpy.frombuffer(packed, numpy.uint8)
+        low = block & LOW_BITS
+        high = (block >> 1) & LOW_BITS
+        return (int(bit_counts(low & ~high).sum()),
+                int(bit_counts(high & ~low).sum()))
+    value = int.from_bytes(packed, 'little')
+    mask = int.from_bytes(bytes([LOW_BITS])*len(packed), 'little')
+    low = value & mask
+    high = (value >> 1) & mask
+    return bin(low & ~high).count('1'), bin(high & ~low).count('1')
+
+class PackedColumn:
+    """Biallelic character with 2 bits per allele.
+
+    codes holds the strings written for alleles 1 and 2; missing data are
+    written as missing.
+    """
+    __slots__ = ('label', 'codes', 'packed', 'missing')
+
+    def __init__(self, label, allele_codes, codes, missing='-9'):
+        self.label = label
+        self.codes = codes
+        self.packed = pack2(allele_codes)
+        self.missing = missing
+
+    def counts(self):
+        return count2(self.packed)
+
+    def values(self, start, stop):
+        strings = (self.missing, self.codes[0], self.codes[1], self.missing)
+        return [strings[code] for code in unpack2(self.packed, start, stop)]
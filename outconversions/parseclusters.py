@@ -0,0 +1,220 @@
+import os, sys, heapq, math, random, tempfile
+
+from .reader import open_input, input_size, read_blocks
+from .timing import stage
+
+def read_cluster_list(path):
+    """Return the cluster numbers listed in a text file, one per line."""
+    parse_list = []
+    parsefile = open(path,'r')
+    for line in parsefile:
+        parse_list.append(str(line.strip('\n')))
+    parsefile.close()
+    return parse_list
+
+def read_cluster_strata(path):
+    """Return a dictionary with the stratum of each cluster in a text file with a cluster number and a stratum per line."""
+    strata = {}
+    stratafile = open(path,'r')
+    for line in stratafile:
+        fields = line.split()
+        if len(fields) == 0:
+            continue
+        if len(fields) < 2:
+            stratafile.close()
+            raise ValueError('cluster '+fields[0]+' has no stratum in '+path)
+        strata[fields[0]] = fields[1]
+    stratafile.close()
+    return strata
+
+def parse_clusters(infile, outfile, num_samples, cluster_list, inverse=False, timings=None, progress=None, summary=None,
+                   cluster_filter=None):
+    """Write the clusters of an .out file in cluster_list (or not in it, if inverse) to outfile.
+
+    With cluster_list None, every cluster is selected. With cluster_filter
+    (a ClusterFilter), only selected clusters that pass it are written.
+    infile - is read from standard input and outfile - is written to
+    standard output, so clusters can be piped into a converter.
+    Returns the number of clusters written.
+    """
+    parse_set = set(cluster_list) if cluster_list != None else None
+    parse_count = 0
+    cluster_count = 0
+    read_size = 0
+    if progress:
+        progress.start(input_size(infile))
+    inf = open_input(infile)
+    if outfile == '-':
+        outf = open(sys.__stdout__.fileno(),'w',closefd=False)
+    else:
+        outf = open(outfile,'w')
+    blocks = read_blocks(inf, num_samples)
+    while True:
+        with stage(timings, 'read'):
+            block = next(blocks, None)
+        if block == None:
+            break
+        selected = parse_set == None or (block[0].split()[1] in parse_set) != inverse
+        if selected and cluster_filter:
+            with stage(timings, 'filter'):
+                selected = cluster_filter.passes(block)
+        if selected:
+            with stage(timings, 'write'):
+                outf.write(''.join(block))
+            parse_count += 1
+        cluster_count += 1
+        if progress:
+            read_size += sum(len(line) for line in block)
+            progress.update(cluster_count, read_size)
+    if progress:
+        progress.finish()
+    inf.close()
+    outf.close()
+    if summary:
+        summary.add_input(infile, None, cluster_count)
+        summary.add_writer('parse_clusters', {'clusters_written': parse_count})
+        if cluster_filter:
+            summary.add_writer('cluster_filter', cluster_filter.stats())
+    return parse_count
+
+#random subsets of the clusters of an .out file, drawn in one pass: each replicate
+#is an independent reservoir sample (Li's algorithm L), so the number of random
+#draws depends on the sample size rather than on the number of clusters, and a
+#reservoir only looks at the clusters it replaces
+
+class Reservoirs:
+    """Independent random samples of size clusters of one stratum, one for each replicate.
+
+    offer() is called with every cluster of the stratum in turn and returns
+    the replicates the cluster was added to, with the clusters it replaced.
+    """
+    def __init__(self, replicates, size, rng):
+        self.size = size
+        self.rng = rng
+        self.samples = [[] for r in range(replicates)]
+        self.weights = [1.0]*replicates
+        self.next = []
+        self.count = 0
+
+    def skip(self, r):
+        #position of the next cluster taken by replicate r, after the cluster at self.count
+        self.weights[r] *= math.exp(math.log(1.0-self.rng.random())/self.size)
+        gap = math.floor(math.log(1.0-self.rng.random())/math.log1p(-self.weights[r])) if self.weights[r] < 1.0 else 0
+        heapq.heappush(self.next, (self.count+gap+1, r))
+
+    def offer(self, position):
+        """Return a list of (replicate, replaced position or None) for the cluster at position."""
+        taken = []
+        if self.count < self.size:
+            for r in range(len(self.samples)):
+                self.samples[r].append(position)
+                taken.append((r, None))
+            if self.count == self.size-1:
+                for r in range(len(self.samples)):
+                    self.skip(r)
+            self.count += 1
+            return taken
+        while self.next and self.next[0][0] == self.count:
+            r = heapq.heappop(self.next)[1]
+            slot = self.rng.randrange(self.size)
+            taken.append((r, self.samples[r][slot]))
+            self.samples[r][slot] = position
+            self.skip(r)
+        self.count += 1
+        return taken
+
+def sample_clusters(infile, outbase, num_samples, sample_size, replicates=1, strata=None, index_only=False, seed=None,
+                    timings=None, progress=None, summary=None, cluster_filter=None):
+    """Write replicates random samples of sample_size clusters of an .out file, reading it once.
+
+    With strata (a dictionary from read_cluster_strata), sample_size clusters
+    are drawn from each stratum and clusters without a stratum are skipped.
+    With cluster_filter (a ClusterFilter), samples are drawn from the
+    clusters that pass it.
+    Sample r is written to outbase_r.out, in the order of infile, or only its
+    cluster numbers to outbase_r.txt when index_only. Clusters that are taken
+    into a sample are spilled to a private temporary file next to the samples,
+    so only their offsets are kept in memory. Returns a list with the number
+    of clusters in each sample.
+    """
+    if sample_size < 1 or replicates < 1:
+        raise ValueError('sample size and number of replicates must be at least 1')
+    rng = random.Random(seed)
+    reservoirs = {}
+    kept = {}
+    held = {}
+    spill = None
+    if not index_only:
+        spill = tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(outbase)))
+    cluster_count = 0
+    read_size = 0
+    skipped = 0
+    if progress:
+        progress.start(input_size(infile))
+    inf = open_input(infile)
+    blocks = read_blocks(inf, num_samples)
+    while True:
+        with stage(timings, 'read'):
+            block = next(blocks, None)
+        if block == None:
+            break
+        name = block[0].split()[1]
+        stratum = None
+        if strata != None:
+            stratum = strata.get(name)
+            if stratum == None:
+                skipped += 1
+        selected = strata == None or stratum != None
+        if selected and cluster_filter:
+            with stage(timings, 'filter'):
+                selected = cluster_filter.passes(block)
+        if selected:
+            if stratum not in reservoirs:
+                reservoirs[stratum] = Reservoirs(replicates, sample_size, rng)
+            taken = reservoirs[stratum].offer(cluster_count)
+            for r, replaced in taken:
+                held[cluster_count] = held.get(cluster_count, 0)+1
+                if replaced != None:
+                    held[replaced] -= 1
+                    if held[replaced] == 0:
+                        del held[replaced]
+                        del kept[replaced]
+            if taken and index_only:
+                kept[cluster_count] = name+'\n'
+            elif taken:
+                with stage(timings, 'write (spill)'):
+                    data = ''.join(block).encode()
+                    kept[cluster_count] = (spill.tell(), len(data))
+                    spill.write(data)
+        cluster_count += 1
+        if progress:
+            read_size += sum(len(line) for line in block)
+            progress.update(cluster_count, read_size)
+    if progress:
+        progress.finish()
+    inf.close()
+    sizes = []
+    for r in range(replicates):
+        positions = sorted(position for reservoir in reservoirs.values() for position in reservoir.samples[r])
+        with stage(timings, 'write'):
+            if index_only:
+                outf = open(outbase+'_'+str(r+1)+'.txt','w')
+                outf.write(''.join(kept[position] for position in positions))
+            else:
+                #spilled clusters are in the order of infile, so they are read forward
+                outf = open(outbase+'_'+str(r+1)+'.out','wb')
+                for position in positions:
+                    offset, size = kept[position]
+                    outf.write(os.pread(spill.fileno(), size, offset))
+            outf.close()
+        sizes.append(len(positions))
+    if spill:
+        spill.close()
+    if summary:
+        summary.add_input(infile, None, cluster_count)
+        summary.add_writer('sample_clusters', {'replicates': replicates, 'sample_size': sample_size,
+                                               'strata': len(reservoirs), 'clusters_without_stratum': skipped,
+                                               'clusters_written': sum(sizes)})
+        if cluster_filter:
+            summary.add_writer('cluster_filter', cluster_filter.stats())
+    return sizes
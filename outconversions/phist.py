@@ -0,0 +1,343 @@
+from .samples import read_sample_info
+from .convert import convert
+from .cluster import SEQ
+from .reader import block_column, same_sequences
+from .packed import numpy
+
+#calculation of phist for each locus
+def calculate_phist(seq_array, npops):
+    """Return phi-st and nucleotide diversity of one locus.
+
+    seq_array holds [sample, population index, sequence] for each allele, where
+    alleles with a population of -9 or a sequence of '.' are missing. Returns
+    phist, nucdiv (per population with samples, then all populations), the
+    sequence length, SSDtot, SSDin and the sample size of each population.
+    """
+    Nsamples = [0] * npops #sample size per population
+    SSDin = [0] * npops #sum of squared differences wihtin populations
+    SSDtot = 0 #sum of squared differences total
+
+    missing = [] #find missing data
+    for i in range(len(seq_array)):
+        if seq_array[i][2] == '.' or seq_array[i][1]==-9:
+            missing.append(True)
+        else:
+            missing.append(False)
+
+    seqlen = None
+    for i in range(len(seq_array)): #get sequence length
+        if missing[i] == False:
+            seqlen=len(seq_array[i][2])
+            break
+
+    for i in range(len(seq_array)): #sum differences within pops and total
+        if missing[i]==False:
+            Nsamples[int(seq_array[i][1])] += 1
+            for j in range(i+1,len(seq_array)):
+                if missing[j] == False:
+                    diffs = sum(ch1 != ch2 for ch1,ch2 in zip(seq_array[i][2],seq_array[j][2]))
+                    SSDtot += diffs
+                    if seq_array[i][1]==seq_array[j][1]:
+                        SSDin[int(seq_array[i][1])] += diffs
+    #multiply by 2 for square (full) matrix
+    SSDtot = SSDtot*2
+    SSDin=[i*2 for i in SSDin]
+
+    return phist_values(SSDtot, SSDin, Nsamples, seqlen, npops)
+
+def phist_values(SSDtot, SSDin, Nsamples, seqlen, npops):
+    """Return phist, nucdiv, seqlen, SSDtot, SSDin and Nsamples of one locus from its sums of squared differences."""
+    #calculate phi-st
+    SSD_WP = sum(float(SSDin[i])/(2*Nsamples[i]) for i in range(npops) if Nsamples[i]>0)
+    SSD_AP = float(SSDtot)/(2*sum(Nsamples)) - SSD_WP
+    Vwithin = SSD_WP/(sum(Nsamples)-sum(i > 0 for i in Nsamples))
+    popsum = (sum(pow(i,2) for i in Nsamples))/sum(Nsamples)
+    pops_with_samples = sum(i > 0 for i in Nsamples)
+    if pops_with_samples > 1:
+        weightedN = (sum(Nsamples) - popsum)/(pops_with_samples-1)
+        Vamong = (SSD_AP/(pops_with_samples-1) - Vwithin)/weightedN
+        if Vamong+Vwithin > 0:
+            phist = Vamong/(Vamong+Vwithin)
+        else:
+            phist=0
+    else:
+        phist=1
+
+    nucdiv = [float(SSDin[i])/(Nsamples[i]*Nsamples[i]*seqlen) for i in range(npops) if Nsamples[i]>0]
+    nucdiv.append(float(SSDtot)/(sum(Nsamples)*sum(Nsamples)*seqlen))
+
+    return(phist,nucdiv,seqlen,SSDtot,SSDin,Nsamples)
+
+def allele_counts(seqs, groups, ngroups):
+    """Return the number of alleles of each group with each character at each variable site.
+
+    Alleles with a group of -9 or a sequence of '.' are skipped. Sites past
+    the end of a sequence are not counted for it, as in calculate_phist pairs
+    of sequences are compared over the length of the shorter one.
+    """
+    used = [r for r in range(len(seqs)) if seqs[r] != '.' and groups[r] != -9]
+    length = max([len(seqs[r]) for r in used] or [0])
+    matrix = numpy.frombuffer(''.join(seqs[r].ljust(length,'\0') for r in used).encode(), numpy.uint8)
+    matrix = matrix.reshape(len(used), length)
+    #only sites where alleles differ add to the sums of squared differences
+    matrix = matrix[:, (matrix != matrix[:1]).any(0)]
+    symbols = numpy.unique(matrix)
+    symbols = symbols[symbols != 0]
+    row_groups = numpy.array([groups[r] for r in used], int)
+    counts = numpy.zeros((ngroups, len(symbols), matrix.shape[1]), numpy.int64)
+    for g in range(ngroups):
+        rows = matrix[row_groups == g]
+        for k in range(len(symbols)):
+            counts[g,k] = (rows == symbols[k]).sum(0)
+    return counts
+
+def differences(counts):
+    """Return the sum of squared differences (full matrix) between the alleles counted in counts.
+
+    At each site, m alleles of which m_k have character k give m^2 - sum(m_k^2)
+    ordered pairs that differ.
+    """
+    alleles = counts.sum(0)
+    return int((alleles*alleles).sum() - (counts*counts).sum())
+
+class PhistWriter:
+    """Locus-by-locus phi-st for each pair of populations and all populations.
+
+    Each row holds the cluster, its length, pairwise and overall phi-st, and
+    nucleotide diversity per population and overall; a last row (ALL) holds
+    the values across all clusters.
+
+    With zlinked, all clusters are assumed to be on the Z chromosome: males (M)
+    and samples of unknown sex (U) are coded as diploid, females (F) as haploid
+    (only the first allele is used). The population of each allele is taken
+    from its position in the sample info file, as in out2phistZ.py, so rows
+    are shifted when samples before it have a population of -9.
+    """
+    def __init__(self, samples, outfile, zlinked=False):
+        self.zlinked = zlinked
+        self.incl_samples = samples.incl_samples
+        if zlinked:
+            for sex in samples.incl_sexes:
+                if sex not in ('M','F','U'):
+                    raise ValueError('included sample has assigned sex other than M, F, or U')
+            self.haploid = [sex == 'F' for sex in samples.incl_sexes]
+            self.PopVector = [pop for pop in samples.pops for x in (0,1)]
+        else:
+            self.haploid = [False]*samples.incl_samples
+            self.PopVector = [pop for pop in samples.incl_pops for x in (0,1)]
+        populations = list(set(samples.incl_pops))
+        populations.sort()
+        self.populations = populations
+        #population index of each allele, -9 for populations that are not included
+        self.labels = []
+        for k in range(samples.incl_samples*2):
+            if self.PopVector[k] in populations:
+                self.labels.append(populations.index(self.PopVector[k]))
+            else:
+                self.labels.append(-9)
+
+        self.total_length = 0
+        self.cluster_count = 0
+        self.GT_SSDtot = [0] * int(((len(populations) * (len(populations)-1))/2) + 1)
+        self.GT_SSDin = [0 for i in populations]
+        self.nd_tot = [[0,0] for i in range(len(populations)+1)]
+        self.pop_samples = [0 for i in populations]
+
+        self.outf = open(outfile,'w')
+        self.outf.write('Cluster\tSeq_len\t')
+        for i in range(len(populations)):
+            for j in range(i+1,len(populations)):
+                self.outf.write(populations[i]+'-'+populations[j]+'\t')
+        self.outf.write('All_Pops\t')
+        for i in range(len(populations)):
+            self.outf.write(populations[i]+'\t')
+        self.outf.write('All_Pops\n')
+
+    def invariant_block(self, block, include):
+        #when all sequences are the same there are no differences to count, so the
+        #row is written without parsing the cluster
+        if not same_sequences(block, include):
+            return False
+        seqs = block_column(block, include, SEQ)
+        for k in range(self.incl_samples):
+            if self.haploid[k]:
+                seqs[k*2+1] = '.'
+        self.add_counts(block[0].split()[1], seqs, None)
+        return True
+
+    def cluster(self, cluster):
+        populations = self.populations
+        PopVector = self.PopVector
+        locus_array = []
+        for k in range(self.incl_samples):
+            locus_array.append([cluster.sample(k*2),None,cluster.seq(k*2)])
+            if self.haploid[k]:
+                locus_array.append([cluster.sample(k*2),None,'.'])
+            else:
+                locus_array.append([cluster.sample(k*2+1),None,cluster.seq(k*2+1)])
+
+        if numpy is not None:
+            seqs = [row[2] for row in locus_array]
+            self.add_counts(cluster.name, seqs, allele_counts(seqs, self.labels, len(populations)))
+            return
+
+        PHIst_values=[]
+        pop_pair = -1
+        for i in range(len(populations)):
+            for j in range(i+1,len(populations)):
+                for k in range(len(locus_array)):
+                    if PopVector[k]==populations[i]:
+                        locus_array[k][1]=0
+                    elif PopVector[k]==populations[j]:
+                        locus_array[k][1]=1
+                    else:
+                        locus_array[k][1]=-9
+                pop_pair += 1
+                PHIst,nd,length,locSSDtot,locSSDin,locus_samples = calculate_phist(locus_array, len(populations))
+                PHIst_values.append(PHIst)
+                self.GT_SSDtot[pop_pair] += locSSDtot
+
+        for i in range(len(locus_array)):
+            if PopVector[i] in populations:
+                locus_array[i][1]=populations.index(PopVector[i])
+            else:
+                locus_array[i][1]=-9
+        PHIst,nd,length,locSSDtot,locSSDin,locus_samples = calculate_phist(locus_array, len(populations))
+        PHIst_values.append(PHIst)
+        self.GT_SSDtot[-1] += locSSDtot
+        self.add_locus(cluster.name, PHIst_values, nd, length, locSSDin, locus_samples)
+
+    def add_counts(self, name, seqs, counts):
+        #same values as calculate_phist, from allele counts at variable sites instead
+        #of comparing each pair of sequences; counts is None when all sequences are
+        #the same (no differences)
+        npops = len(self.populations)
+        labels = self.labels
+        if counts is None:
+            within = [0] * npops
+        else:
+            within = [differences(counts[g]) for g in range(npops)]
+        pop_n = [0] * npops
+        first = [len(seqs)] * npops
+        for r in range(len(seqs)):
+            if seqs[r] != '.' and labels[r] != -9:
+                pop_n[labels[r]] += 1
+                first[labels[r]] = min(first[labels[r]], r)
+
+        def seq_length(r):
+            if r < len(seqs):
+                return len(seqs[r])
+            return None
+
+        PHIst_values=[]
+        pop_pair = -1
+        for i in range(npops):
+            for j in range(i+1,npops):
+                Nsamples = [0] * npops
+                Nsamples[0] = pop_n[i]
+                Nsamples[1] = pop_n[j]
+                SSDin = [0] * npops
+                SSDin[0] = within[i]
+                SSDin[1] = within[j]
+                pop_pair += 1
+                SSDtot = 0 if counts is None else differences(counts[i]+counts[j])
+                PHIst,nd,length,locSSDtot,locSSDin,locus_samples = phist_values(SSDtot, SSDin, Nsamples,
+                                                                                  seq_length(min(first[i],first[j])), npops)
+                PHIst_values.append(PHIst)
+                self.GT_SSDtot[pop_pair] += locSSDtot
+
+        SSDtot = 0 if counts is None else differences(counts.sum(0))
+        PHIst,nd,length,locSSDtot,locSSDin,locus_samples = phist_values(SSDtot, within, pop_n,
+                                                                          seq_length(min(first, default=len(seqs))), npops)
+        PHIst_values.append(PHIst)
+        self.GT_SSDtot[-1] += locSSDtot
+        self.add_locus(name, PHIst_values, nd, length, locSSDin, locus_samples)
+
+    def add_locus(self, name, PHIst_values, nd, length, locSSDin, locus_samples):
+        #add values of all populations to totals, write row of cluster
+        for i in range(len(self.populations)):
+            if locus_samples[i] > 0:
+                self.nd_tot[i][0] += nd[i]*length
+                self.nd_tot[i][1] += length
+        self.nd_tot[-1][0] += nd[-1]*length
+        self.nd_tot[-1][1] += length
+        self.pop_samples = [i+j for i,j in zip (locus_samples,self.pop_samples)]
+        self.GT_SSDin = [self.GT_SSDin[i]+locSSDin[i] for i in range(len(locSSDin))]
+
+        self.outf.write(str(name)+'\t'+str(length))
+        for i in PHIst_values:
+            self.outf.write('\t'+str(i))
+        for i in nd:
+            self.outf.write('\t'+str(i))
+        self.outf.write('\n')
+        self.total_length += length
+        self.cluster_count += 1
+
+    def stats(self):
+        return {'loci': self.cluster_count, 'sequence_length': self.total_length, 'populations': len(self.populations)}
+
+    def finish(self):
+        ###calculate overall values across all loci###
+        populations = self.populations
+        GT_SSDin = self.GT_SSDin
+        GT_SSDtot = self.GT_SSDtot
+        outf = self.outf
+        outf.write('ALL'+'\t'+str(self.total_length)+'\t')
+        Nsamples = [i/self.cluster_count for i in self.pop_samples]
+        pop_pair = -1
+        for i in range(len(populations)):
+            for j in range(i+1,len(populations)):
+                pop_pair += 1
+                SSD_WP = 0
+                if Nsamples[i]>0 and Nsamples[j]>0:
+                    SSD_WP = float(GT_SSDin[i])/(2*Nsamples[i]) + float(GT_SSDin[j])/(2*Nsamples[j])
+                    SSD_AP = float(GT_SSDtot[pop_pair])/(2*(Nsamples[i]+Nsamples[j])) - SSD_WP
+                    Vwithin = SSD_WP/(Nsamples[i]+Nsamples[j]-2)
+                    weightedN = (Nsamples[i]+Nsamples[j]) - (pow(Nsamples[i],2)/(Nsamples[i]+Nsamples[j]) + pow(Nsamples[j],2)/(Nsamples[i]+Nsamples[j]))
+                    Vamong = (SSD_AP - Vwithin)/weightedN
+                    if Vamong+Vwithin > 0:
+                        phist = Vamong/(Vamong+Vwithin)
+                    else:
+                        phist=0
+                else:
+                    phist=1
+                outf.write(str(phist)+'\t')
+
+        SSD_WP = 0
+        for i in range(len(populations)):
+            if Nsamples[i]>0:
+                SSD_WP += float(GT_SSDin[i])/(2*Nsamples[i])
+        SSD_AP = float(GT_SSDtot[-1])/(2*sum(Nsamples)) - SSD_WP
+        Vwithin = SSD_WP/(sum(Nsamples)-len(Nsamples))
+        popsum = sum(pow(i,2)/sum(Nsamples) for i in Nsamples)
+        pops_with_samples = sum(i > 0 for i in Nsamples)
+        if pops_with_samples > 1:
+            weightedN = (sum(Nsamples) - popsum)/(pops_with_samples-1)
+            Vamong = (SSD_AP/(pops_with_samples-1) - Vwithin)/weightedN
+            if Vamong+Vwithin > 0:
+                phist = Vamong/(Vamong+Vwithin)
+            else:
+                phist=0
+        else:
+            phist=1
+        outf.write(str(phist))
+        for i in self.nd_tot:
+            outf.write('\t'+str(i[0]/i[1]))
+        outf.write('\n')
+        outf.close()
+
+def out2phist(infile, infofile, outfile, zlinked=False, verbose=True, timings=None, progress=None, summary=None,
+              cache=None, follow=None):
+    """Calculate locus-by-locus phi-st values from an .out file.
+
+    With follow (a Follow), infile is converted while it is being written.
+    """
+    samples = read_sample_info(infofile)
+    writer = PhistWriter(samples, outfile, zlinked)
+    if verbose:
+        print('Found '+str(samples.num_samples)+' samples in file')
+        print('Phi-st will be calculated using '+str(samples.incl_samples)+' samples from '+str(len(writer.populations))+' populations')
+        print(writer.populations)
+        print('\nCalculating phi-st for each cluster')
+    convert(infile, samples, [writer], verbose, timings, progress, summary, cache, follow)
+    return writer
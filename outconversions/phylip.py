@@ -0,0 +1,265 @@
+import os, random, shutil, tempfile
+
+from .samples import read_sample_info
+from .reader import STDIN, read_blocks, same_sequences
+from .manifest import Manifest, block_digest
+from .output import ClusterFiles
+from .alleles import draw_alleles
+from .convert import convert
+from .timing import stage
+
+def cluster_lengths(infile, samples, variable_only=False):
+    """Return the length of each cluster of an .out file for the included samples.
+
+    With variable_only, clusters where all included samples have the same
+    sequence are left out.
+    """
+    lengths = []
+    inf = open(infile,'r')
+    for block in read_blocks(inf, samples.num_samples):
+        if variable_only and same_sequences(block, samples.include):
+            continue
+        max_length = 0
+        for k in range(samples.num_samples):
+            if samples.include[k]:
+                for line in (block[k*2+2], block[k*2+3]):
+                    length = len(line.split()[1])
+                    if length > max_length:
+                        max_length = length
+        lengths.append(max_length)
+    inf.close()
+    return lengths
+
+class PhylipWriter:
+    """Phylip file for each cluster and a concatenated phylip file.
+
+    Sequence segments of the concatenated file are buffered per row and written
+    in blocks of flush_size characters, so memory does not grow with the size of
+    the alignment. When the length of every cluster is known up front (lengths),
+    the concatenated file is preallocated and blocks are written directly to
+    their offsets; otherwise blocks are spilled to a private temporary file and
+    copied to their rows once the total length is known. Sequences shorter than
+    their cluster are padded with ?.
+
+    Optionally writes an interleaved phylip file (one block per cluster) and a
+    RAxML/IQ-TREE partition file with the range of each cluster. With
+    variable_only, clusters where all included samples have the same sequence
+    are not written (lengths must then leave them out too). With a manifest,
+    clusters that did not change since the previous run are not parsed and
+    their files are not written again; their rows are added to the
+    concatenated files from the manifest, which is finished by the caller
+    once the cluster files are closed.
+    """
+    flush_size = 50000000
+
+    def __init__(self, samples, na, hemi, miss, base, catfile, cluster_files=None, icatfile=None, partfile=None, lengths=None,
+                 timings=None, variable_only=False, manifest=None):
+        self.incl_samples = samples.incl_samples
+        self.na = na
+        self.hemi = hemi
+        self.miss = miss
+        self.base = base
+        self.catfile = catfile
+        self.cluster_files = cluster_files or ClusterFiles()
+        self.timings = timings
+        self.variable_only = variable_only
+        self.manifest = manifest
+        if na == 1:
+            self.names = list(samples.incl_names)
+        else: #na == 2
+            self.names = [name+y for name in samples.incl_names for y in ('a','b')]
+        self.lengths = lengths
+        self.concat = [[] for x in self.names]
+        self.buffered = 0
+        self.written = 0
+        self.total_length = 0
+        self.cluster_count = 0
+        catdir = os.path.dirname(os.path.abspath(catfile))
+        if lengths != None:
+            self.cat = self.preallocate(sum(lengths))
+        else:
+            self.spill = tempfile.TemporaryFile(dir=catdir)
+            self.blocks = []
+
+        self.icatfile = None
+        if icatfile:
+            if lengths != None:
+                self.icatfile = open(icatfile,'w')
+                self.icatfile.write(str(len(self.names))+'\t'+str(sum(lengths))+'\n')
+            else:
+                self.icatfile = tempfile.TemporaryFile(mode='w+', dir=catdir)
+            self.icatname = icatfile
+        self.partfile = None
+        if partfile:
+            self.partfile = open(partfile,'w')
+
+    def preallocate(self, total_length):
+        #header, then one row per name with a fixed width sequence
+        cat = open(self.catfile,'wb')
+        cat.write((str(len(self.names))+'\t'+str(total_length)+'\n').encode())
+        self.row_offsets = []
+        for name in self.names:
+            cat.write((name+'\t').encode())
+            self.row_offsets.append(cat.tell())
+            cat.seek(total_length,1)
+            cat.write(b'\n')
+        cat.flush()
+        return cat
+
+    def invariant_block(self, block, include):
+        if self.variable_only and same_sequences(block, include):
+            return True
+        if self.manifest:
+            name = block[0].split()[1]
+            self.digest = block_digest(block, include)
+            if self.manifest.unchanged(name, self.digest):
+                text, length = self.manifest.reuse(name)
+                self.add_segments(name, length, [text[x*length:(x+1)*length] for x in range(len(self.names))])
+                return True
+        return False
+
+    def cluster(self, cluster):
+        if self.variable_only and cluster.same_sequences():
+            return
+        if self.lengths != None:
+            length = self.lengths[self.cluster_count]
+        else:
+            length = cluster.max_length()
+        missing = length*'?'
+        output = []
+        segments = []
+        #randomly define allele 1 and 2
+        for i in range(self.incl_samples):
+            x = random.randint(1,2)
+            alleles = draw_alleles(cluster, i, x, self.na, self.hemi)
+            for name, seq in alleles:
+                if seq != None:
+                    output.append(name+'\t'+seq+'\n')
+                elif self.miss == 1:
+                    output.append(name+'\t'+missing+'\n')
+            #alleles of good genotypes keep their order in the concatenated file
+            if self.na == 2 and cluster.flag(i) == 1:
+                alleles = [[None, cluster.seq(i*2)], [None, cluster.seq(i*2+1)]]
+            for name, seq in alleles:
+                if seq == None:
+                    seq = missing
+                segments.append(seq+'?'*(length-len(seq)))
+        self.cluster_files.write(self.base+'_clstr_'+cluster.name+'.phy',
+                                 str(len(output))+'\t'+str(length)+'\n'+''.join(output))
+        self.add_segments(cluster.name, length, segments)
+        if self.manifest:
+            self.manifest.add(cluster.name, self.digest, [self.base+'_clstr_'+cluster.name+'.phy'], ''.join(segments), length)
+
+    def add_segments(self, name, length, segments):
+        #add the row segments of a cluster to the concatenated files
+        for x in range(len(segments)):
+            self.concat[x].append(segments[x])
+        #write cluster block to interleaved file, names only in first block
+        if self.icatfile:
+            if self.cluster_count > 0:
+                self.icatfile.write('\n')
+            for x in range(len(segments)):
+                if self.cluster_count == 0:
+                    self.icatfile.write(self.names[x]+'\t')
+                self.icatfile.write(segments[x]+'\n')
+        #write range of cluster to partition file
+        if self.partfile:
+            self.partfile.write('DNA, Clstr'+name+' = '+str(self.total_length+1)+'-'+str(self.total_length+length)+'\n')
+        self.total_length += length
+        self.cluster_count += 1
+        self.buffered += length
+        if self.buffered*len(self.concat) >= self.flush_size:
+            with stage(self.timings, 'write (concatenated phylip)'):
+                self.flush()
+
+    def flush(self):
+        if self.buffered == 0:
+            return
+        for x in range(len(self.concat)):
+            data = ''.join(self.concat[x]).encode()
+            if self.lengths != None:
+                os.pwrite(self.cat.fileno(), data, self.row_offsets[x]+self.written)
+            else:
+                self.spill.write(data)
+            self.concat[x] = []
+        if self.lengths == None:
+            self.blocks.append(self.buffered)
+        self.written += self.buffered
+        self.buffered = 0
+
+    def stats(self):
+        stats = {'taxa': len(self.names), 'characters': self.total_length}
+        if self.manifest:
+            stats.update(self.manifest.stats())
+        return stats
+
+    def finish(self):
+        self.flush()
+        if self.lengths == None:
+            #copy each spilled block to its rows
+            self.cat = self.preallocate(self.total_length)
+            self.spill.seek(0)
+            written = 0
+            for width in self.blocks:
+                for x in range(len(self.names)):
+                    os.pwrite(self.cat.fileno(), self.spill.read(width), self.row_offsets[x]+written)
+                written += width
+            self.spill.close()
+        self.cat.close()
+        if self.icatfile:
+            if self.lengths == None:
+                icatfile = open(self.icatname,'w')
+                icatfile.write(str(len(self.names))+'\t'+str(self.total_length)+'\n')
+                self.icatfile.seek(0)
+                shutil.copyfileobj(self.icatfile, icatfile, 1024*1024)
+                icatfile.close()
+            self.icatfile.close()
+        if self.partfile:
+            self.partfile.close()
+
+def out2phylip(infile, infofile, base, catfile, na, hemi, miss=1, icatfile=None, partfile=None, arch=None, threads=0,
+               variable_only=False, verbose=True, timings=None, progress=None, summary=None, incremental=False,
+               follow=None):
+    """Convert an .out file to a phylip file per cluster and a concatenated phylip file.
+
+    The .out file is read twice: first to get the length of each cluster, so
+    the concatenated file can be written directly to its final offsets.
+    With incremental, a manifest is kept in base_manifest.json and only the
+    files of clusters that changed since the previous run are written. With
+    follow (a Follow), infile is converted while it is being written, so it
+    is read once and the concatenated file is put together at the end; the
+    same is done when infile is - (standard input).
+    """
+    samples = read_sample_info(infofile)
+    manifest = None
+    if incremental:
+        if arch:
+            raise ValueError('incremental runs cannot write to an -arch archive')
+        manifest = Manifest(base+'_manifest.json', 'phylip na='+str(na)+' hemi='+str(hemi)+' miss='+str(miss)+
+                            ' variable_only='+str(variable_only)+' samples='+','.join(samples.incl_names))
+    if verbose:
+        print('Found '+str(samples.num_samples)+' samples, of which '+str(samples.incl_samples)+' will be included in output file')
+    try:
+        lengths = None
+        if not follow and infile != STDIN:
+            if verbose:
+                print('\nCounting number of clusters and cluster lengths:')
+            with stage(timings, 'read (cluster lengths)'):
+                lengths = cluster_lengths(infile, samples, variable_only)
+            if verbose:
+                print('Found '+str(len(lengths))+' clusters with a total length of '+str(sum(lengths)))
+        if verbose:
+            print('\nGathering cluster data, writing phylip file for each cluster')
+        cluster_files = ClusterFiles(arch, threads, timings=timings)
+        writer = PhylipWriter(samples, na, hemi, miss, base, catfile, cluster_files, icatfile, partfile, lengths, timings,
+                              variable_only, manifest)
+        num_clusters = convert(infile, samples, [writer], verbose, timings, progress, summary, follow=follow)
+        cluster_files.close()
+        if manifest:
+            manifest.finish()
+    finally:
+        if manifest:
+            manifest.close()
+    if manifest and verbose:
+        print('\nWrote files of '+str(manifest.written)+' clusters, '+str(manifest.reused)+' clusters did not change')
+    return num_clusters
@@ -0,0 +1,107 @@
+import os, sys, time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+#progress of a run, printed every interval seconds and at the end: clusters read,
+#fraction of the input read, clusters and bytes per second, estimated time left
+#and current memory use (RSS). With kv, lines are written as key=value pairs
+#after the word PROGRESS, for scheduler logs
+
+try:
+    PAGE_KB = os.sysconf('SC_PAGE_SIZE')//1024
+except (AttributeError, ValueError, OSError):
+    PAGE_KB = 4
+
+def peak_rss():
+    """Return the peak resident set size of this process in kB, None where it is not available."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #ru_maxrss is in kB on Linux and in bytes on macOS
+    if sys.platform == 'darwin':
+        rss = rss//1024
+    return rss
+
+def current_rss():
+    """Return the resident set size of this process in kB (peak RSS where /proc is not available)."""
+    try:
+        statm = open('/proc/self/statm','r')
+        pages = int(statm.read().split()[1])
+        statm.close()
+        return pages*PAGE_KB
+    except (OSError, ValueError, IndexError):
+        return peak_rss()
+
+def format_seconds(seconds):
+    seconds = int(seconds)
+    return str(seconds//3600)+':'+str(seconds//60%60).zfill(2)+':'+str(seconds%60).zfill(2)
+
+class Progress:
+    """Reports clusters read, rate, ETA and memory while a file is converted.
+
+    start() is called with the size of the input, update() after each
+    cluster with the number of clusters and bytes read so far, and finish()
+    after the last one. update() only looks at the clock, so it can be
+    called for every cluster.
+    """
+    def __init__(self, interval=10.0, kv=False, out=None):
+        self.interval = interval
+        self.kv = kv
+        self.out = out
+        self.total_bytes = 0
+        self.clusters = 0
+        self.bytes = 0
+
+    def start(self, total_bytes):
+        self.total_bytes = total_bytes
+        self.clusters = 0
+        self.bytes = 0
+        self.start_time = time.monotonic()
+        self.next_time = self.start_time+self.interval
+
+    def update(self, clusters, bytes_read):
+        self.clusters = clusters
+        self.bytes = bytes_read
+        if time.monotonic() >= self.next_time:
+            self.report()
+            self.next_time = time.monotonic()+self.interval
+
+    def finish(self):
+        self.report(True)
+
+    def values(self):
+        """Return a dictionary with the current progress, rates, ETA (seconds) and RSS (kB)."""
+        elapsed = time.monotonic()-self.start_time
+        values = {'clusters': self.clusters,
+                  'bytes': self.bytes,
+                  'fraction': round(self.bytes/self.total_bytes, 4) if self.total_bytes else None,
+                  'elapsed_sec': round(elapsed, 3),
+                  'clusters_per_sec': round(self.clusters/elapsed, 1) if elapsed > 0 else None,
+                  'bytes_per_sec': round(self.bytes/elapsed) if elapsed > 0 else None,
+                  'eta_sec': None,
+                  'rss_kb': current_rss()}
+        if self.total_bytes and self.bytes and elapsed > 0:
+            values['eta_sec'] = round(max(self.total_bytes-self.bytes, 0)*elapsed/self.bytes, 1)
+        return values
+
+    def report(self, final=False):
+        values = self.values()
+        if self.kv:
+            line = 'PROGRESS '+('final=1 ' if final else '')+' '.join(key+'='+('NA' if value == None else str(value))
+                                                                    for key, value in values.items())
+        else:
+            line = str(values['clusters'])+' clusters'
+            if values['fraction'] != None:
+                line += ' ~ '+str(round(100*values['fraction']))+'%'
+            if values['clusters_per_sec'] != None:
+                line += ' | '+str(values['clusters_per_sec'])+' clusters/s | '+str(round(values['bytes_per_sec']/1e6, 1))+' MB/s'
+            if values['eta_sec'] != None and not final:
+                line += ' | ETA '+format_seconds(values['eta_sec'])
+            if final:
+                line += ' | '+format_seconds(values['elapsed_sec'])+' elapsed'
+            if values['rss_kb'] != None:
+                line += ' | RSS '+str(round(values['rss_kb']/1024, 1))+' MB'
+        print(line, file=self.out or sys.stdout, flush=True)
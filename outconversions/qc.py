@@ -0,0 +1,262 @@
+from array import array
+
+from .samples import read_sample_info
+from .convert import convert
+from .packed import numpy
+
+#quality control of an .out file in one pass: genotype flags and haplotype numbers
+#of the included samples are collected for a batch of clusters and counted per
+#sample (down the batch) and per locus (across it) with NumPy where it is installed
+
+SEXES = ('M','F','U')
+
+def count_haplotypes(haps):
+    """Return the number of different haplotypes (-1 is missing) in each row of a 2D NumPy array."""
+    haps = numpy.sort(haps, axis=1)
+    first = (haps[:,0] >= 0).astype(numpy.int64)
+    return first + ((haps[:,1:] != haps[:,:-1]) & (haps[:,1:] >= 0)).sum(1)
+
+def variable_sites(cluster):
+    #number of sites with more than one allele among the varsites of the samples
+    if numpy is not None:
+        offsets = numpy.frombuffer(cluster.site_offsets, numpy.dtype('l'))
+        lengths = numpy.diff(offsets)
+        data = numpy.frombuffer(cluster.sites, numpy.uint8)
+        present = (lengths != 1) | (data[offsets[:-1]] != ord('.'))
+        if not present.any():
+            return 0
+        length = int(lengths[present][0])
+        if (lengths[present] == length).all():
+            #varsites of the same length, one row each
+            rows = data[numpy.repeat(present, lengths)].reshape(-1, length)
+            return int((rows != rows[0]).any(0).sum())
+    offsets = cluster.site_offsets
+    sites = set(cluster.sites[offsets[r]:offsets[r+1]] for r in range(len(offsets)-1))
+    sites.discard(b'.')
+    if len(sites) < 2:
+        return 0
+    return sum(1 for alleles in zip(*sites) if len(set(alleles)) > 1)
+
+def longest_sequence(cluster):
+    #length of the longest sequence, 0 when all sequences are missing ('.')
+    if numpy is not None:
+        length = int(numpy.diff(numpy.frombuffer(cluster.seq_offsets, numpy.dtype('l'))).max())
+    else:
+        offsets = cluster.seq_offsets
+        length = max(offsets[r+1]-offsets[r] for r in range(len(offsets)-1))
+    if length == 1 and cluster.seqs.count(b'.') == len(cluster.seqs):
+        return 0
+    return length
+
+class QCWriter:
+    """Per-sample and per-locus quality control of the included samples.
+
+    Each locus row (written as clusters are read) holds the number and
+    proportion of samples with a genotype (flag other than 0), the numbers of
+    good (flag 1) and low depth or flagged (flag >1) genotypes, the proportion
+    of good genotypes that are heterozygous, the number of variable sites and
+    haplotypes, and the length of the longest sequence. Each sample row
+    (written at the end) holds its missing (flag 0) and flagged genotypes,
+    the latter as a proportion of its genotypes, and its heterozygosity.
+
+    With zlinked (the cluster numbers of Z-linked loci), heterozygosity is
+    also counted separately on the Z-linked loci, and a sample is inferred to
+    be female (haploid on Z) when its Z heterozygosity is at most zratio times
+    that of the other loci, given at least zmin good Z-linked genotypes;
+    samples where this contradicts the sex (M or F) in the sample info file
+    are flagged. For X chromosomes in XY systems, sex coding needs to be
+    reversed, as in out2phistZ.py.
+    """
+    def __init__(self, samples, sample_file, locus_file, zlinked=None, zratio=0.2, zmin=10, batch=1024):
+        self.names = samples.incl_names
+        self.pops = samples.incl_pops
+        self.sexes = samples.incl_sexes
+        self.incl_samples = samples.incl_samples
+        self.sample_file = sample_file
+        self.zlinked = set(zlinked) if zlinked != None else None
+        self.zratio = zratio
+        self.zmin = zmin
+        self.batch = batch
+        if self.zlinked != None:
+            for sex in self.sexes:
+                if sex not in SEXES:
+                    raise ValueError('included sample has assigned sex other than M, F, or U')
+
+        #per sample counts, autosomal (not Z-linked) and Z-linked good and heterozygous genotypes
+        self.clusters = 0
+        self.missing = [0]*self.incl_samples
+        self.flagged = [0]*self.incl_samples
+        self.good = [[0]*self.incl_samples, [0]*self.incl_samples]
+        self.het = [[0]*self.incl_samples, [0]*self.incl_samples]
+        if numpy is not None:
+            self.missing = numpy.zeros(self.incl_samples, numpy.int64)
+            self.flagged = numpy.zeros(self.incl_samples, numpy.int64)
+            self.good = numpy.zeros((2, self.incl_samples), numpy.int64)
+            self.het = numpy.zeros((2, self.incl_samples), numpy.int64)
+
+        #clusters of the current batch
+        self.batch_names = []
+        self.batch_z = []
+        self.batch_sites = array('l')
+        self.batch_lengths = array('l')
+        self.batch_flags = bytearray()
+        self.batch_haps = bytearray()
+
+        self.outf = open(locus_file,'w')
+        self.outf.write('Cluster\tSamples_genotyped\tCoverage\tGood_genotypes\tFlagged_genotypes\tHeterozygosity\tSNPs\tHaplotypes\tLength'+
+                        ('\tZ_linked' if self.zlinked != None else '')+'\n')
+
+    def cluster(self, cluster):
+        self.batch_names.append(cluster.name)
+        self.batch_z.append(self.zlinked != None and cluster.name in self.zlinked)
+        self.batch_sites.append(variable_sites(cluster))
+        self.batch_lengths.append(longest_sequence(cluster))
+        self.batch_flags += cluster.flags.tobytes()
+        self.batch_haps += cluster.haps.tobytes()
+        if len(self.batch_names) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        #count the genotypes of the clusters of the batch and write their locus rows
+        b = len(self.batch_names)
+        n = self.incl_samples
+        if b == 0:
+            return
+        if numpy is not None:
+            flags = numpy.frombuffer(bytes(self.batch_flags), numpy.int8).reshape(b, n)
+            haps = numpy.frombuffer(bytes(self.batch_haps), numpy.int16).reshape(b, n*2)
+            zlinked = numpy.array(self.batch_z, bool)
+            good = flags == 1
+            het = good & (haps[:,0::2] != haps[:,1::2])
+            self.missing += (flags == 0).sum(0)
+            self.flagged += (flags > 1).sum(0)
+            self.good[0] += good[~zlinked].sum(0)
+            self.good[1] += good[zlinked].sum(0)
+            self.het[0] += het[~zlinked].sum(0)
+            self.het[1] += het[zlinked].sum(0)
+            genotyped = (flags != 0).sum(1).tolist()
+            locus_good = good.sum(1).tolist()
+            locus_flagged = (flags > 1).sum(1).tolist()
+            locus_het = het.sum(1).tolist()
+            locus_haps = count_haplotypes(haps).tolist()
+        else:
+            genotyped, locus_good, locus_flagged, locus_het, locus_haps = [], [], [], [], []
+            for c in range(b):
+                flags = self.batch_flags[c*n:(c+1)*n]
+                haps = array('h', self.batch_haps[c*n*4:(c+1)*n*4])
+                z = 1 if self.batch_z[c] else 0
+                counts = [0, 0, 0, 0]
+                for k in range(n):
+                    flag = flags[k]
+                    if flag == 0:
+                        self.missing[k] += 1
+                        continue
+                    counts[0] += 1
+                    if flag > 1:
+                        self.flagged[k] += 1
+                        counts[2] += 1
+                    elif flag == 1:
+                        self.good[z][k] += 1
+                        counts[1] += 1
+                        if haps[k*2] != haps[k*2+1]:
+                            self.het[z][k] += 1
+                            counts[3] += 1
+                genotyped.append(counts[0])
+                locus_good.append(counts[1])
+                locus_flagged.append(counts[2])
+                locus_het.append(counts[3])
+                locus_haps.append(len(set(haps)-{-1}))
+
+        lines = []
+        for c in range(b):
+            line = [self.batch_names[c], str(genotyped[c]), str(round(genotyped[c]/n, 4) if n else 0), str(locus_good[c]),
+                    str(locus_flagged[c]), str(round(locus_het[c]/locus_good[c], 4) if locus_good[c] else 'NA'),
+                    str(self.batch_sites[c]), str(locus_haps[c]), str(self.batch_lengths[c])]
+            if self.zlinked != None:
+                line.append('yes' if self.batch_z[c] else 'no')
+            lines.append('\t'.join(line)+'\n')
+        self.outf.write(''.join(lines))
+
+        self.clusters += b
+        self.batch_names = []
+        self.batch_z = []
+        self.batch_sites = array('l')
+        self.batch_lengths = array('l')
+        self.batch_flags = bytearray()
+        self.batch_haps = bytearray()
+
+    def sex_check(self, k):
+        """Return the inferred sex of sample k (F, M or NA) and whether it contradicts the recorded sex."""
+        z_good = int(self.good[1][k])
+        good = int(self.good[0][k])
+        if z_good < self.zmin or good == 0:
+            return 'NA', False
+        z_het = int(self.het[1][k])/z_good
+        het = int(self.het[0][k])/good
+        if het == 0:
+            return 'NA', False
+        inferred = 'F' if z_het <= self.zratio*het else 'M'
+        return inferred, self.sexes[k] in ('M','F') and self.sexes[k] != inferred
+
+    def conflicts(self):
+        """Return the names of the samples whose inferred sex contradicts the sample info file."""
+        if self.zlinked == None:
+            return []
+        return [self.names[k] for k in range(self.incl_samples) if self.sex_check(k)[1]]
+
+    def stats(self):
+        stats = {'loci': self.clusters, 'samples': self.incl_samples}
+        if self.zlinked != None:
+            stats['z_linked_loci'] = len(self.zlinked)
+            stats['sex_conflicts'] = len(self.conflicts())
+        return stats
+
+    def finish(self):
+        self.flush()
+        self.outf.close()
+
+        out = open(self.sample_file,'w')
+        out.write('Sample\tPopulation\tSex\tClusters\tMissing\tMissing_rate\tFlagged\tFlagged_rate\tGood_genotypes\tHeterozygous\tHeterozygosity')
+        if self.zlinked != None:
+            out.write('\tZ_good_genotypes\tZ_heterozygous\tZ_heterozygosity\tInferred_sex\tSex_conflict')
+        out.write('\n')
+        for k in range(self.incl_samples):
+            missing = int(self.missing[k])
+            flagged = int(self.flagged[k])
+            good = int(self.good[0][k])+int(self.good[1][k])
+            het = int(self.het[0][k])+int(self.het[1][k])
+            genotyped = self.clusters-missing
+            line = [self.names[k], self.pops[k], self.sexes[k], str(self.clusters),
+                    str(missing), str(round(missing/self.clusters, 4) if self.clusters else 'NA'),
+                    str(flagged), str(round(flagged/genotyped, 4) if genotyped else 'NA'),
+                    str(good), str(het), str(round(het/good, 4) if good else 'NA')]
+            if self.zlinked != None:
+                z_good = int(self.good[1][k])
+                z_het = int(self.het[1][k])
+                inferred, conflict = self.sex_check(k)
+                line += [str(z_good), str(z_het), str(round(z_het/z_good, 4) if z_good else 'NA'), inferred,
+                         'yes' if conflict else 'no']
+            out.write('\t'.join(line)+'\n')
+        out.close()
+
+def out2qc(infile, infofile, sample_file, locus_file, zlinked=None, zratio=0.2, zmin=10, verbose=True,
+           timings=None, progress=None, summary=None, cache=None, follow=None):
+    """Write per-sample and per-locus quality control tables of an .out file.
+
+    zlinked is a list of the cluster numbers of Z-linked loci, for the
+    check of the sex of each sample. With follow (a Follow), infile is
+    read while it is being written.
+    """
+    samples = read_sample_info(infofile)
+    writer = QCWriter(samples, sample_file, locus_file, zlinked, zratio, zmin)
+    if verbose:
+        print('Found '+str(samples.num_samples)+' samples in file')
+        print('Quality control will use '+str(samples.incl_samples)+' samples')
+        if zlinked != None:
+            print(str(len(writer.zlinked))+' clusters are Z-linked')
+        print('\nCounting genotypes of each cluster')
+    convert(infile, samples, [writer], verbose, timings, progress, summary, cache, follow)
+    if verbose and zlinked != None:
+        conflicts = writer.conflicts()
+        print('\n'+str(len(conflicts))+' samples with Z heterozygosity contradicting their sex'+(': '+', '.join(conflicts) if conflicts else ''))
+    return writer
@@ -0,0 +1,143 @@
+import os, sys, time
+
+from .cluster import Cluster, SEQ
+
+#each cluster of an .out file has two header lines, the first starting with
+#Clstr and the cluster number, followed by two lines for every sample; an .out
+#file named - is read from standard input (e.g. from out2parseclusters.py -o -)
+
+STDIN = '-'
+
+def open_input(infile):
+    """Return infile opened for reading, or standard input when infile is -."""
+    if infile == STDIN:
+        return open(sys.stdin.fileno(),'r',closefd=False)
+    return open(infile,'r')
+
+def input_size(infile):
+    """Return the size of infile in bytes, 0 for standard input."""
+    if infile == STDIN:
+        return 0
+    return os.path.getsize(infile)
+
+def block_size(num_samples):
+    return 2 + num_samples*2
+
+def read_blocks(infile, num_samples):
+    """Yield the lines of each cluster of an open .out file."""
+    size = block_size(num_samples)
+    for header1 in infile:
+        if header1.strip() == '':
+            continue
+        block = [header1]
+        for i in range(size-1):
+            line = infile.readline()
+            if line == '':
+                raise ValueError('cluster '+header1.split()[1]+' is incomplete')
+            block.append(line)
+        yield block
+
+def follow_blocks(path, num_samples, follow):
+    """Yield the lines of each cluster of an .out file that is still being written, as soon as the cluster is complete.
+
+    follow (a Follow) tells when the file is complete; after that the rest
+    of the file is read and an incomplete last cluster is an error.
+    """
+    size = block_size(num_samples)
+    while not os.path.exists(path):
+        if follow.finished():
+            raise ValueError('file '+path+' was not written')
+        time.sleep(follow.poll)
+    inf = open(path,'rb')
+    pending = b''
+    block = []
+    ended = False
+    while True:
+        line = inf.readline()
+        if line.endswith(b'\n'):
+            line = (pending+line).decode()
+            pending = b''
+            if block or line.strip() != '':
+                block.append(line)
+                if len(block) == size:
+                    yield block
+                    block = []
+            continue
+        #no complete line yet: keep what was read, stop after one more read once the file is complete
+        pending += line
+        if ended:
+            break
+        ended = follow.finished()
+        if not ended:
+            time.sleep(follow.poll)
+    inf.close()
+    if pending.strip() != b'':
+        block.append(pending.decode())
+    if block:
+        if len(block) < size:
+            raise ValueError('cluster '+block[0].split()[1]+' is incomplete')
+        yield block
+
+def read_range(path, start, stop, num_samples):
+    """Yield the lines of each cluster of an .out file whose Clstr line starts at a byte offset in [start, stop).
+
+    Reading begins at the first Clstr line at or after start, so a file can
+    be split at any byte offsets and each cluster is read for exactly one range.
+    """
+    size = block_size(num_samples)
+    inf = open(path,'rb')
+    if start > 0:
+        #move to the start of the first line beginning at or after start
+        inf.seek(start-1)
+        inf.readline()
+    position = inf.tell()
+    for header1 in iter(inf.readline, b''):
+        if position >= stop:
+            break
+        if header1.startswith(b'Clstr'):
+            block = [header1.decode()]
+            for i in range(size-1):
+                line = inf.readline()
+                if line == b'':
+                    inf.close()
+                    raise ValueError('cluster '+block[0].split()[1]+' is incomplete')
+                block.append(line.decode())
+            yield block
+        position = inf.tell()
+    inf.close()
+
+def block_column(block, include, column):
+    """Return one column of the rows of the included samples of a cluster, splitting lines only up to that column."""
+    values = []
+    for k in range(len(include)):
+        if include[k]:
+            values.append(block[k*2+2].split(None, column+1)[column])
+            values.append(block[k*2+3].split(None, column+1)[column])
+    return values
+
+def same_sequences(block, include):
+    """Return True when the included samples of a cluster have at most one sequence other than missing ('.')."""
+    seqs = set(block_column(block, include, SEQ))
+    seqs.discard('.')
+    return len(seqs) < 2
+
+def parse_block(block, include, names=None):
+    """Return a Cluster with the rows of the samples where include is True.
+
+    names is the tuple of sample names of the previous cluster, so the names
+    are only stored once per run.
+    """
+    rows = []
+    for k in range(len(include)):
+        if include[k]:
+            rows.append(block[k*2+2].split())
+            rows.append(block[k*2+3].split())
+    return Cluster.from_rows(block[0].split()[1], rows, names)
+
+def read_clusters(infile, include):
+    """Yield a Cluster with the included samples for each cluster of an open .out file."""
+    names = None
+    for block in read_blocks(infile, len(include)):
+        cluster = parse_block(block, include, names)
+        names = cluster.names
+        yield cluster
@@ -0,0 +1,42 @@
+#sample info file: tab delimited with a header row and the columns order, sample,
+#genus, species, population, sex, color and shape (see sample_info_file.readme)
+
+class SampleInfo:
+    """Samples of a sample info file, in the order they appear in the .out file.
+
+    Samples with a population of -9 are excluded from conversions; the
+    incl_* lists hold the included samples only.
+    """
+    def __init__(self, names, pops, sexes):
+        self.names = names
+        self.pops = pops
+        self.sexes = sexes
+        self.include = [pop != '-9' for pop in pops]
+        self.incl_names = [names[i] for i in range(len(names)) if self.include[i]]
+        self.incl_pops = [pops[i] for i in range(len(pops)) if self.include[i]]
+        self.incl_sexes = [sexes[i] for i in range(len(sexes)) if self.include[i]]
+
+    @property
+    def num_samples(self):
+        return len(self.names)
+
+    @property
+    def incl_samples(self):
+        return len(self.incl_names)
+
+def read_sample_info(path):
+    """Read a sample info file and return a SampleInfo."""
+    names = []
+    pops = []
+    sexes = []
+    infofile = open(path,'r')
+    header = infofile.readline()
+    for line in infofile:
+        data = line.split()
+        if data == []:
+            continue
+        names.append(data[1])
+        pops.append(data[4])
+        sexes.append(data[5] if len(data) > 5 else 'U')
+    infofile.close()
+    return SampleInfo(names, pops, sexes)
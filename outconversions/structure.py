@@ -0,0 +1,212 @@
+import random
+from array import array
+
+from .samples import read_sample_info
+from .cluster import HAP, VARSITES
+from .reader import block_column
+from .convert import convert
+from .packed import numpy, PackedColumn
+
+CHARACTER_TYPES = ['HAP','ALLSNP','ALLBISNP','1BISNP']
+
+#codes used for SNPs/indels in STRUCTURE file, anything else is missing (-9);
+#SNPs/indels are held as code numbers, 0 for missing data
+CODE_NUMBERS = {'A':1, 'C':2, 'G':3, 'T':4, '0':5, '1':6}
+CODE_STRINGS = ['-9','1','2','3','4','5','6']
+if numpy is not None:
+    CODE_TABLE = numpy.zeros(256, numpy.uint8)
+    for base, number in CODE_NUMBERS.items():
+        CODE_TABLE[ord(base)] = number
+    ALLELE_BITS = numpy.array([0,2,4,8,16,32,64], numpy.uint8)
+
+class HapColumn:
+    """Haplotype number (+1) of each allele, -9 for missing data."""
+    __slots__ = ('label', 'haps')
+
+    def __init__(self, label, haps):
+        self.label = label
+        self.haps = array('h', haps)
+
+    def values(self, start, stop):
+        return [str(hap) for hap in self.haps[start:stop]]
+
+class CodeColumn:
+    """SNP/indel with the code number of each allele in one byte."""
+    __slots__ = ('label', 'codes')
+
+    def __init__(self, label, codes):
+        self.label = label
+        self.codes = bytes(codes)
+
+    def values(self, start, stop):
+        return [CODE_STRINGS[code] for code in self.codes[start:stop]]
+
+def site_codes(varsites, scored, num_snp):
+    """Return the code numbers of the alleles at each site, one sequence per site.
+
+    Alleles where scored is False are missing.
+    """
+    if numpy is not None:
+        text = ''.join(v[:num_snp].ljust(num_snp,'.') if ok else '.'*num_snp for v, ok in zip(varsites, scored))
+        codes = CODE_TABLE[numpy.frombuffer(text.encode(), numpy.uint8)]
+        return codes.reshape(len(varsites), num_snp).T
+    return [[CODE_NUMBERS.get(v[s], 0) if ok else 0 for v, ok in zip(varsites, scored)] for s in range(num_snp)]
+
+def allele_masks(codes):
+    #bit set for each code number present at each site
+    if numpy is not None:
+        return numpy.bitwise_or.reduce(ALLELE_BITS[codes], axis=1).tolist()
+    masks = []
+    for site in codes:
+        mask = 0
+        for code in site:
+            mask |= 1 << code
+        masks.append(mask & ~1)
+    return masks
+
+def biallelic_column(label, site, mask):
+    #pack a site with two code numbers as alleles 1 and 2
+    first = (mask & -mask).bit_length()-1
+    second = mask.bit_length()-1
+    if numpy is not None:
+        allele_codes = (site == first) + 2*(site == second).astype(numpy.uint8)
+    else:
+        allele_codes = [1 if code == first else 2 if code == second else 0 for code in site]
+    return PackedColumn(label, allele_codes, (CODE_STRINGS[first], CODE_STRINGS[second]))
+
+class StructureWriter:
+    """STRUCTURE file with one column per character, samples as rows.
+
+    ct selects the characters: HAP (haplotype numbers), ALLSNP (all SNPs/indels),
+    ALLBISNP (all biallelic SNPs/indels with a minor allele count of at least
+    min_freq) or 1BISNP (one randomly drawn biallelic SNP/indel per cluster).
+    Only clusters that are variable for the included samples are used. With
+    zlinked, females (F) are coded as haploid: only their first allele is
+    scored and the second is -9.
+
+    Characters are kept until the file is written: biallelic SNPs/indels with
+    2 bits per allele, other SNPs/indels with one byte per allele.
+    """
+    def __init__(self, samples, outfile, ct, min_freq=1, hemi=1, zlinked=False):
+        self.outfile = outfile
+        self.incl_samples = samples.incl_samples
+        self.ct = ct
+        self.min = min_freq
+        self.hemi = hemi
+        if zlinked:
+            self.haploid = [sex == 'F' for sex in samples.incl_sexes]
+        else:
+            self.haploid = [False]*samples.incl_samples
+        self.row_names = []
+        for sample in samples.incl_names:
+            self.row_names.append(sample+'a')
+            self.row_names.append(sample+'b')
+        self.columns = []
+        self.var_cluster = 0
+        self.invariant = 0
+
+    def scored_rows(self, cluster):
+        #True for alleles that are scored, by genotype flag, hemi and sex
+        scored = []
+        for k in range(self.incl_samples):
+            flag = cluster.flag(k)
+            if flag == 0 or (flag > 1 and self.hemi == 0):
+                scored.extend((False, False))
+            elif flag == 1 and not self.haploid[k]:
+                scored.extend((True, True))
+            else: #hemizygous or haploid genotype
+                scored.extend((True, False))
+        return scored
+
+    def invariant_block(self, block, include):
+        #skip clusters that are not variable for the included samples before parsing;
+        #haplotype numbers are compared as text, so clusters where they only differ
+        #in how they are written are left to cluster()
+        if self.ct == 'HAP':
+            invariant = len(set(block_column(block, include, HAP))) < 2
+        else:
+            sites = set(block_column(block, include, VARSITES))
+            sites.discard('.')
+            invariant = len(sites) < 2
+        if invariant:
+            self.invariant += 1
+        return invariant
+
+    def cluster(self, cluster):
+        rows = range(self.incl_samples*2)
+        if self.ct == 'HAP':
+            #check if cluster is variable for included samples
+            haps = set(cluster.hap(r) for r in rows)
+            if len(haps) > 1:
+                self.var_cluster += 1
+                scored = self.scored_rows(cluster)
+                self.columns.append(HapColumn(cluster.name, [cluster.hap(r)+1 if scored[r] else -9 for r in rows]))
+            else:
+                self.invariant += 1
+            return
+
+        #check if cluster is variable for included samples
+        varsites = [cluster.varsites(r) for r in rows]
+        present = [v for v in varsites if v != '.']
+        if len(set(present)) < 2:
+            self.invariant += 1
+            return
+        self.var_cluster += 1
+        num_snp = len(present[0])
+        codes = site_codes(varsites, self.scored_rows(cluster), num_snp)
+        if self.ct == 'ALLSNP':
+            for s in range(num_snp):
+                self.columns.append(CodeColumn(cluster.name+'.'+str(s+1), codes[s]))
+            return
+
+        if self.ct == '1BISNP':
+            #randomize order of snps
+            sites = random.sample(list(range(num_snp)),num_snp)
+        else:
+            sites = range(num_snp)
+        masks = allele_masks(codes)
+        for s in sites:
+            #check if snp is biallelic and passes min freq threshold
+            if bin(masks[s]).count('1') != 2:
+                continue
+            column = biallelic_column(cluster.name+'.'+str(s+1), codes[s], masks[s])
+            if min(column.counts()) >= self.min:
+                self.columns.append(column)
+                if self.ct == '1BISNP':
+                    break
+
+    def stats(self):
+        return {'variable_clusters': self.var_cluster, 'invariant_clusters': self.invariant, 'characters': len(self.columns)}
+
+    def finish(self):
+        #write transposed columns, one row per allele of each sample, in blocks of
+        #rows so only part of the matrix is unpacked at a time
+        out = open(self.outfile,'w')
+        out.write('\t'+''.join(column.label+'\t' for column in self.columns)+'\n')
+        num_rows = len(self.row_names)
+        step = max(4, 4000000//max(1, len(self.columns)) & ~3)
+        for start in range(0, num_rows, step):
+            stop = min(num_rows, start+step)
+            values = [column.values(start, stop) for column in self.columns]
+            for i in range(stop-start):
+                out.write(self.row_names[start+i]+'\t'+''.join(v[i]+'\t' for v in values)+'\n')
+        out.close()
+
+def out2structure(infile, infofile, outfile, ct, min_freq=1, hemi=1, zlinked=False, verbose=True,
+                  timings=None, progress=None, summary=None, cache=None, follow=None):
+    """Convert an .out file to a STRUCTURE file.
+
+    With follow (a Follow), infile is converted while it is being written.
+    """
+    if ct not in CHARACTER_TYPES:
+        raise ValueError('ct parameter does not match one of four possible options')
+    samples = read_sample_info(infofile)
+    if verbose:
+        print('Found '+str(samples.num_samples)+' samples, of which '+str(samples.incl_samples)+' will be included in output file')
+        print('\nGathering cluster data, creating structure file based on '+ct)
+    writer = StructureWriter(samples, outfile, ct, min_freq, hemi, zlinked)
+    convert(infile, samples, [writer], verbose, timings, progress, summary, cache, follow)
+    if verbose:
+        print('\nFound '+str(writer.var_cluster)+' variable clusters for included samples, '+
+              'which collectively contain '+str(len(writer.columns))+' '+ct+' characters')
+    return writer
@@ -0,0 +1,111 @@
+import os, json, time, platform
+
+from .progress import peak_rss
+from .reader import STDIN
+
+#summary of a run for dashboards: input, samples, clusters read, values of each
+#writer (e.g. variable clusters and characters written), wall time per stage,
+#throughput and peak memory, written as JSON and/or as a Prometheus textfile
+#(for the node_exporter textfile collector)
+
+class RunSummary:
+    """Values of one run of a conversion script.
+
+    convert() adds the input file, samples and number of clusters read, and
+    the stats() of each writer that has one; stage times are taken from
+    timings when it is given.
+    """
+    def __init__(self, script, timings=None):
+        self.script = os.path.basename(script)
+        self.timings = timings
+        self.start = time.perf_counter()
+        self.infile = None
+        self.input_bytes = None
+        self.samples = None
+        self.clusters = 0
+        self.writers = {}
+
+    def add_input(self, infile, samples, clusters):
+        self.infile = infile
+        self.input_bytes = None if infile == STDIN else os.path.getsize(infile)
+        self.samples = samples
+        self.clusters += clusters
+
+    def add_writer(self, name, stats):
+        self.writers[name] = stats
+
+    def report(self):
+        """Return the summary as a dictionary."""
+        seconds = time.perf_counter()-self.start
+        report = {'script': self.script,
+                  'finished': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                  'infile': self.infile,
+                  'input_bytes': self.input_bytes,
+                  'clusters_read': self.clusters,
+                  'samples': None,
+                  'writers': self.writers,
+                  'seconds': round(seconds, 3),
+                  'stages': None,
+                  'clusters_per_sec': round(self.clusters/seconds, 1) if seconds > 0 else None,
+                  'bytes_per_sec': round(self.input_bytes/seconds) if seconds > 0 and self.input_bytes else None,
+                  'peak_rss_kb': peak_rss(),
+                  'python': platform.python_version()}
+        if self.samples:
+            report['samples'] = {'total': self.samples.num_samples,
+                                 'included': self.samples.incl_samples,
+                                 'excluded': self.samples.num_samples-self.samples.incl_samples}
+        if self.timings:
+            report['stages'] = {name: {'seconds': round(self.timings.seconds[name], 4), 'calls': self.timings.calls[name]}
+                                for name in self.timings.seconds}
+        return report
+
+    def write_json(self, path):
+        outfile = open(path,'w')
+        json.dump(self.report(), outfile, indent=1)
+        outfile.write('\n')
+        outfile.close()
+
+    def write_prometheus(self, path):
+        """Write the summary in the Prometheus text format, replacing path in one step."""
+        report = self.report()
+        script = 'script="'+report['script']+'"'
+        lines = []
+
+        def metric(name, help, values):
+            #values is a list of (labels, value), None values are left out
+            values = [(labels, value) for labels, value in values if value != None]
+            if values:
+                lines.append('# HELP outconversions_'+name+' '+help)
+                lines.append('# TYPE outconversions_'+name+' gauge')
+                for labels, value in values:
+                    lines.append('outconversions_'+name+'{'+','.join([script]+labels)+'} '+str(value))
+
+        metric('clusters_read', 'Clusters read from the .out file.', [([], report['clusters_read'])])
+        metric('input_bytes', 'Size of the .out file in bytes.', [([], report['input_bytes'])])
+        if report['samples']:
+            metric('samples', 'Samples in the sample info file, by whether they are included.',
+                   [(['status="'+status+'"'], report['samples'][status]) for status in ('included','excluded')])
+        metric('writer_value', 'Values reported by each writer, e.g. variable clusters and characters written.',
+               [(['writer="'+writer+'"', 'name="'+name+'"'], value) for writer in report['writers']
+                for name, value in report['writers'][writer].items()])
+        metric('run_seconds', 'Wall time of the run in seconds.', [([], report['seconds'])])
+        if report['stages']:
+            metric('stage_seconds', 'Wall time of each stage of the run in seconds.',
+                   [(['stage="'+name+'"'], report['stages'][name]['seconds']) for name in report['stages']])
+            metric('stage_calls', 'Number of calls of each stage of the run.',
+                   [(['stage="'+name+'"'], report['stages'][name]['calls']) for name in report['stages']])
+        metric('clusters_per_second', 'Clusters read per second.', [([], report['clusters_per_sec'])])
+        metric('bytes_per_second', 'Bytes of the .out file read per second.', [([], report['bytes_per_sec'])])
+        metric('peak_rss_kilobytes', 'Peak resident set size in kB.', [([], report['peak_rss_kb'])])
+        metric('last_run_timestamp_seconds', 'Time the run finished, in seconds since the epoch.', [([], int(time.time()))])
+
+        outfile = open(path+'.tmp','w')
+        outfile.write('\n'.join(lines)+'\n')
+        outfile.close()
+        os.replace(path+'.tmp', path)
+
+    def write(self, json_path=None, prometheus_path=None):
+        if json_path:
+            self.write_json(json_path)
+        if prometheus_path:
+            self.write_prometheus(prometheus_path)
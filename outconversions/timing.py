@@ -0,0 +1,77 @@
+import time, cProfile, threading
+from contextlib import nullcontext
+
+#wall time and number of calls of each stage of a run (reading, parsing, computing
+#and writing), printed with -timings; stages can be nested, the time of a stage
+#does not include the time of the stages inside it
+
+NO_STAGE = nullcontext()
+
+class Timings:
+    """Wall time (seconds) and number of calls of each stage of a run."""
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.seconds = {}
+        self.calls = {}
+        self.stack = []
+        self.lock = threading.Lock()
+
+    def add(self, name, seconds, calls=1):
+        #can be called from any thread, e.g. by the writer threads of ClusterFiles
+        with self.lock:
+            self.seconds[name] = self.seconds.get(name, 0.0)+seconds
+            self.calls[name] = self.calls.get(name, 0)+calls
+
+    def stage(self, name):
+        return Stage(self, name)
+
+    def report(self):
+        """Return a table with the seconds, calls and percentage of the run of each stage."""
+        total = time.perf_counter()-self.start
+        lines = ['Stage'.ljust(36)+'Seconds'.rjust(10)+'Calls'.rjust(10)+'% of run'.rjust(10)]
+        for name in self.seconds:
+            lines.append(name.ljust(36)+('%.3f' % self.seconds[name]).rjust(10)+str(self.calls[name]).rjust(10)+
+                         ('%.1f' % (100*self.seconds[name]/total if total > 0 else 0)).rjust(10))
+        other = total-sum(self.seconds[name] for name in self.seconds if not name.endswith('threads)'))
+        lines.append('other'.ljust(36)+('%.3f' % max(other, 0)).rjust(10)+''.rjust(10)+
+                     ('%.1f' % (100*max(other, 0)/total if total > 0 else 0)).rjust(10))
+        lines.append('total'.ljust(36)+('%.3f' % total).rjust(10))
+        return '\n'.join(lines)
+
+class Stage:
+    #context manager timing one call of a stage on the main thread
+    __slots__ = ('timings', 'name', 'start', 'inner')
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.inner = 0.0
+        self.timings.stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter()-self.start
+        self.timings.stack.pop()
+        if self.timings.stack:
+            self.timings.stack[-1].inner += seconds
+        self.timings.add(self.name, seconds-self.inner)
+        return False
+
+def stage(timings, name):
+    """Return a context manager timing a stage, or one doing nothing when timings is None."""
+    if timings is None:
+        return NO_STAGE
+    return Stage(timings, name)
+
+def run_profiled(profile, function, *args, **kwargs):
+    """Call function, under cProfile with stats written to the file profile if it is given."""
+    if not profile:
+        return function(*args, **kwargs)
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(function, *args, **kwargs)
+    finally:
+        profiler.dump_stats(profile)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+##################################
+##
+## outconvert.py
+##
+## Version 1.00 -- 19 October 2026
+##
+## This Python (v3) script converts an out file (with select clusters)
+## to several formats in a single pass: a fasta, nexus and/or phylip
+## file for each cluster (with concatenated nexus and phylip files),
+## a STRUCTURE file and a fineRADstructure file. Each cluster is read
+## once and handed to a writer for every requested format. Writers
+## follow the rules of out2fastaA.py, out2nexusA.py, out2phylipA.py,
+## out2structureA.py and out2fineRADstructureA.py, and assume that all
+## clusters are located on autosomes. Samples with a "-9" in the
+## population column of the sample info file are skipped.
+##
+## This script is free and distributed WITHOUT warranty; without
+## even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+## PARTICULAR PURPOSE.
+##
+##################################
+
+import argparse
+from argparse import RawTextHelpFormatter
+
+from outconversions import read_sample_info, convert, ClusterFiles, Timings, Progress, RunSummary, run_profiled
+from outconversions import FastaWriter, NexusWriter, PhylipWriter, StructureWriter, FineRADstructureWriter
+
+def main():
+    print()
+
+    #create variables that can be entered as arguments in command line
+    parser = argparse.ArgumentParser(description=
+                                     'This Python (v3) script converts an out file (with select clusters)\n'+
+                                     'to several formats in a single pass: a fasta, nexus and/or phylip\n'+
+                                     'file for each cluster (with concatenated nexus and phylip files),\n'+
+                                     'a STRUCTURE file and a fineRADstructure file. Each cluster is read\n'+
+                                     'once and handed to a writer for every requested format. Writers\n'+
+                                     'follow the rules of out2fastaA.py, out2nexusA.py, out2phylipA.py,\n'+
+                                     'out2structureA.py and out2fineRADstructureA.py, and assume that all\n'+
+                                     'clusters are located on autosomes. Samples with a "-9" in the\n'+
+                                     'population column of the sample info file are skipped.\n\n'+
+                                     'This script is free and distributed WITHOUT warranty; without\n'+
+                                     'even the implied warranty of MERCHANTABILITY or FITNESS FOR A\n'+
+                                     'PARTICULAR PURPOSE.', formatter_class=RawTextHelpFormatter)
+
+    requiredParam = parser.add_argument_group('required parameters')
+    requiredParam.add_argument('-i', type=str, metavar='infile', required=True, help='Name of input .out file with selected clusters,\n'+
+                        'or - to read from standard input')
+    requiredParam.add_argument('-si', type=str, metavar='infofile', required=True, help='Name of sample info file')
+
+    outputParam = parser.add_argument_group('output formats (at least one is required)')
+    outputParam.add_argument('-fasta', type=str, metavar='basename', default=None, help='Base name of fasta files for individual clusters')
+    outputParam.add_argument('-nexus', type=str, metavar='basename', default=None, help='Base name of nexus files for individual clusters')
+    outputParam.add_argument('-nexuscat', type=str, metavar='catfile', default=None, help='Name of nexus file with concatenated sequences\n'+
+                             '(required with -nexus)')
+    outputParam.add_argument('-phylip', type=str, metavar='basename', default=None, help='Base name of phylip files for individual clusters')
+    outputParam.add_argument('-phylipcat', type=str, metavar='catfile', default=None, help='Name of phylip file with concatenated sequences\n'+
+                             '(required with -phylip)')
+    outputParam.add_argument('-icat', type=str, metavar='interleaved_catfile', default=None, help='Name of interleaved phylip file with\n'+
+                             'concatenated sequences [none]')
+    outputParam.add_argument('-part', type=str, metavar='partition_file', default=None, help='Name of RAxML/IQ-TREE partition file for the\n'+
+                             'concatenated phylip files [none]')
+    outputParam.add_argument('-structure', type=str, metavar='outfile', default=None, help='Name of output STRUCTURE file')
+    outputParam.add_argument('-fineRAD', type=str, metavar='outfile', default=None, help='Name of output fineRADstructure file')
+
+    optionalParam = parser.add_argument_group('optional parameters')
+    optionalParam.add_argument('-na', type=int, metavar='num_alleles', default=None, help='Number of alleles per sample to write to fasta,\n'+
+                               'nexus and phylip files (1 or 2, required with those formats)')
+    optionalParam.add_argument('-hemi', type=int, metavar='hemizygous_genotypes', default=1, help='Allow (1) or do not allow (0) hemizygous\n'+
+                               'genotypes, for all formats except fineRADstructure [1]')
+    optionalParam.add_argument('-miss', type=int, metavar='missing', default=1, help='Write samples with missing data to cluster phylip\n'+
+                               'files. 0=no; 1=yes [1]')
+    optionalParam.add_argument('-ct', type=str, metavar='character_type', default=None, help='Type of characters to use in STRUCTURE file (must\n'+
+                               'be HAP, ALLSNP, ALLBISNP, or 1BISNP, required with -structure)')
+    optionalParam.add_argument('-min', type=int, metavar='min_freq', default=1, help='Minimum minor allele count when using biallelic\n'+
+                               'snps/indels [1]')
+    optionalParam.add_argument('-arch', type=str, metavar='archive', default=None, help='Name of zip archive to write the files of each\n'+
+                               'cluster to, instead of separate files. The files of\n'+
+                               'single clusters can be extracted with extractclusters.py [none]')
+    optionalParam.add_argument('-threads', type=int, metavar='threads', default=0, help='Number of threads writing the files of individual\n'+
+                               'clusters. 0=write on the main thread [0]')
+    optionalParam.add_argument('-variable_only', action='store_true', help='Only write clusters where the included samples have\n'+
+                               'more than one sequence (besides missing data) to fasta,\n'+
+                               'nexus and phylip files')
+    optionalParam.add_argument('-progress', type=float, metavar='seconds', default=10, help='Interval between progress reports, with clusters\n'+
+                               'and bytes read per second, estimated time left and memory\n'+
+                               'use [10]')
+    optionalParam.add_argument('-progress_kv', action='store_true', help='Write progress reports as key=value pairs after the\n'+
+                               'word PROGRESS, for scheduler logs')
+    optionalParam.add_argument('-summary', type=str, metavar='json_file', default=None, help='Name of JSON file with a summary of the run:\n'+
+                               'clusters read, samples included and excluded, values of\n'+
+                               'each output (e.g. characters written), wall time per\n'+
+                               'stage, throughput and peak memory [none]')
+    optionalParam.add_argument('-prom', type=str, metavar='prom_file', default=None, help='Name of Prometheus textfile with the same summary,\n'+
+                               'for the node_exporter textfile collector [none]')
+    optionalParam.add_argument('-timings', action='store_true', help='Print the wall time and number of calls of each stage\n'+
+                               '(reading, parsing, computing and writing) at the end of the run')
+    optionalParam.add_argument('-profile', type=str, metavar='profile_file', default=None, help='Run under cProfile and write the statistics to\n'+
+                               'profile_file [none]')
+    args = parser.parse_args()
+
+    #check parameters
+    if not (args.fasta or args.nexus or args.phylip or args.structure or args.fineRAD):
+        print('ERROR: no output format requested!\n\n')
+        quit()
+    if (args.fasta or args.nexus or args.phylip) and args.na not in (1,2):
+        print('ERROR: number of alleles (-na) must equal 1 or 2!\n\n')
+        quit()
+    if args.nexus and not args.nexuscat:
+        print('ERROR: -nexuscat is required with -nexus!\n\n')
+        quit()
+    if args.phylip and not args.phylipcat:
+        print('ERROR: -phylipcat is required with -phylip!\n\n')
+        quit()
+    if args.structure and args.ct not in ['HAP','ALLSNP','ALLBISNP','1BISNP']:
+        print('ERROR: ct parameter does not match one of four possible options!\n\n')
+        quit()
+
+    #gather sample info from popfile, skip pop=-9
+    print('Gathering info from sample info file, skipping samples where population is -9:')
+    samples = read_sample_info(args.si)
+    print('Found '+str(samples.num_samples)+' samples, of which '+str(samples.incl_samples)+' will be included in output files')
+
+    #set up writers for each requested format
+    timings = Timings() if args.timings or args.summary or args.prom else None
+    summary = RunSummary(__file__, timings) if args.summary or args.prom else None
+    cluster_files = ClusterFiles(args.arch, args.threads, timings=timings)
+    writers = []
+    if args.fasta:
+        writers.append(FastaWriter(samples, args.na, args.hemi, args.fasta, cluster_files, variable_only=args.variable_only))
+    if args.nexus:
+        writers.append(NexusWriter(samples, args.na, args.hemi, args.nexus, args.nexuscat, cluster_files, args.variable_only))
+    if args.phylip:
+        writers.append(PhylipWriter(samples, args.na, args.hemi, args.miss, args.phylip, args.phylipcat,
+                                    cluster_files, args.icat, args.part, timings=timings,
+                                    variable_only=args.variable_only))
+    if args.structure:
+        writers.append(StructureWriter(samples, args.structure, args.ct, args.min, args.hemi))
+    if args.fineRAD:
+        writers.append(FineRADstructureWriter(samples, args.fineRAD))
+
+    print('\nConverting clusters')
+    try:
+        cluster_count = run_profiled(args.profile, convert, args.i, samples, writers, timings=timings,
+                                     progress=Progress(args.progress, args.progress_kv), summary=summary)
+    except ValueError as e:
+        print('ERROR: '+str(e)+'!\n\n')
+        quit()
+    cluster_files.close()
+    if args.timings:
+        print('\nTimings:\n'+timings.report())
+    if summary:
+        summary.write(args.summary, args.prom)
+
+    print('\nFinished converting '+str(cluster_count)+' clusters')
+    print('\nFinished!!\n\n')
+
+if __name__ == '__main__':
+    main()